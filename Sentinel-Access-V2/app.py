@@ -1,5 +1,16 @@
 import streamlit as st
 
+from config.settings import WARM_UP_ON_START
+from core.report_wrapper import warm_up
+
+@st.cache_resource
+def start_warm_up():
+    """Load the report workers in the background once per server process"""
+    return warm_up(background=True)
+
 st.title("🛰️ Sentinel Access")
 st.write("App is loading...")
 st.write("If you see this, the app works!")
+
+if WARM_UP_ON_START:
+    start_warm_up()
@@ -0,0 +1,164 @@
+"""
+Output Benchmark - Chart formats and output profiles compared
+Replays the recorded fixtures through every worker once per chart format
+(raster PNG vs vector SVG) and once per output profile (standard, print,
+email, mobile), and compares chart rendering time, PDF build time and
+PDF size. PDFs are built in memory, so disk speed does not enter the
+timings.
+
+Usage (from Sentinel-Access-V2):
+    python -m benchmarks.chart_formats
+    python -m benchmarks.chart_formats --workers weather --days 16 --repeat 10 --output formats.json
+    python -m benchmarks.chart_formats --profiles standard,mobile --formats png
+
+Vector charts need svglib (pip install svglib).
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+
+from benchmarks.run_benchmarks import WORKERS, timed, summarize, worker_specs, bench_locations
+
+FORMATS = ("png", "svg")
+PROFILES = ("standard", "print", "email", "mobile")
+
+# =============================================
+# RUN
+# =============================================
+
+def measure(worker, spec, jobs, days, repeat, warmup):
+    """
+    Build one worker's reports for every job
+
+    Returns:
+        dict: {charts_ms, pdf_ms, total_ms, pdf_kb} medians
+    """
+    import numpy as np
+
+    timings = {}
+    sizes = []
+
+    for iteration in range(warmup + repeat):
+        keep = iteration >= warmup
+        for location, (lat, lon) in jobs:
+            with redirect_stdout(io.StringIO()):
+                data = spec["frame"](spec["fetch"](lat, lon, days))
+                summary = spec["analyze"](data)
+
+                run = timings if keep else {}
+                with timed(run, "charts"):
+                    charts = [fn(data) for fn in spec["charts"].values()]
+                pdf = io.BytesIO()
+                with timed(run, "pdf"):
+                    spec["build_pdf"](location, worker.title(), (lat, lon), summary, charts, pdf)
+
+            if keep:
+                sizes.append(pdf.getbuffer().nbytes)
+
+    charts_ms = summarize(timings["charts"])["median_ms"]
+    pdf_ms = summarize(timings["pdf"])["median_ms"]
+    return {"charts_ms": charts_ms, "pdf_ms": pdf_ms, "total_ms": round(charts_ms + pdf_ms, 3),
+            "pdf_kb": round(float(np.median(sizes)) / 1024, 1)}
+
+def run_variants(workers=WORKERS, days=7, locations=4, repeat=5, warmup=1, formats=FORMATS, profiles=PROFILES):
+    """
+    Build every worker's reports in each chart format (standard profile),
+    then in each output profile (png charts)
+
+    Returns:
+        list: [{worker, variant, charts_ms, pdf_ms, total_ms, pdf_kb}, ...] (medians);
+              variant is "png", "svg" or "profile:<name>"
+    """
+    from core import chart_cache, output_profiles
+    from benchmarks import replay
+
+    replay.install()
+    specs = worker_specs()
+    jobs = bench_locations(locations)
+    rows = []
+
+    variants = [(fmt, fmt, "standard") for fmt in formats]
+    variants += [(f"profile:{name}", "png", name) for name in profiles if not (name == "standard" and "png" in formats)]
+
+    for variant, fmt, profile in variants:
+        if chart_cache.set_chart_format(fmt) != fmt:
+            print(f"[WARN] Skipping {variant}: {fmt} charts not available")
+            continue
+
+        with output_profiles.use(profile):
+            for worker in workers:
+                rows.append(dict(worker=worker, variant=variant,
+                                 **measure(worker, specs[worker], jobs, days, repeat, warmup)))
+
+        print(f"[OK] {variant}")
+
+    return rows
+
+# =============================================
+# REPORTING
+# =============================================
+
+def print_rows(rows):
+    """Table of results, each variant compared with standard png charts"""
+    baseline = {row["worker"]: row for row in rows if row["variant"] in ("png", "profile:standard")}
+
+    print(f"\n{'worker':<8} {'variant':<16} {'charts':>10} {'pdf':>10} {'total':>10} {'size':>10} {'vs png':>18}")
+    for row in rows:
+        base = baseline.get(row["worker"])
+        change = ""
+        if base is not None and row is not base:
+            change = (f"{row['total_ms'] / base['total_ms'] - 1:>+6.0%} time "
+                      f"{row['pdf_kb'] / base['pdf_kb'] - 1:>+5.0%} size")
+        print(f"{row['worker']:<8} {row['variant']:<16} {row['charts_ms']:>8.1f}ms {row['pdf_ms']:>8.1f}ms "
+              f"{row['total_ms']:>8.1f}ms {row['pdf_kb']:>8.1f}KB {change:>18}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare chart formats and output profiles: build time and PDF size")
+    parser.add_argument("--workers", default=",".join(WORKERS), help="Comma list of surf, sky, weather")
+    parser.add_argument("--days", type=int, default=7, help="Forecast length (max 16)")
+    parser.add_argument("--locations", type=int, default=4, help="Locations per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Comma list of png, svg")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma list of output profiles")
+    parser.add_argument("--output", help="Save results as JSON")
+    args = parser.parse_args(argv)
+
+    # Same disposable settings as run_benchmarks; the chart cache stays off so every chart is rendered
+    cache_dir = tempfile.mkdtemp(prefix="sentinel-bench-")
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ["METRICS_DIR"] = cache_dir
+    os.environ["FORECAST_ARCHIVE_DIR"] = os.path.join(cache_dir, "archive")
+    os.environ["CHART_CACHE_ENABLED"] = "False"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    for budget in ("API_RATE_PER_MINUTE", "API_RATE_PER_HOUR", "API_RATE_PER_DAY"):
+        os.environ[budget] = "0"
+
+    workers = [w.strip().lower() for w in args.workers.split(",") if w.strip()]
+    unknown = [w for w in workers if w not in WORKERS]
+    if unknown:
+        parser.error(f"unknown workers: {', '.join(unknown)}")
+
+    try:
+        rows = run_variants(workers, args.days, args.locations, args.repeat, args.warmup,
+                            [f.strip() for f in args.formats.split(",") if f.strip()],
+                            [p.strip() for p in args.profiles.split(",") if p.strip()])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print_rows(rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"[OK] Results saved: {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Record Fixtures - Capture Open-Meteo responses for the benchmark suite
+Fetches one response per location with the variables of every report
+worker and the longest supported horizon, and saves it under
+benchmarks/fixtures. The replay adapter trims fixtures to whatever a
+worker asks for, so one recording serves every report type and length.
+
+Usage (from Sentinel-Access-V2):
+    python -m benchmarks.record_fixtures                  # live API
+    python -m benchmarks.record_fixtures BondiBeach Uluru # chosen locations
+    python -m benchmarks.record_fixtures --synthetic      # offline, deterministic
+"""
+
+import os
+import sys
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_DAYS = 16
+DEFAULT_LOCATIONS = ("BondiBeach", "BellsBeach", "AliceSprings")
+
+# =============================================
+# VARIABLES
+# =============================================
+
+def fixture_variables():
+    """Union of the hourly and daily variables used by every worker"""
+    from core import surf_worker, sky_worker, weather_worker
+
+    hourly = []
+    for var in surf_worker.SURF_HOURLY_VARS + sky_worker.SKY_HOURLY_VARS + weather_worker.WEATHER_HOURLY_VARS:
+        if var not in hourly:
+            hourly.append(var)
+
+    return hourly, list(weather_worker.WEATHER_DAILY_VARS)
+
+# =============================================
+# RECORDING
+# =============================================
+
+def record_location(lat, lon, hourly, daily):
+    """Fetch one live response straight from the API (no forecast cache)"""
+    from core import api_client
+    return api_client.fetch_forecast(lat, lon, hourly=hourly, daily=daily, forecast_days=FIXTURE_DAYS,
+                                     models="best_match")
+
+def location_timezone(lat, lon):
+    """
+    IANA timezone for an Australian location, from approximate state borders
+
+    Good enough for every location in locations.json; live recordings take
+    Open-Meteo's own timezone=auto answer instead.
+    """
+    if lat < -39.2:
+        return "Australia/Hobart"
+    if lon < 129:
+        return "Australia/Perth"
+    if lon < 138 and lat > -26:
+        return "Australia/Darwin"
+    if lon < 141 and lat <= -26:
+        return "Australia/Adelaide"
+    if lat > -29 and (lon < 149 or lat > -28.2):
+        return "Australia/Brisbane"
+    # The Murray, roughly: (141, -34) to (148, -36), then on to Cape Howe
+    murray = -34 - (lon - 141) * 2 / 7 if lon < 148 else -36 - (lon - 148) * 0.75
+    if lat < murray:
+        return "Australia/Melbourne"
+    # Far west New South Wales keeps South Australian time
+    return "Australia/Broken_Hill" if lon < 141.6 else "Australia/Sydney"
+
+def _wave(rng, i, base):
+    return round(max(0.2, base + 0.8 * math.sin(i / 11.0) + 0.3 * math.sin(i / 3.7) + rng.uniform(-0.1, 0.1)), 2)
+
+def synthesize_location(lat, lon, hourly, daily, seed):
+    """
+    Build a deterministic response with Open-Meteo's shape and units
+
+    Used to ship fixtures without network access. Values follow daily and
+    synoptic cycles so every chart, alert and best-day branch is exercised.
+    """
+    rng = random.Random(seed)
+    tz = ZoneInfo(location_timezone(lat, lon))
+    start = datetime(2025, 1, 1, tzinfo=tz)
+    hours = FIXTURE_DAYS * 24
+    base_wave = rng.uniform(0.8, 1.8)
+
+    series = {
+        "wave_height": lambda i: _wave(rng, i, base_wave),
+        "wave_period": lambda i: round(9 + 3 * math.sin(i / 17.0) + rng.uniform(-0.5, 0.5), 2),
+        "cloud_cover": lambda i: int(max(0, min(100, 50 + 50 * math.sin(i / 9.0 + seed) + rng.uniform(-15, 15)))),
+        "temperature_2m": lambda i: round(20 + 7 * math.sin((i % 24 - 9) / 24 * 2 * math.pi) + rng.uniform(-1, 1), 1),
+        "precipitation": lambda i: round(max(0.0, 3 * math.sin(i / 13.0 + seed) - 1.5 + rng.uniform(-0.5, 0.5)), 1),
+        "wind_speed_10m": lambda i: round(max(0.0, 18 + 12 * math.sin(i / 20.0 + seed) + rng.uniform(-3, 3)), 1),
+        "wind_direction_10m": lambda i: int((200 + 150 * math.sin(i / 30.0 + seed) + rng.uniform(-20, 20)) % 360),
+        "wind_gusts_10m": lambda i: round(max(0.0, 35 + 25 * math.sin(i / 20.0 + seed) + rng.uniform(-5, 5)), 1),
+        "weather_code": lambda i: rng.choice([0, 1, 2, 3, 3, 45, 61, 63, 80, 95])
+    }
+
+    data = {
+        "latitude": lat,
+        "longitude": lon,
+        "generationtime_ms": 0.5,
+        "utc_offset_seconds": int(start.utcoffset().total_seconds()),
+        "timezone": tz.key,
+        "timezone_abbreviation": start.tzname(),
+        "elevation": 10.0
+    }
+
+    # Local wall-clock hours, as Open-Meteo returns them with timezone=auto
+    start_utc = start.astimezone(timezone.utc)
+    data["hourly"] = {"time": [(start_utc + timedelta(hours=i)).astimezone(tz).strftime("%Y-%m-%dT%H:%M")
+                               for i in range(hours)]}
+    for var in hourly:
+        data["hourly"][var] = [series[var](i) for i in range(hours)]
+
+    if daily:
+        data["daily"] = {"time": [(start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(FIXTURE_DAYS)]}
+        h = data["hourly"]
+        for var in daily:
+            values = []
+            for d in range(FIXTURE_DAYS):
+                day = slice(d * 24, (d + 1) * 24)
+                if var == "temperature_2m_max":
+                    values.append(max(h["temperature_2m"][day]))
+                elif var == "wind_speed_10m_max":
+                    values.append(max(h["wind_speed_10m"][day]))
+                elif var == "wind_gusts_10m_max":
+                    values.append(max(h["wind_gusts_10m"][day]))
+                elif var == "wind_direction_10m_dominant":
+                    values.append(h["wind_direction_10m"][d * 24 + 12])
+                elif var == "precipitation_sum":
+                    values.append(round(sum(h["precipitation"][day]), 1))
+                elif var == "weather_code":
+                    values.append(max(h["weather_code"][day]))
+            data["daily"][var] = values
+
+    return data
+
+def save_fixture(name, data):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, f"{name}.json")
+    with open(path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    return path
+
+def main(argv):
+    from config.settings import BASE_OUTPUT
+    from core.location_manager import LocationManager, normalize_coords
+
+    synthetic = "--synthetic" in argv
+    names = [a for a in argv if not a.startswith("--")] or list(DEFAULT_LOCATIONS)
+
+    locations = LocationManager(BASE_OUTPUT).get_all_locations()
+    hourly, daily = fixture_variables()
+
+    for seed, name in enumerate(names):
+        if name not in locations:
+            print(f"[ERROR] Unknown location: {name}")
+            continue
+
+        lat, lon = normalize_coords(locations[name])
+        try:
+            if synthetic:
+                data = synthesize_location(lat, lon, hourly, daily, seed)
+            else:
+                data = record_location(lat, lon, hourly, daily)
+        except Exception as e:
+            print(f"[ERROR] Could not record {name}: {e}")
+            continue
+
+        print(f"[OK] Saved {save_fixture(name, data)}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
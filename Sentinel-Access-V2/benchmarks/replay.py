@@ -0,0 +1,114 @@
+"""
+Replay Adapter - Serve recorded Open-Meteo fixtures instead of the live API
+Mounted on the shared api_client session, it answers single and
+multi-location forecast requests from benchmarks/fixtures. Fixtures are
+trimmed to the requested variables and forecast_days, and their times are
+shifted to start today so the "today"/"tonight" charts have data.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import BaseAdapter
+
+from benchmarks.record_fixtures import FIXTURE_DIR
+
+# =============================================
+# FIXTURES
+# =============================================
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """Load every fixture, sorted by file name"""
+    fixtures = []
+    for name in sorted(os.listdir(fixture_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(fixture_dir, name), "r") as f:
+                fixtures.append(json.load(f))
+
+    if not fixtures:
+        raise FileNotFoundError(f"No fixtures in {fixture_dir} (run python -m benchmarks.record_fixtures)")
+    return fixtures
+
+def _shift_times(times, start, step, fmt):
+    return [(start + step * i).strftime(fmt) for i in range(len(times))]
+
+def _trim_block(block, variables, rows, start, step, fmt):
+    """Keep the first rows of the requested variables, with times starting at start"""
+    times = block["time"][:rows]
+    out = {"time": _shift_times(times, start, step, fmt)}
+    for var in variables:
+        if var not in block:
+            raise KeyError(f"Fixture has no variable '{var}' (re-record fixtures)")
+        out[var] = block[var][:rows]
+    return out
+
+def build_response(fixture, lat, lon, hourly, daily, forecast_days, today=None):
+    """Cut one location's response out of a fixture"""
+    today = today or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    data = {k: v for k, v in fixture.items() if k not in ("hourly", "daily", "hourly_units", "daily_units")}
+    data["latitude"] = lat
+    data["longitude"] = lon
+
+    if hourly:
+        data["hourly"] = _trim_block(fixture["hourly"], hourly, forecast_days * 24, today,
+                                     timedelta(hours=1), "%Y-%m-%dT%H:%M")
+    if daily:
+        data["daily"] = _trim_block(fixture["daily"], daily, forecast_days, today, timedelta(days=1), "%Y-%m-%d")
+
+    return data
+
+# =============================================
+# ADAPTER
+# =============================================
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport adapter answering forecast URLs from fixtures"""
+
+    def __init__(self, fixtures):
+        super().__init__()
+        self.fixtures = fixtures
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.calls += 1
+
+        query = parse_qs(urlparse(request.url).query)
+        lats = [float(v) for v in query["latitude"][0].split(",")]
+        lons = [float(v) for v in query["longitude"][0].split(",")]
+        hourly = query["hourly"][0].split(",") if "hourly" in query else []
+        daily = query["daily"][0].split(",") if "daily" in query else []
+        forecast_days = int(query.get("forecast_days", ["7"])[0])
+
+        # Locations pick fixtures round-robin by their position in the request
+        body = [
+            build_response(self.fixtures[i % len(self.fixtures)], lat, lon, hourly, daily, forecast_days)
+            for i, (lat, lon) in enumerate(zip(lats, lons))
+        ]
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(body[0] if len(body) == 1 else body).encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+def install(fixtures=None):
+    """Mount a ReplayAdapter on the shared API session and return it"""
+    from core import api_client
+
+    adapter = ReplayAdapter(fixtures or load_fixtures())
+    session = api_client.get_session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
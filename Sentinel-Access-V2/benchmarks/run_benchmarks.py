@@ -0,0 +1,361 @@
+"""
+Benchmark Suite - Per-stage timings for every report worker
+Replays the recorded fixtures (no network) and times each stage of the
+surf, sky and weather reports separately:
+    fetch / fetch_cached   forecast_cache.get_forecast (cache miss / hit)
+    frame                  DataFrame construction (parse_*_data)
+    analysis.*             check_alerts, find_best_swell_day, find_best_viewing_night
+    analysis               the worker's whole analyze_data stage
+    chart.*                each chart function
+    pdf                    build_pdf (story + doc.build)
+plus one multi-location bulk fetch per run. Each stage is reported as
+median / p90 / p95 in milliseconds for every forecast length and location
+count, and results can be saved as JSON and compared between commits.
+
+Usage (from Sentinel-Access-V2):
+    python -m benchmarks.run_benchmarks --output before.json
+    python -m benchmarks.run_benchmarks --compare before.json
+    python -m benchmarks.run_benchmarks --workers surf --days 7 --locations 1,10 --repeat 10
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKERS = ("surf", "sky", "weather")
+
+# =============================================
+# TIMING
+# =============================================
+
+@contextmanager
+def timed(timings, stage):
+    """Add the elapsed seconds of the block to timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+
+def summarize(samples):
+    """Median and percentiles in milliseconds"""
+    import numpy as np
+
+    values = np.asarray(samples, dtype=float) * 1000
+    return {
+        "n": int(values.size),
+        "median_ms": round(float(np.median(values)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+# =============================================
+# WORKER STAGES
+# =============================================
+
+def _png(chart_fn):
+    """Wrap a chart function so it returns PNG bytes or None"""
+    def run(data):
+        buf = chart_fn(data)
+        return buf.getvalue() if buf else None
+    return run
+
+def worker_specs():
+    """Stage functions for each worker"""
+    from core import forecast_cache, surf_worker, sky_worker, weather_worker
+
+    def surf_chart(chart_fn):
+        def run(df):
+            buf = io.BytesIO()
+            return buf.getvalue() if chart_fn(df, buf) else None
+        return run
+
+    return {
+        "surf": {
+            "fetch": lambda lat, lon, days: forecast_cache.get_forecast(
+                lat, lon, hourly=surf_worker.SURF_HOURLY_VARS, forecast_days=days),
+            "frame": surf_worker.parse_surf_data,
+            "analysis": {"find_best_swell_day": surf_worker.find_best_swell_day},
+            "analyze": surf_worker.analyze_data,
+            "charts": {
+                "today": surf_chart(surf_worker.generate_today_chart),
+                "best_day": surf_chart(surf_worker.generate_best_day_chart),
+                "weekly": surf_chart(surf_worker.generate_weekly_chart)
+            },
+            "build_pdf": surf_worker.build_pdf
+        },
+        "sky": {
+            "fetch": lambda lat, lon, days: forecast_cache.get_forecast(
+                lat, lon, hourly=sky_worker.SKY_HOURLY_VARS, forecast_days=days),
+            "frame": sky_worker.parse_sky_data,
+            "analysis": {"find_best_viewing_night": sky_worker.find_best_viewing_night},
+            "analyze": sky_worker.analyze_data,
+            "charts": {
+                "tonight": _png(lambda df: sky_worker.generate_tonight_sky_chart(df, None)),
+                "best_night": _png(lambda df: sky_worker.generate_best_night_chart(df, None)),
+                "weekly": _png(lambda df: sky_worker.generate_weekly_sky_chart(df, None))
+            },
+            "build_pdf": sky_worker.build_pdf
+        },
+        "weather": {
+            "fetch": lambda lat, lon, days: forecast_cache.get_forecast(
+                lat, lon, hourly=weather_worker.WEATHER_HOURLY_VARS, daily=weather_worker.WEATHER_DAILY_VARS,
+                forecast_days=days, models="best_match"),
+            "frame": weather_worker.parse_weather_data,
+            "analysis": {"check_alerts": lambda data: weather_worker.check_alerts(data[0])},
+            "analyze": weather_worker.analyze_data,
+            "charts": {
+                "daily": _png(lambda data: weather_worker.generate_daily_chart(data[0])),
+                "weekly": _png(lambda data: weather_worker.generate_weekly_chart(data[1]))
+            },
+            "build_pdf": weather_worker.build_pdf
+        }
+    }
+
+def run_job(spec, report_type, location, coords, days, output_dir, timings):
+    """Run one report through every stage, recording each stage's time"""
+    lat, lon = coords
+
+    with timed(timings, "fetch"):
+        raw = spec["fetch"](lat, lon, days)
+    with timed(timings, "fetch_cached"):
+        spec["fetch"](lat, lon, days)
+
+    with timed(timings, "frame"):
+        data = spec["frame"](raw)
+
+    for name, fn in spec["analysis"].items():
+        with timed(timings, f"analysis.{name}"):
+            fn(data)
+    with timed(timings, "analysis"):
+        summary = spec["analyze"](data)
+
+    charts = []
+    for name, fn in spec["charts"].items():
+        with timed(timings, f"chart.{name}"):
+            charts.append(fn(data))
+
+    save_path = os.path.join(output_dir, f"{report_type}_{location}.pdf")
+    with timed(timings, "pdf"):
+        spec["build_pdf"](location, report_type, coords, summary, charts, save_path)
+
+    return sum(1 for chart in charts if chart is None)
+
+def bench_locations(count):
+    """First count locations from locations.json (cycled with offsets if there are fewer)"""
+    from config.settings import BASE_OUTPUT
+    from core.location_manager import LocationManager, normalize_coords
+
+    with redirect_stdout(io.StringIO()):
+        catalog = LocationManager(BASE_OUTPUT).get_all_locations()
+
+    names = sorted(catalog) or ["Origin"]
+    coords = [normalize_coords(catalog[name]) if name in catalog else (0.0, 0.0) for name in names]
+
+    chosen = []
+    for i in range(count):
+        lat, lon = coords[i % len(names)]
+        lap = i // len(names)
+        chosen.append((f"{names[i % len(names)]}{lap or ''}", (lat + 0.1 * lap, lon + 0.1 * lap)))
+    return chosen
+
+# =============================================
+# RUN
+# =============================================
+
+def run_benchmarks(workers=WORKERS, days_list=(7, 16), location_counts=(1, 4), repeat=5, warmup=1):
+    """
+    Run every worker for each forecast length and location count
+
+    Returns:
+        dict: {"meta": {...}, "results": [{worker, days, locations, stage, median_ms, ...}, ...]}
+    """
+    from core import api_client, forecast_cache
+    from benchmarks import replay
+    from benchmarks.record_fixtures import fixture_variables
+
+    adapter = replay.install()
+    specs = worker_specs()
+    hourly, daily = fixture_variables()
+    results = []
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for days in days_list:
+            for count in location_counts:
+                locations = bench_locations(count)
+                coords = [c for _, c in locations]
+                samples = {}
+
+                for iteration in range(warmup + repeat):
+                    keep = iteration >= warmup
+                    forecast_cache.clear_cache()
+
+                    bulk_timings = samples.setdefault("all", {}) if keep else {}
+                    with timed(bulk_timings, "fetch_bulk"):
+                        api_client.fetch_forecast_bulk(coords, hourly=hourly, daily=daily, forecast_days=days)
+
+                    for report_type in workers:
+                        timings = samples.setdefault(report_type, {}) if keep else {}
+                        start = time.perf_counter()
+
+                        for location, loc_coords in locations:
+                            with redirect_stdout(io.StringIO()):
+                                failed = run_job(specs[report_type], report_type, location, loc_coords, days,
+                                                 output_dir, timings)
+                            if keep:
+                                failures += failed
+
+                        if keep:
+                            timings.setdefault("run_total", []).append(time.perf_counter() - start)
+
+                for worker, stages in samples.items():
+                    for stage, values in stages.items():
+                        results.append(dict(worker=worker, days=days, locations=count, stage=stage,
+                                            **summarize(values)))
+
+                print(f"[OK] {days}-day forecasts x {count} locations")
+
+    return {"meta": run_metadata(workers, days_list, location_counts, repeat, warmup, adapter.calls, failures),
+            "results": results}
+
+def run_metadata(workers, days_list, location_counts, repeat, warmup, api_calls, failures):
+    """Where and how the numbers were produced"""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BENCH_DIR, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    import numpy, pandas, matplotlib, reportlab
+
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {"numpy": numpy.__version__, "pandas": pandas.__version__,
+                     "matplotlib": matplotlib.__version__, "reportlab": reportlab.Version},
+        "workers": list(workers),
+        "days": list(days_list),
+        "locations": list(location_counts),
+        "repeat": repeat,
+        "warmup": warmup,
+        "api_calls": api_calls,
+        "chart_failures": failures
+    }
+
+# =============================================
+# REPORTING
+# =============================================
+
+def _row_key(row):
+    return row["worker"], row["days"], row["locations"], row["stage"]
+
+def print_results(report):
+    meta = report["meta"]
+    print(f"\nCommit {meta['commit']}{' (dirty)' if meta['dirty'] else ''} | Python {meta['python']} | "
+          f"{meta['repeat']} runs | {meta['chart_failures']} chart failures")
+    print(f"{'worker':<8} {'days':>4} {'locs':>4}  {'stage':<32} {'median':>10} {'p90':>10} {'p95':>10}")
+    for row in report["results"]:
+        print(f"{row['worker']:<8} {row['days']:>4} {row['locations']:>4}  {row['stage']:<32} "
+              f"{row['median_ms']:>8.2f}ms {row['p90_ms']:>8.2f}ms {row['p95_ms']:>8.2f}ms")
+
+def compare_results(report, baseline, threshold=0.15):
+    """
+    Print median changes against a saved run
+
+    Returns:
+        int: Number of stages slower than the baseline by more than threshold
+    """
+    base_rows = {_row_key(row): row for row in baseline["results"]}
+    regressions = 0
+
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} (threshold {threshold:.0%})")
+    print(f"{'worker':<8} {'days':>4} {'locs':>4}  {'stage':<32} {'before':>10} {'after':>10} {'change':>8}")
+
+    for row in report["results"]:
+        base = base_rows.get(_row_key(row))
+        if base is None or base["median_ms"] <= 0:
+            continue
+
+        change = row["median_ms"] / base["median_ms"] - 1
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{row['worker']:<8} {row['days']:>4} {row['locations']:>4}  {row['stage']:<32} "
+              f"{base['median_ms']:>8.2f}ms {row['median_ms']:>8.2f}ms {change:>+7.0%}{flag}")
+
+    return regressions
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay fixtures through every report worker and time each stage")
+    parser.add_argument("--workers", default=",".join(WORKERS), help="Comma list of surf, sky, weather")
+    parser.add_argument("--days", type=_int_list, default=[7, 16], help="Forecast lengths (max 16)")
+    parser.add_argument("--locations", type=_int_list, default=[1, 4], help="Location counts")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per setting")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per setting")
+    parser.add_argument("--output", help="Save results as JSON")
+    parser.add_argument("--compare", help="Saved JSON to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Slowdown flagged as a regression")
+    parser.add_argument("--chart-cache", action="store_true", help="Leave the chart render cache on")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time, so point the caches somewhere disposable first
+    cache_dir = tempfile.mkdtemp(prefix="sentinel-bench-")
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ["METRICS_DIR"] = cache_dir
+    os.environ["FORECAST_ARCHIVE_DIR"] = os.path.join(cache_dir, "archive")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Replayed responses cost no quota; throttling would only add sleeps to the timings
+    for budget in ("API_RATE_PER_MINUTE", "API_RATE_PER_HOUR", "API_RATE_PER_DAY"):
+        os.environ[budget] = "0"
+    if not args.chart_cache:
+        os.environ["CHART_CACHE_ENABLED"] = "False"
+
+    workers = [w.strip().lower() for w in args.workers.split(",") if w.strip()]
+    unknown = [w for w in workers if w not in WORKERS]
+    if unknown:
+        parser.error(f"unknown workers: {', '.join(unknown)}")
+
+    try:
+        report = run_benchmarks(workers, args.days, args.locations, args.repeat, args.warmup)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Results saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare_results(report, baseline, args.threshold):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
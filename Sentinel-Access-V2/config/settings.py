@@ -24,4 +24,80 @@ SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 
 # Debug mode
-DEBUG = os.getenv("DEBUG", "True") == "True"
\ No newline at end of file
+DEBUG = os.getenv("DEBUG", "True") == "True"
+
+# Open-Meteo API
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", 15))
+API_RETRIES = int(os.getenv("API_RETRIES", 3))
+API_BACKOFF = float(os.getenv("API_BACKOFF", 0.5))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 10))
+API_MAX_BATCH_LOCATIONS = int(os.getenv("API_MAX_BATCH_LOCATIONS", 100))
+API_BACKOFF_MAX = float(os.getenv("API_BACKOFF_MAX", 60))
+
+# Client-side rate limits (Open-Meteo free tier; a multi-location request costs one call per location, 0 disables)
+API_RATE_PER_MINUTE = int(os.getenv("API_RATE_PER_MINUTE", 600))
+API_RATE_PER_HOUR = int(os.getenv("API_RATE_PER_HOUR", 5000))
+API_RATE_PER_DAY = int(os.getenv("API_RATE_PER_DAY", 10000))
+# Longest a request waits for quota before failing instead
+API_RATE_MAX_WAIT = float(os.getenv("API_RATE_MAX_WAIT", 300))
+
+# Forecast cache
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_OUTPUT, ".cache"))
+FORECAST_CACHE_TTL = int(os.getenv("FORECAST_CACHE_TTL", 3600))
+FORECAST_CACHE_MAX_STALE = int(os.getenv("FORECAST_CACHE_MAX_STALE", 21600))
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", 2000))
+FORECAST_CACHE_PRECISION = int(os.getenv("FORECAST_CACHE_PRECISION", 2))
+FORECAST_CACHE_OFFLINE = os.getenv("FORECAST_CACHE_OFFLINE", "False") == "True"
+
+# Chart render cache
+CHART_CACHE_MEMORY_MB = int(os.getenv("CHART_CACHE_MEMORY_MB", 64))
+CHART_CACHE_MAX_FILES = int(os.getenv("CHART_CACHE_MAX_FILES", 5000))
+CHART_CACHE_ENABLED = os.getenv("CHART_CACHE_ENABLED", "True") == "True"
+
+# Chart format embedded in the PDFs: "png" (raster) or "svg" (vector drawings, needs svglib)
+CHART_FORMAT = os.getenv("CHART_FORMAT", "png").lower()
+
+# Default output profile (standard, print, email, mobile - see core/output_profiles.py)
+REPORT_PROFILE = os.getenv("REPORT_PROFILE", "standard").lower()
+
+# Spatial index: catalog locations within FORECAST_COALESCE_KM of a neighbour share one forecast fetch
+FORECAST_COALESCE_KM = float(os.getenv("FORECAST_COALESCE_KM", 5))
+FORECAST_COALESCE = os.getenv("FORECAST_COALESCE", "True") == "True"
+
+# Logging and metrics
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(BASE_OUTPUT, ".metrics"))
+METRICS_JSONL = os.getenv("METRICS_JSONL", os.path.join(METRICS_DIR, "events.jsonl"))
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", os.path.join(METRICS_DIR, "sentinel.prom"))
+# Minimum seconds between Prometheus file rewrites after single reports
+METRICS_PROM_INTERVAL = float(os.getenv("METRICS_PROM_INTERVAL", "10"))
+
+# Start-up
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "True") == "True"
+
+# Report catalog (SQLite, relative to the output folder)
+REPORT_CATALOG_FILE = os.getenv("REPORT_CATALOG_FILE", os.path.join(".catalog", "reports.sqlite3"))
+REPORT_SKIP_UNCHANGED = os.getenv("REPORT_SKIP_UNCHANGED", "True") == "True"
+
+# Forecast archive (float32 history per fetch point, variable and month)
+FORECAST_ARCHIVE_DIR = os.getenv("FORECAST_ARCHIVE_DIR", os.path.join(BASE_OUTPUT, ".archive"))
+FORECAST_ARCHIVE_ENABLED = os.getenv("FORECAST_ARCHIVE_ENABLED", "True") == "True"
+
+# Alert rules (see config/alert_rules.json)
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json"))
+
+# Refresh scheduler: reports are refreshed after each forecast model run
+# becomes available (run hour UTC + delay), at most once per per-type interval
+SCHEDULE_REPORT_TYPES = os.getenv("SCHEDULE_REPORT_TYPES", "Surf,Sky,Weather").split(",")
+SCHEDULE_INTERVALS = os.getenv("SCHEDULE_INTERVALS", "Surf=360,Sky=360,Weather=180")
+MODEL_RUN_HOURS_UTC = os.getenv("MODEL_RUN_HOURS_UTC", "0,6,12,18")
+MODEL_RUN_DELAY_MINUTES = int(os.getenv("MODEL_RUN_DELAY_MINUTES", 300))
+SCHEDULE_JITTER_SECONDS = int(os.getenv("SCHEDULE_JITTER_SECONDS", 300))
+SCHEDULE_BATCH_WINDOW_SECONDS = int(os.getenv("SCHEDULE_BATCH_WINDOW_SECONDS", 60))
+SCHEDULE_BACKOFF_SECONDS = int(os.getenv("SCHEDULE_BACKOFF_SECONDS", 300))
+SCHEDULE_BACKOFF_MAX_SECONDS = int(os.getenv("SCHEDULE_BACKOFF_MAX_SECONDS", 21600))
+
+# Single-flight report generation: lock files let processes share one in-flight report
+SINGLE_FLIGHT_LOCKS = os.getenv("SINGLE_FLIGHT_LOCKS", "True") == "True"
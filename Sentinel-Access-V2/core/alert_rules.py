@@ -0,0 +1,196 @@
+"""
+Alert Rules - Declarative weather alerts compiled to NumPy masks
+Rules live in config/alert_rules.json: each has a name, priority,
+status colour, look-ahead window and a list of conditions on hourly
+and/or daily variables (all must hold). Rules are compiled once into
+vectorized mask functions that work on arrays of any shape, so one
+hour series, one location's week or a locations x hours grid are
+evaluated the same way. The status table and the charts read the
+same masks.
+"""
+
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from config.settings import ALERT_RULES_FILE
+from core import metrics
+
+log = metrics.get_logger("alert_rules")
+
+_rules = None
+_rules_lock = threading.Lock()
+
+# =============================================
+# COMPILING
+# =============================================
+
+def _compile_condition(cond):
+    """One {"variable", "op", "value"} condition -> function(columns) -> bool array"""
+    var, op, value = cond["variable"], cond["op"], cond.get("value")
+
+    if op == "in":
+        allowed = np.asarray(value, dtype=float)
+        test = lambda x: np.isin(x, allowed)
+    elif op == "bearing":
+        # Directions from start to end clockwise, wrapping through north when start > end
+        start, end = (float(v) for v in value)
+        if start <= end:
+            test = lambda x: (x >= start) & (x <= end)
+        else:
+            test = lambda x: (x >= start) | (x <= end)
+    elif op in (">=", ">", "<=", "<", "=="):
+        threshold = float(value)
+        test = {
+            ">=": lambda x: x >= threshold,
+            ">": lambda x: x > threshold,
+            "<=": lambda x: x <= threshold,
+            "<": lambda x: x < threshold,
+            "==": lambda x: x == threshold
+        }[op]
+    else:
+        raise ValueError(f"Unknown alert operator '{op}' for {var}")
+
+    def mask(columns):
+        # NaN compares False, so missing data never raises an alert
+        with np.errstate(invalid="ignore"):
+            return test(np.asarray(columns[var], dtype=float))
+
+    mask.variable = var
+    return mask
+
+class AlertRule:
+    """One compiled rule"""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.priority = int(spec.get("priority", 100))
+        self.colour = spec.get("colour", "white")
+        self.window_hours = float(spec.get("window_hours", 24))
+        self.chart = spec.get("chart", {})
+        self._conditions = {scope: [_compile_condition(c) for c in spec.get(scope, [])] for scope in ("hourly", "daily")}
+
+    def variables(self, scope="hourly"):
+        return [c.variable for c in self._conditions[scope]]
+
+    def has(self, scope):
+        return bool(self._conditions[scope])
+
+    def mask(self, columns, scope="hourly"):
+        """Boolean mask where every condition holds (shape of the input arrays)"""
+        conditions = self._conditions[scope]
+        result = conditions[0](columns)
+        for condition in conditions[1:]:
+            result = result & condition(columns)
+        return result
+
+class RuleSet:
+    """Compiled rules in priority order, plus the no-alert and error statuses"""
+
+    def __init__(self, spec):
+        self.rules = sorted((AlertRule(r) for r in spec.get("rules", [])), key=lambda r: r.priority)
+        self.normal = spec.get("normal", {"name": "NORMAL", "colour": "honeydew"})
+        self.unavailable = spec.get("unavailable", {"name": "UNAVAILABLE", "colour": "lightgrey"})
+        # Part of the weather report fingerprint, so editing the rules rebuilds reports
+        self.digest = hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def masks(self, columns, scope="hourly"):
+        """
+        Evaluate every rule that has conditions for this scope
+
+        Args:
+            columns: {variable: array} (a DataFrame works too); arrays may be
+                     (hours,) for one location or (locations, hours) for a grid
+
+        Returns:
+            dict: {rule_name: bool array}
+        """
+        return {rule.name: rule.mask(columns, scope) for rule in self.rules if rule.has(scope)}
+
+    def windows(self, times, now=None, hours_ahead=None):
+        """
+        {rule_name: bool array} of the times inside each rule's look-ahead window
+
+        hours_ahead overrides every rule's window_hours
+        """
+        times = np.asarray(times, dtype="datetime64[s]")
+        now = np.datetime64(now or datetime.now(), "s")
+        windows = {}
+        for rule in self.rules:
+            hours = rule.window_hours if hours_ahead is None else hours_ahead
+            windows[rule.name] = (times >= now) & (times <= now + np.timedelta64(int(hours * 3600), "s"))
+        return windows
+
+    def status(self, masks, windows):
+        """
+        Highest-priority rule firing inside its window
+
+        Works on one location's (hours,) masks or a grid's (locations, hours)
+        masks; the last axis is time.
+
+        Returns:
+            list: [(name, colour), ...] one per location (a single tuple for 1-D masks)
+        """
+        first = next(iter(masks.values()), None)
+        shape = first.shape[:-1] if first is not None else ()
+        chosen = np.full(shape, -1, dtype=int)
+
+        for i, rule in enumerate(self.rules):
+            if rule.name not in masks:
+                continue
+            fired = (masks[rule.name] & windows[rule.name]).any(axis=-1)
+            chosen = np.where((chosen < 0) & fired, i, chosen)
+
+        def entry(i):
+            if i < 0:
+                return self.normal["name"], self.normal["colour"]
+            return self.rules[i].name, self.rules[i].colour
+
+        if chosen.ndim == 0:
+            return entry(int(chosen))
+        return [entry(int(i)) for i in chosen]
+
+# =============================================
+# LOADING
+# =============================================
+
+def load_rules(path=ALERT_RULES_FILE):
+    """Read and compile a rules file"""
+    with open(path, "r", encoding="utf-8") as f:
+        return RuleSet(json.load(f))
+
+def get_rules():
+    """The shared compiled rules (compiled once per process)"""
+    global _rules
+
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = load_rules()
+                log.debug(f"[OK] Loaded {len(_rules.rules)} alert rules from {ALERT_RULES_FILE}")
+    return _rules
+
+def reload_rules():
+    """Drop the compiled rules so the next get_rules() re-reads the file"""
+    global _rules
+    with _rules_lock:
+        _rules = None
+
+# =============================================
+# GRID ALERTS
+# =============================================
+
+def grid_statuses(grid, now=None):
+    """
+    Alert status for every location in a ranking.ForecastGrid in one pass
+
+    Returns:
+        list: [(location, status, colour), ...]
+    """
+    rules = get_rules()
+    with metrics.span("alerts", locations=len(grid)):
+        statuses = rules.status(rules.masks(grid.values), rules.windows(grid.hours, now))
+    return [(name,) + status for name, status in zip(grid.names, statuses)]
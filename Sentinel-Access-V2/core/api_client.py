@@ -0,0 +1,404 @@
+"""
+Open-Meteo API Client - Shared HTTP client for all report workers
+Keeps one pooled keep-alive session, requests gzip responses,
+applies a common timeout/retry policy and records per-request timing.
+Every request passes a shared token-bucket rate limiter (per-minute,
+per-hour and per-day budgets); 429 and 5xx responses are retried with
+jittered exponential backoff, honouring Retry-After.
+"""
+
+import time
+import random
+import threading
+from contextlib import contextmanager
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.settings import (OPEN_METEO_URL, API_TIMEOUT, API_RETRIES, API_BACKOFF, API_POOL_SIZE,
+                             API_MAX_BATCH_LOCATIONS, API_BACKOFF_MAX, API_RATE_PER_MINUTE, API_RATE_PER_HOUR,
+                             API_RATE_PER_DAY, API_RATE_MAX_WAIT)
+from core import metrics
+
+log = metrics.get_logger("api_client")
+
+# Responses worth retrying: quota (429) and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+# Most recent request timings, newest last
+_timings = deque(maxlen=500)
+_timings_lock = threading.Lock()
+
+# Per-run call counters (see count_calls)
+_runs = []
+_runs_lock = threading.Lock()
+
+# =============================================
+# RATE LIMITING
+# =============================================
+
+class RateLimitError(Exception):
+    """The request budget would not allow a call within API_RATE_MAX_WAIT"""
+
+class RateLimiter:
+    """
+    Token buckets shared by every request in the process
+
+    Each budget (calls per period) is a bucket holding up to `calls` tokens
+    that refills continuously; a request takes `cost` tokens from every
+    bucket, waiting until all of them have enough. pause() holds every
+    caller back, e.g. for a 429's Retry-After.
+    """
+
+    def __init__(self, budgets, max_wait=API_RATE_MAX_WAIT):
+        """
+        Args:
+            budgets: [(calls, period_seconds), ...]; entries with calls <= 0 are ignored
+            max_wait: Longest acquire() waits before raising RateLimitError
+        """
+        now = time.monotonic()
+        # [capacity, tokens per second, tokens, last refill]
+        self._buckets = [[float(calls), calls / period, float(calls), now] for calls, period in budgets if calls > 0]
+        self.max_wait = max_wait
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        for bucket in self._buckets:
+            capacity, rate, tokens, updated = bucket
+            bucket[2] = min(capacity, tokens + (now - updated) * rate)
+            bucket[3] = now
+
+    def _wait_time(self, cost, now):
+        """Seconds until every bucket holds `cost` tokens (0 when they already do)"""
+        wait = max(self._paused_until - now, 0.0)
+        for capacity, rate, tokens, _ in self._buckets:
+            needed = min(cost, capacity) - tokens
+            if needed > 0:
+                wait = max(wait, needed / rate)
+        return wait
+
+    def acquire(self, cost=1):
+        """
+        Take `cost` calls from every budget, sleeping until they are available
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._wait_time(cost, now)
+                if wait <= 0:
+                    for bucket in self._buckets:
+                        bucket[2] -= min(cost, bucket[0])
+                    return now - start
+                if now - start + wait > self.max_wait:
+                    raise RateLimitError(f"API budget exhausted: next call allowed in {wait:.0f}s")
+            # Re-check after waking, other threads may have taken the tokens
+            time.sleep(min(wait, 5.0))
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds`"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def remaining(self):
+        """Whole calls left in each budget right now"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return [int(bucket[2]) for bucket in self._buckets]
+
+_limiter = RateLimiter([(API_RATE_PER_MINUTE, 60), (API_RATE_PER_HOUR, 3600), (API_RATE_PER_DAY, 86400)])
+
+def get_rate_limiter():
+    """Return the shared rate limiter"""
+    return _limiter
+
+def _retry_delay(response, attempt):
+    """
+    Seconds to wait before retry number attempt + 1
+
+    Retry-After (seconds or an HTTP date) wins; otherwise exponential
+    backoff with jitter, so parallel callers do not retry in lockstep
+    """
+    header = response.headers.get("Retry-After") if response is not None else None
+    if header:
+        try:
+            delay = float(header)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(header).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), API_BACKOFF_MAX) + random.uniform(0, API_BACKOFF)
+
+    delay = min(API_BACKOFF * 2 ** attempt, API_BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+# =============================================
+# SESSION
+# =============================================
+
+def get_session():
+    """Return the shared pooled session, creating it on first use"""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Connection errors only; retryable statuses go back through the rate limiter in get_json
+                # (status=0 and ignoring Retry-After keep urllib3 from retrying a 429/503 by itself)
+                retry = Retry(
+                    total=API_RETRIES,
+                    status=0,
+                    backoff_factor=API_BACKOFF,
+                    allowed_methods=["GET"],
+                    respect_retry_after_header=False,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Accept": "application/json",
+                    "Accept-Encoding": "gzip, deflate"
+                })
+                _session = session
+
+    return _session
+
+def close_session():
+    """Close the shared session and drop its pooled connections"""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# =============================================
+# REQUESTS
+# =============================================
+
+def build_query(lat, lon, hourly=None, daily=None, forecast_days=7, **extra):
+    """
+    Build the Open-Meteo query string for one or more locations
+
+    Args:
+        lat: Latitude, or comma-separated latitudes
+        lon: Longitude, or comma-separated longitudes
+        hourly: List of hourly variables
+        daily: List of daily variables
+        forecast_days: Number of forecast days
+        **extra: Any other API parameters (models, timezone...)
+
+    Returns:
+        str: Query string with commas left unescaped
+    """
+    params = {"latitude": lat, "longitude": lon}
+
+    if hourly:
+        params["hourly"] = ",".join(hourly)
+    if daily:
+        params["daily"] = ",".join(daily)
+
+    params["forecast_days"] = forecast_days
+    params.setdefault("timezone", "auto")
+    params.update(extra)
+
+    return urlencode(params, safe=",")
+
+def get_json(query, timeout=None, cost=1):
+    """
+    GET the forecast endpoint through the shared session and rate limiter
+
+    Args:
+        query: Query string from build_query()
+        timeout: Optional timeout override in seconds
+        cost: Calls the request counts against the budget (one per location)
+
+    Returns:
+        Decoded JSON response
+
+    Raises:
+        RateLimitError: The budget would not allow the call within API_RATE_MAX_WAIT
+        requests.HTTPError: Still failing after API_RETRIES retries
+    """
+    url = f"{OPEN_METEO_URL}?{query}"
+    session = get_session()
+
+    for attempt in range(API_RETRIES + 1):
+        waited = _limiter.acquire(cost)
+        if waited > 0.01:
+            _count_run("throttled_s", waited)
+            metrics.observe("api_throttle", waited)
+
+        start = time.perf_counter()
+        status = None
+        size = 0
+        response = None
+
+        try:
+            response = session.get(url, timeout=timeout or API_TIMEOUT)
+            status = response.status_code
+            size = len(response.content)
+        finally:
+            _record_timing(url, status, time.perf_counter() - start, size, cost)
+
+        if status in RETRY_STATUSES and attempt < API_RETRIES:
+            delay = _retry_delay(response, attempt)
+            _count_run("retries")
+            metrics.inc("api_retries", status=status)
+            log.warning(f"[WARN] API returned {status}, retry {attempt + 1}/{API_RETRIES} in {delay:.1f}s")
+            if status == 429:
+                # Over quota: every caller backs off, not just this one
+                _limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+def fetch_forecast(lat, lon, hourly=None, daily=None, forecast_days=7, **extra):
+    """Fetch a forecast for one location and return the decoded JSON"""
+    return get_json(build_query(lat, lon, hourly=hourly, daily=daily, forecast_days=forecast_days, **extra))
+
+def fetch_forecast_bulk(coords, hourly=None, daily=None, forecast_days=7, batch_size=None, **extra):
+    """
+    Fetch forecasts for many locations using multi-location requests
+
+    Args:
+        coords: List of (lat, lon) pairs
+        batch_size: Locations per request (defaults to API_MAX_BATCH_LOCATIONS)
+
+    Returns:
+        list: One decoded JSON response per location, in input order
+    """
+    batch_size = batch_size or API_MAX_BATCH_LOCATIONS
+    results = []
+
+    for start in range(0, len(coords), batch_size):
+        batch = coords[start:start + batch_size]
+        lats = ",".join(str(lat) for lat, _ in batch)
+        lons = ",".join(str(lon) for _, lon in batch)
+
+        query = build_query(lats, lons, hourly=hourly, daily=daily, forecast_days=forecast_days, **extra)
+        data = get_json(query, cost=len(batch))
+
+        # A single-location request returns an object rather than a list
+        if isinstance(data, dict):
+            data = [data]
+
+        if len(data) != len(batch):
+            raise ValueError(f"Expected {len(batch)} locations in response, got {len(data)}")
+
+        results.extend(data)
+
+    return results
+
+# =============================================
+# TIMING
+# =============================================
+
+def _record_timing(url, status, elapsed, size, cost=1):
+    """Store the timing for one request"""
+    metrics.observe("api_request", elapsed, ok=status == 200)
+    metrics.inc("api_calls")
+    metrics.inc("api_bytes", size)
+    _count_run("requests")
+    _count_run("calls", cost)
+    if status != 200:
+        metrics.inc("api_errors", status=status)
+        _count_run("errors")
+
+    with _timings_lock:
+        _timings.append({
+            "url": url,
+            "status": status,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "bytes": size,
+            "timestamp": time.time()
+        })
+
+def get_request_timings():
+    """Return a copy of the recorded request timings, oldest first"""
+    with _timings_lock:
+        return list(_timings)
+
+def get_request_stats():
+    """
+    Summarise recorded request timings
+
+    Returns:
+        dict: {count, failures, total_ms, mean_ms, max_ms, bytes}
+    """
+    timings = get_request_timings()
+
+    if not timings:
+        return {"count": 0, "failures": 0, "total_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0, "bytes": 0}
+
+    elapsed = [t["elapsed_ms"] for t in timings]
+    return {
+        "count": len(timings),
+        "failures": sum(1 for t in timings if t["status"] != 200),
+        "total_ms": round(sum(elapsed), 1),
+        "mean_ms": round(sum(elapsed) / len(elapsed), 1),
+        "max_ms": max(elapsed),
+        "bytes": sum(t["bytes"] for t in timings)
+    }
+
+def reset_request_timings():
+    """Clear the recorded request timings"""
+    with _timings_lock:
+        _timings.clear()
+
+# =============================================
+# PER-RUN COUNTS
+# =============================================
+
+def _count_run(name, value=1):
+    """Add to every active run counter"""
+    if _runs:
+        with _runs_lock:
+            for counts in _runs:
+                counts[name] += value
+
+@contextmanager
+def count_calls(label=None):
+    """
+    Count API usage for the duration of a run (all threads)
+
+    Usage:
+        with api_client.count_calls("Bulk run") as counts:
+            ...
+        counts -> {"requests", "calls", "retries", "errors", "throttled_s"}
+
+    Counters overlap if runs overlap; each sees every request made while it is open.
+    With a label, the totals are logged when the block exits.
+    """
+    counts = {"requests": 0, "calls": 0, "retries": 0, "errors": 0, "throttled_s": 0.0}
+    with _runs_lock:
+        _runs.append(counts)
+    try:
+        yield counts
+    finally:
+        with _runs_lock:
+            _runs.remove(counts)
+        if label:
+            log.info(f"[OK] {label}: {counts['requests']} API requests ({counts['calls']} calls), "
+                     f"{counts['retries']} retries, {counts['errors']} errors, "
+                     f"{counts['throttled_s']:.1f}s throttled")
@@ -0,0 +1,255 @@
+"""
+Astronomy - Vectorized sun and moon positions, rise/set and twilight
+Low-precision almanac formulas (sun ~0.01 deg, moon ~0.3 deg, so events
+land within a few minutes) evaluated with NumPy for whole arrays of
+locations x dates at once. Each night runs from local noon to the next
+local noon; events are found where the sampled altitude crosses its
+threshold.
+
+Times in and out are local wall-clock datetime64 values, like the
+Open-Meteo frames (timezone=auto), given each location's UTC offset.
+"""
+
+import numpy as np
+
+# Altitude thresholds (degrees): refraction and the solar semi-diameter at
+# sunrise/sunset, the sun 18 degrees down for astronomical twilight
+SUN_HORIZON = -0.8333
+ASTRONOMICAL_TWILIGHT = -18.0
+
+# Altitude samples per night (every 10 minutes, noon to noon)
+STEP_MINUTES = 10
+SAMPLES = 24 * 60 // STEP_MINUTES + 1
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+
+# =============================================
+# POSITIONS
+# =============================================
+
+def julian_day(unix_seconds):
+    """Julian day for seconds since 1970-01-01 UTC"""
+    return np.asarray(unix_seconds, dtype=float) / 86400.0 + _UNIX_EPOCH_JD
+
+def _obliquity(n):
+    return np.radians(23.439 - 0.0000004 * n)
+
+def sun_ecliptic(jd):
+    """Apparent ecliptic longitude of the sun (radians)"""
+    n = jd - _J2000
+    mean_lon = 280.460 + 0.9856474 * n
+    anomaly = np.radians(357.528 + 0.9856003 * n)
+    return np.radians(mean_lon + 1.915 * np.sin(anomaly) + 0.020 * np.sin(2 * anomaly))
+
+def moon_ecliptic(jd):
+    """
+    Ecliptic longitude, latitude and horizontal parallax of the moon
+
+    Returns:
+        tuple: (longitude, latitude, parallax) in radians
+    """
+    t = (jd - _J2000) / 36525.0
+
+    def term(amp, a, b, fn=np.sin):
+        return amp * fn(np.radians(a + b * t))
+
+    lon = (218.32 + 481267.881 * t + term(6.29, 135.0, 477198.87) + term(-1.27, 259.3, -413335.36)
+           + term(0.66, 235.7, 890534.22) + term(0.21, 269.9, 954397.74) + term(-0.19, 357.5, 35999.05)
+           + term(-0.11, 186.5, 966404.03))
+    lat = (term(5.13, 93.3, 483202.02) + term(0.28, 228.2, 960400.89) + term(-0.28, 318.3, 6003.15)
+           + term(-0.17, 217.6, -407332.21))
+    parallax = (0.9508 + term(0.0518, 135.0, 477198.87, np.cos) + term(0.0095, 259.3, -413335.36, np.cos)
+                + term(0.0078, 235.7, 890534.22, np.cos) + term(0.0028, 269.9, 954397.74, np.cos))
+    return np.radians(lon), np.radians(lat), np.radians(parallax)
+
+def _equatorial(lon, lat, n):
+    """Ecliptic to right ascension and declination (radians)"""
+    eps = _obliquity(n)
+    ra = np.arctan2(np.sin(lon) * np.cos(eps) - np.tan(lat) * np.sin(eps), np.cos(lon))
+    dec = np.arcsin(np.sin(lat) * np.cos(eps) + np.cos(lat) * np.sin(eps) * np.sin(lon))
+    return ra, dec
+
+def _altitude(ra, dec, jd, lat, lon):
+    """Altitude (degrees) of (ra, dec) seen from lat/lon (degrees) at jd"""
+    sidereal = np.radians(280.46061837 + 360.98564736629 * (jd - _J2000) + lon)
+    lat = np.radians(lat)
+    hour_angle = sidereal - ra
+    return np.degrees(np.arcsin(np.sin(lat) * np.sin(dec) + np.cos(lat) * np.cos(dec) * np.cos(hour_angle)))
+
+def sun_altitude(jd, lat, lon):
+    """Geometric altitude of the sun's centre (degrees); arguments broadcast"""
+    n = jd - _J2000
+    ra, dec = _equatorial(sun_ecliptic(jd), 0.0, n)
+    return _altitude(ra, dec, jd, lat, lon)
+
+def moon_altitude(jd, lat, lon):
+    """
+    Geocentric altitude of the moon's centre (degrees) and the altitude at
+    which its upper limb touches the horizon (parallax, semi-diameter and
+    refraction); arguments broadcast
+
+    Returns:
+        tuple: (altitude, horizon)
+    """
+    n = jd - _J2000
+    ecl_lon, ecl_lat, parallax = moon_ecliptic(jd)
+    ra, dec = _equatorial(ecl_lon, ecl_lat, n)
+    horizon = 0.7275 * np.degrees(parallax) - 0.5667
+    return _altitude(ra, dec, jd, lat, lon), horizon
+
+def moon_phase(jd):
+    """
+    Moon illumination and age
+
+    Returns:
+        tuple: (illuminated fraction 0-1, age as a fraction of the synodic month:
+                0 new, 0.25 first quarter, 0.5 full, 0.75 last quarter)
+    """
+    ecl_lon, ecl_lat, _ = moon_ecliptic(jd)
+    elongation = ecl_lon - sun_ecliptic(jd)
+    illumination = (1 - np.cos(ecl_lat) * np.cos(elongation)) / 2
+    age = np.mod(elongation, 2 * np.pi) / (2 * np.pi)
+    return illumination, age
+
+# =============================================
+# EVENTS
+# =============================================
+
+def _crossing(alt, threshold, rising):
+    """
+    First threshold crossing along the last axis
+
+    Returns:
+        tuple: (found mask, fractional sample index)
+    """
+    above = alt >= threshold
+    hits = (~above[..., :-1] & above[..., 1:]) if rising else (above[..., :-1] & ~above[..., 1:])
+    found = hits.any(axis=-1)
+    k = hits.argmax(axis=-1)[..., None]
+
+    a0 = np.take_along_axis(alt, k, axis=-1)[..., 0]
+    a1 = np.take_along_axis(alt, k + 1, axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(found, (threshold - a0) / (a1 - a0), 0.0)
+    return found, k[..., 0] + frac
+
+def _window(alt, threshold):
+    """
+    Span below threshold: from the first setting (or the start, if already
+    below) to the next rising (or the end)
+
+    Returns:
+        tuple: (start, end) fractional sample indices, NaN when never below
+    """
+    below_at_start = alt[..., 0] < threshold
+    set_found, set_at = _crossing(alt, threshold, rising=False)
+    start = np.where(below_at_start, 0.0, np.where(set_found, set_at, np.nan))
+
+    # The rising that ends the window is the first one after it starts
+    samples = np.arange(alt.shape[-1])
+    after = np.where(samples > np.nan_to_num(np.floor(start), nan=alt.shape[-1])[..., None], alt, -90.0)
+    rise_found, rise_at = _crossing(after, threshold, rising=True)
+    end = np.where(rise_found, rise_at, alt.shape[-1] - 1.0)
+    return start, np.where(np.isnan(start), np.nan, end)
+
+def night_grid(lats, lons, utc_offsets, dates):
+    """
+    Sun, twilight and moon events for every location and night in one pass
+
+    Args:
+        lats, lons: Location coordinates in degrees, shape (N,)
+        utc_offsets: Each location's UTC offset in seconds, shape (N,)
+        dates: Local dates each night starts on (anything np.datetime64 accepts), shape (D,)
+
+    Returns:
+        dict: Arrays shaped (N, D). Local datetime64[s] times (NaT when the event
+              does not happen that night): "sunset", "sunrise", "moonrise",
+              "moonset"; "dusk" and "dawn" bound the astronomically dark window
+              (NaT when it never gets dark, noon when still dark then). Floats:
+              "moon_illumination" (0-1) and "moon_age" (fraction of the synodic
+              month), both at local midnight
+    """
+    lats = np.asarray(lats, dtype=float)[:, None, None]
+    lons = np.asarray(lons, dtype=float)[:, None, None]
+    offsets = np.asarray(utc_offsets, dtype=float)[:, None, None]
+    days = np.asarray(dates, dtype="datetime64[D]")
+
+    # Local noon of each date -> UTC seconds, then every sample until the next noon
+    noon = (days.astype("datetime64[s]") + np.timedelta64(12, "h")).astype(float)[None, :, None]
+    steps = np.arange(SAMPLES) * STEP_MINUTES * 60.0
+    unix = noon - offsets + steps
+    jd = julian_day(unix)
+
+    sun = sun_altitude(jd, lats, lons)
+    moon, moon_horizon = moon_altitude(jd, lats, lons)
+    moon = moon - moon_horizon
+
+    def to_local(index):
+        seconds = noon[..., 0] + np.where(np.isnan(index), 0, index) * STEP_MINUTES * 60.0
+        times = seconds.round().astype("int64").astype("datetime64[s]")
+        return np.where(np.isnan(index), np.datetime64("NaT"), times)
+
+    def event(found, index):
+        return to_local(np.where(found, index, np.nan))
+
+    sunset, sunrise = _window(sun, SUN_HORIZON)
+    dusk, dawn = _window(sun, ASTRONOMICAL_TWILIGHT)
+
+    midnight = julian_day(noon[..., 0] - offsets[..., 0] + 12 * 3600.0)
+    illumination, age = moon_phase(midnight)
+
+    return {
+        "sunset": event(sunset > 0, sunset),
+        "sunrise": event(sunrise < SAMPLES - 1, sunrise),
+        "dusk": to_local(dusk),
+        "dawn": to_local(dawn),
+        "moonrise": event(*_crossing(moon, 0.0, rising=True)),
+        "moonset": event(*_crossing(moon, 0.0, rising=False)),
+        "moon_illumination": illumination,
+        "moon_age": age
+    }
+
+def altitudes(times, lat, lon, utc_offset):
+    """
+    Sun and moon altitude at local times for one location
+
+    Returns:
+        tuple: (sun altitude, moon altitude above its rise/set horizon) in degrees
+    """
+    local = np.asarray(times, dtype="datetime64[s]").astype("int64").astype(float)
+    jd = julian_day(local - utc_offset)
+    moon, horizon = moon_altitude(jd, lat, lon)
+    return sun_altitude(jd, lat, lon), moon - horizon
+
+# =============================================
+# DARK WINDOWS
+# =============================================
+
+def night_of(times):
+    """Local date each night starts on, for local times (nights run noon to noon)"""
+    return (np.asarray(times, dtype="datetime64[s]") - np.timedelta64(12, "h")).astype("datetime64[D]")
+
+def dark_mask(times, lats, lons, utc_offsets):
+    """
+    Which local times fall in each location's astronomically dark window,
+    to the nearest hour
+
+    Args:
+        times: Local datetime64 times, shape (H,) shared by every location or (N, H)
+        lats, lons, utc_offsets: shape (N,)
+
+    Returns:
+        bool array of shape (N, H)
+    """
+    times = np.asarray(times, dtype="datetime64[s]")
+    nights = night_of(times)
+    dates = np.unique(nights)
+    grid = night_grid(lats, lons, utc_offsets, dates)
+
+    rows = np.arange(len(np.atleast_1d(lats)))[:, None]
+    cols = np.searchsorted(dates, nights)
+    half_hour = np.timedelta64(30, "m")
+    dusk = (grid["dusk"][rows, cols] + half_hour).astype("datetime64[h]")
+    dawn = (grid["dawn"][rows, cols] + half_hour).astype("datetime64[h]")
+    return (times >= dusk) & (times <= dawn)
@@ -0,0 +1,320 @@
+"""
+Batch Report Pipeline - Staged fetch -> render -> PDF generation
+Runs many (location, report_type) jobs through bounded stages:
+1. One bulk fetch for every job (see core.bulk_fetch), then analysis in a
+   thread pool; jobs the bulk fetch could not cover fetch on their own
+2. Chart rendering in a process pool (CPU bound, one process per core)
+3. PDF assembly in the same process pool, written as each job finishes
+One failing job is recorded in its result and never aborts the run.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config.settings import BASE_OUTPUT
+from core import api_client, metrics, report_catalog, output_profiles
+
+log = metrics.get_logger("batch_pipeline")
+
+_DONE = object()
+
+# How often the parent checks that the stage threads and the process pool are alive
+STAGE_POLL_SECONDS = 1.0
+
+# =============================================
+# STAGE FUNCTIONS (run inside pool workers)
+# =============================================
+
+def _get_worker(report_type):
+    """Import the worker module for a report type"""
+    from core.report_wrapper import get_worker
+    return get_worker(report_type)
+
+def _render_job(report_type, data, summary, profile=None):
+    """Process pool task: render every chart for one job"""
+    with output_profiles.use(profile):
+        return _get_worker(report_type).render_charts(data, summary)
+
+def _build_job(location, report_type, coords, summary, charts, output_dir, fingerprint=None, profile=None):
+    """Process pool task: assemble and write the PDF for one job, then catalog it"""
+    worker = _get_worker(report_type)
+    with output_profiles.use(profile):
+        save_path = worker.report_path(location, output_dir)
+        worker.build_pdf(location, report_type, coords, summary, charts, save_path)
+        if output_profiles.is_default():
+            report_catalog.record_report(save_path, location, report_type, input_hash=fingerprint,
+                                         output_dir=output_dir)
+    return save_path
+
+# =============================================
+# PIPELINE
+# =============================================
+
+def _normalize_jobs(jobs):
+    """Accept (location, report_type) or (location, report_type, coords) jobs"""
+    normalized = []
+    locations = None
+
+    for job in jobs:
+        if len(job) == 3:
+            location, report_type, coords = job
+        else:
+            location, report_type = job
+            if locations is None:
+                from core.location_manager import LocationManager
+                locations = LocationManager(BASE_OUTPUT).get_all_locations()
+            coords = locations.get(location)
+
+        if coords is not None:
+            from core.location_manager import normalize_coords
+            coords = normalize_coords(coords)
+
+        normalized.append((location, report_type, coords))
+
+    return normalized
+
+def _bulk_fetch(jobs):
+    """
+    Fetch every job's data in as few multi-location requests as possible
+
+    Returns:
+        dict: {(location, report_type): data}; jobs missing here fetch on their own
+    """
+    from core import bulk_fetch
+
+    locations = {}
+    for location, _, coords in jobs:
+        if coords is not None:
+            locations.setdefault(location, coords)
+    report_types = list(dict.fromkeys(report_type for _, report_type, _ in jobs))
+    if not locations:
+        return {}
+
+    try:
+        fetched = bulk_fetch.fetch_all_forecasts(report_types, locations)
+    except Exception as e:
+        log.warning(f"[WARN] Bulk fetch failed, fetching jobs one by one: {e}")
+        return {}
+
+    # A location listed twice with different coordinates keeps its own fetch
+    return {
+        (location, report_type): fetched[report_type][location]
+        for location, report_type, coords in jobs
+        if coords is not None and locations[location] == coords and location in fetched.get(report_type, {})
+    }
+
+def run_batch(jobs, output_dir=BASE_OUTPUT, fetch_workers=8, render_workers=None, queue_size=None, on_result=None,
+              force=False, profile=None):
+    """
+    Generate many reports through the staged pipeline
+
+    Args:
+        jobs: Iterable of (location, report_type) or (location, report_type, coords)
+        output_dir: Base folder for the PDFs
+        fetch_workers: Concurrent fetch threads
+        render_workers: Render/PDF processes (defaults to CPU count)
+        queue_size: Max jobs waiting between stages (defaults to 2 x render_workers)
+        on_result: Optional callback called with each result as it finishes
+        force: Rebuild reports whose forecast is unchanged since the last run
+        profile: Output profile for every job (default REPORT_PROFILE, see core.output_profiles)
+
+    Returns:
+        list: One dict per job, in input order:
+              {location, report_type, path, error, skipped, timings}
+    """
+    jobs = _normalize_jobs(jobs)
+    profile = output_profiles.get_profile(profile)["name"]
+    with output_profiles.use(profile):
+        # Only default-profile reports are catalogued, so only they can be skipped as unchanged
+        skip_unchanged = not force and output_profiles.is_default()
+    render_workers = render_workers or os.cpu_count() or 1
+    queue_size = queue_size or render_workers * 2
+
+    results = [
+        {"location": location, "report_type": report_type, "path": None, "error": None, "skipped": False,
+         "timings": {}}
+        for location, report_type, _ in jobs
+    ]
+    finished = threading.Event()
+    done = set()
+    done_lock = threading.Lock()
+
+    def finish(index, path=None, error=None):
+        with done_lock:
+            # A job already failed by abort() may still come back from its stage
+            if index in done:
+                return
+            done.add(index)
+        result = results[index]
+        result["path"] = path
+        result["error"] = error
+        if error is not None:
+            log.error(f"[ERROR] {result['location']} {result['report_type']}: {error}")
+
+        # Render and PDF spans are recorded in the pool processes; keep the parent's totals complete
+        report = result["report_type"].lower()
+        for stage, seconds in result["timings"].items():
+            metrics.observe("pipeline", seconds, stage=stage, report=report)
+        status = "failed" if error is not None else "skipped" if result["skipped"] else "ok"
+        metrics.inc("pipeline_jobs", report=report, status=status)
+        if on_result is not None:
+            try:
+                on_result(result)
+            except Exception as e:
+                log.warning(f"[WARN] on_result callback failed: {e}")
+        with done_lock:
+            if len(done) == len(jobs):
+                finished.set()
+
+    def abort(reason):
+        """Fail every job still in flight"""
+        for index in range(len(jobs)):
+            if index not in done:
+                finish(index, error=RuntimeError(reason))
+
+    if not jobs:
+        return results
+
+    render_q = queue.Queue(maxsize=queue_size)
+    pdf_q = queue.Queue(maxsize=queue_size)
+
+    # Spawn keeps child processes clear of the parent's fetch threads and locks
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=render_workers, mp_context=context) as pool:
+
+        # --- Stage 1: fetch + analysis ---
+        def fetch(index):
+            location, report_type, coords = jobs[index]
+            start = time.perf_counter()
+            try:
+                if coords is None:
+                    raise ValueError(f"No coordinates for {location}")
+                worker = _get_worker(report_type)
+                data = prefetched.get((location, report_type))
+                if data is None:
+                    data = worker.fetch_data(coords)
+                summary = worker.analyze_data(data)
+                fingerprint = worker.report_fingerprint(location, coords, data, summary)
+                existing = None
+                if skip_unchanged:
+                    existing = report_catalog.unchanged_report(location, report_type, fingerprint, output_dir)
+            except Exception as e:
+                finish(index, error=e)
+                return
+            results[index]["timings"]["fetch"] = time.perf_counter() - start
+            if existing:
+                results[index]["skipped"] = True
+                finish(index, path=existing)
+                return
+            render_q.put((index, data, summary, fingerprint))
+
+        prefetched = {}
+
+        def fetch_all():
+            with api_client.count_calls(f"Pipeline fetch of {len(jobs)} jobs"):
+                prefetched.update(_bulk_fetch(jobs))
+                with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+                    list(fetch_pool.map(fetch, range(len(jobs))))
+            render_q.put(_DONE)
+
+        # --- Stage 2: render charts ---
+        def render_all():
+            while True:
+                item = render_q.get()
+                if item is _DONE:
+                    # Let the sibling render threads see the end marker too
+                    render_q.put(_DONE)
+                    break
+
+                index, data, summary, fingerprint = item
+                start = time.perf_counter()
+                try:
+                    charts = pool.submit(_render_job, jobs[index][1], data, summary, profile).result()
+                except Exception as e:
+                    finish(index, error=e)
+                    continue
+                results[index]["timings"]["render"] = time.perf_counter() - start
+                pdf_q.put((index, summary, charts, fingerprint))
+
+        # --- Stage 3: PDF assembly ---
+        def build_all():
+            while True:
+                item = pdf_q.get()
+                if item is _DONE:
+                    break
+
+                index, summary, charts, fingerprint = item
+                location, report_type, coords = jobs[index]
+                start = time.perf_counter()
+                try:
+                    path = pool.submit(_build_job, location, report_type, coords, summary, charts, output_dir,
+                                       fingerprint, profile).result()
+                except Exception as e:
+                    finish(index, error=e)
+                    continue
+                results[index]["timings"]["pdf"] = time.perf_counter() - start
+                finish(index, path=path)
+
+        crashed = []
+
+        def stage_thread(target, name):
+            def run():
+                try:
+                    target()
+                except BaseException as e:
+                    log.error(f"[ERROR] Pipeline stage {name} stopped: {e}")
+                    crashed.append(name)
+            return threading.Thread(target=run, name=name, daemon=True)
+
+        stages = [stage_thread(fetch_all, "pipeline-fetch")]
+        stages += [stage_thread(render_all, f"pipeline-render-{i}") for i in range(render_workers)]
+        stages += [stage_thread(build_all, f"pipeline-pdf-{i}") for i in range(render_workers)]
+        for stage in stages:
+            stage.start()
+
+        # PDF threads only stop on their end marker, so one gone early means a stage died
+        builders = stages[-render_workers:]
+        aborted = False
+        while not finished.wait(STAGE_POLL_SECONDS):
+            if crashed or getattr(pool, "_broken", False) or not all(stage.is_alive() for stage in builders):
+                abort(f"Pipeline stopped: {', '.join(crashed) or 'process pool broken'}")
+                aborted = True
+                break
+
+        if aborted:
+            # Stages may be blocked on a full queue or a dead pool; don't wait for them
+            pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            for _ in range(render_workers):
+                pdf_q.put(_DONE)
+            for stage in stages:
+                stage.join()
+
+    metrics.write_prometheus()
+    return results
+
+def run_all_locations(report_types=("Surf", "Sky", "Weather"), output_dir=BASE_OUTPUT, **kwargs):
+    """Run every report type for every location in locations.json"""
+    from core.location_manager import LocationManager
+
+    locations = LocationManager(output_dir).get_all_locations()
+    jobs = [(location, report_type, coords) for report_type in report_types for location, coords in locations.items()]
+    return run_batch(jobs, output_dir=output_dir, **kwargs)
+
+if __name__ == "__main__":
+    force = "--force" in sys.argv
+    profile = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--profile=")), None)
+    types = [a for a in sys.argv[1:] if not a.startswith("--")] or ["Surf", "Sky", "Weather"]
+    start = time.perf_counter()
+    batch = run_all_locations(types, force=force, profile=profile)
+    ok = sum(1 for r in batch if r["error"] is None)
+    skipped = sum(1 for r in batch if r["skipped"])
+    size = sum(os.path.getsize(r["path"]) for r in batch if r["path"] and os.path.exists(r["path"]))
+    print(f"[OK] {ok}/{len(batch)} reports ({skipped} unchanged) in {time.perf_counter() - start:.1f}s, "
+          f"{size / 1024:.0f} KB ({output_profiles.get_profile(profile)['name']} profile)")
@@ -0,0 +1,140 @@
+"""
+Bulk Forecast Fetch - Whole-catalog data for every report type
+Fetches every location in as few multi-location Open-Meteo requests as
+possible and returns per-location frames for the existing workers
+"""
+
+from config.settings import BASE_OUTPUT
+from core import forecast_cache, metrics, spatial_index
+from core.location_manager import LocationManager, normalize_coords
+
+REPORT_TYPES = ("Surf", "Sky", "Weather")
+
+log = metrics.get_logger("bulk_fetch")
+
+# =============================================
+# FETCH SPECS
+# =============================================
+
+def _get_specs():
+    """Variables and parser for each report type"""
+    from core import surf_worker, sky_worker, weather_worker, combined_worker
+
+    return {
+        "surf": {
+            "hourly": surf_worker.SURF_HOURLY_VARS,
+            "daily": [],
+            "forecast_days": surf_worker.SURF_FORECAST_DAYS,
+            "parse": surf_worker.parse_surf_data
+        },
+        "sky": {
+            "hourly": sky_worker.SKY_HOURLY_VARS,
+            "daily": [],
+            "forecast_days": sky_worker.SKY_FORECAST_DAYS,
+            "parse": sky_worker.parse_sky_data
+        },
+        "weather": {
+            "hourly": weather_worker.WEATHER_HOURLY_VARS,
+            "daily": weather_worker.WEATHER_DAILY_VARS,
+            "forecast_days": weather_worker.DAILY_FORECAST_DAYS,
+            "parse": weather_worker.parse_weather_data
+        },
+        "combined": {
+            "hourly": combined_worker.COMBINED_HOURLY_VARS,
+            "daily": combined_worker.COMBINED_DAILY_VARS,
+            "forecast_days": combined_worker.COMBINED_FORECAST_DAYS,
+            "parse": combined_worker.parse_combined_data
+        }
+    }
+
+def _union(*var_lists):
+    """Merge variable lists keeping first-seen order"""
+    merged = []
+    for var_list in var_lists:
+        for var in var_list:
+            if var not in merged:
+                merged.append(var)
+    return merged
+
+# =============================================
+# BULK FETCH
+# =============================================
+
+def fetch_all_responses(report_types=REPORT_TYPES, locations=None, batch_size=None):
+    """
+    Fetch the raw Open-Meteo responses for many locations in bulk
+
+    The variables for every requested report type are merged so each batch
+    of locations costs one request, whatever the number of report types.
+
+    Args:
+        report_types: Report types to prepare ("Surf", "Sky", "Weather")
+        locations: {location_name: coords} (defaults to every location in locations.json)
+        batch_size: Locations per request (defaults to API_MAX_BATCH_LOCATIONS)
+
+    Returns:
+        dict: {location_name: decoded JSON response}
+    """
+    if locations is None:
+        locations = LocationManager(BASE_OUTPUT).get_all_locations()
+
+    specs = _get_specs()
+    wanted = [t for t in report_types if t.lower() in specs]
+    if not wanted:
+        raise ValueError(f"No known report types in {report_types}")
+
+    names = list(locations)
+    
+    # Nearby catalog locations sharing a forecast are fetched once
+    fetch_coords = [spatial_index.fetch_coords(*normalize_coords(locations[name])) for name in names]
+    coords = list(dict.fromkeys(fetch_coords))
+
+    chosen = [specs[t.lower()] for t in wanted]
+    hourly = _union(*(spec["hourly"] for spec in chosen))
+    daily = _union(*(spec["daily"] for spec in chosen))
+    forecast_days = max(spec["forecast_days"] for spec in chosen)
+
+    log.info(f"[FETCH] Bulk fetching {len(names)} locations for {', '.join(wanted)}")
+    with metrics.span("bulk_fetch", locations=len(names)):
+        fetched = forecast_cache.get_forecasts_bulk(coords, hourly=hourly, daily=daily, forecast_days=forecast_days,
+                                                    batch_size=batch_size, models="best_match")
+    
+    by_coords = dict(zip(coords, fetched))
+    if len(coords) < len(names):
+        log.info(f"[OK] {len(names)} locations shared {len(coords)} fetches")
+
+    return {name: by_coords[c] for name, c in zip(names, fetch_coords)}
+
+def fetch_all_forecasts(report_types=REPORT_TYPES, locations=None, batch_size=None, errors=None):
+    """
+    Fetch data for many locations and report types in bulk
+
+    Args:
+        report_types: Report types to prepare ("Surf", "Sky", "Weather")
+        locations: {location_name: coords} (defaults to every location in locations.json)
+        batch_size: Locations per request (defaults to API_MAX_BATCH_LOCATIONS)
+        errors: Optional dict filled with {(location_name, report_type): Exception}
+                for responses that could not be parsed
+
+    Returns:
+        dict: {report_type: {location_name: data}, ...} where data is what that
+              worker's generate_report() accepts as its data argument
+    """
+    responses = fetch_all_responses(report_types, locations, batch_size)
+
+    specs = _get_specs()
+    wanted = [t for t in report_types if t.lower() in specs]
+
+    results = {t: {} for t in wanted}
+    for name, response in responses.items():
+        for report_type in wanted:
+            try:
+                with metrics.span("parse", report=report_type.lower()):
+                    results[report_type][name] = specs[report_type.lower()]["parse"](response)
+            except Exception as e:
+                log.error(f"[ERROR] Could not parse {report_type} data for {name}: {e}")
+                if errors is not None:
+                    errors[(name, report_type)] = e
+
+    log.info(f"[OK] Bulk fetch complete")
+    return results
@@ -0,0 +1,423 @@
+"""
+Chart Cache - Content-hash cache for rendered charts (PNG or SVG)
+Charts are keyed by a hash of their input data slice plus chart parameters
+and kept in a bounded in-memory LRU backed by a bounded disk tier.
+Charts with a "now" marker cache their static base image; only the time
+overlay is recomposed on each request.
+
+Charts are PNG by default. CHART_FORMAT=svg switches every chart to SVG,
+embedded in the PDFs as vector drawings (see pdf_render.chart_flowable);
+without svglib installed it falls back to PNG.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from config.settings import CACHE_DIR, CHART_CACHE_MEMORY_MB, CHART_CACHE_MAX_FILES, CHART_CACHE_ENABLED, CHART_FORMAT
+from core import metrics, output_profiles
+
+log = metrics.get_logger("chart_cache")
+
+CHART_CACHE_DIR = os.path.join(CACHE_DIR, "charts")
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_memory_limit = CHART_CACHE_MEMORY_MB * 1024 * 1024
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+_format = None
+
+# =============================================
+# FORMAT
+# =============================================
+
+CHART_FORMATS = ("png", "svg")
+
+def set_chart_format(fmt):
+    """
+    Choose the chart format for this process
+
+    Args:
+        fmt: "png" or "svg"; svg falls back to png (with a warning) without svglib
+
+    Returns:
+        str: The format in use
+    """
+    global _format
+
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unknown chart format: {fmt} (choose from {', '.join(CHART_FORMATS)})")
+
+    if fmt == "svg":
+        import importlib.util
+        if importlib.util.find_spec("svglib") is None:
+            log.warning("[WARN] CHART_FORMAT=svg needs svglib (pip install svglib), using png charts")
+            fmt = "png"
+
+    _format = fmt
+    return fmt
+
+def chart_format():
+    """The chart format in use ("png" or "svg")"""
+    if _format is None:
+        set_chart_format(CHART_FORMAT if CHART_FORMAT in CHART_FORMATS else "png")
+    return _format
+
+# =============================================
+# KEYS
+# =============================================
+
+def _hash_value(h, value):
+    """Feed one input value into the hash"""
+    if hasattr(value, "to_numpy") and hasattr(value, "columns"):
+        import pandas as pd
+        h.update(repr(list(value.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif hasattr(value, "to_numpy"):
+        import pandas as pd
+        h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif hasattr(value, "tobytes"):
+        h.update(str(value.dtype).encode("utf-8"))
+        h.update(value.tobytes())
+    else:
+        h.update(repr(value).encode("utf-8"))
+
+def chart_key(name, *data, **params):
+    """
+    Build a cache key for one chart
+
+    Args:
+        name: Chart name (e.g. "surf_weekly")
+        *data: DataFrames, Series or arrays the chart is drawn from
+        **params: Any other values that change the output (titles, dpi...)
+
+    Returns:
+        str: Hex digest
+    """
+    h = hashlib.sha1(name.encode("utf-8"))
+    for value in data:
+        _hash_value(h, value)
+    h.update(repr(sorted(params.items())).encode("utf-8"))
+    # PNG keys are unchanged from before vector charts and output profiles existed
+    if chart_format() != "png":
+        h.update(chart_format().encode("utf-8"))
+    signature = output_profiles.chart_signature()
+    if signature:
+        h.update(repr(signature).encode("utf-8"))
+    return h.hexdigest()
+
+# =============================================
+# STORAGE TIERS
+# =============================================
+
+def _memory_get(key):
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            _memory.move_to_end(key)
+        return entry
+
+def _memory_put(key, png, meta):
+    global _memory_bytes
+
+    with _lock:
+        if key in _memory:
+            _memory_bytes -= len(_memory.pop(key)[0])
+        _memory[key] = (png, meta)
+        _memory_bytes += len(png)
+
+        while _memory_bytes > _memory_limit and len(_memory) > 1:
+            _, (old_png, _) = _memory.popitem(last=False)
+            _memory_bytes -= len(old_png)
+
+def _disk_paths(key, ext="png"):
+    """Chart and meta files for a key (the chart's extension follows its format)"""
+    return os.path.join(CHART_CACHE_DIR, f"{key}.{ext}"), os.path.join(CHART_CACHE_DIR, f"{key}.json")
+
+def _disk_get(key):
+    # The format in use first; the other only for charts cached with an explicit fmt
+    for ext in sorted(CHART_FORMATS, key=lambda f: f != chart_format()):
+        chart_path, meta_path = _disk_paths(key, ext)
+        try:
+            with open(chart_path, "rb") as f:
+                png = f.read()
+            meta = None
+            if os.path.exists(meta_path):
+                with open(meta_path, "r") as f:
+                    meta = json.load(f)
+            os.utime(chart_path, None)
+            return png, meta
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError):
+            return None
+    return None
+
+def _disk_put(key, png, meta):
+    chart_path, meta_path = _disk_paths(key, "svg" if is_svg(png) else "png")
+    try:
+        os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+        if meta is not None:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        tmp_path = f"{chart_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, chart_path)
+        _disk_evict()
+    except OSError as e:
+        log.warning(f"[WARN] Could not write chart cache: {e}")
+
+def _disk_evict():
+    """Delete least recently used charts beyond CHART_CACHE_MAX_FILES"""
+    entries = [e for e in os.scandir(CHART_CACHE_DIR) if e.name.endswith(tuple(f".{f}" for f in CHART_FORMATS))]
+    excess = len(entries) - CHART_CACHE_MAX_FILES
+    if excess <= 0:
+        return
+
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:excess]:
+        key, ext = entry.name.rsplit(".", 1)
+        for path in _disk_paths(key, ext):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def get(key):
+    """
+    Look up a cached chart
+
+    Returns:
+        tuple: (png_bytes, meta) or None
+    """
+    if not CHART_CACHE_ENABLED:
+        return None
+
+    entry = _memory_get(key)
+    if entry is not None:
+        _stats["memory_hits"] += 1
+        metrics.inc("chart_cache_hits", tier="memory")
+        return entry
+
+    entry = _disk_get(key)
+    if entry is not None:
+        _stats["disk_hits"] += 1
+        metrics.inc("chart_cache_hits", tier="disk")
+        _memory_put(key, *entry)
+        return entry
+
+    _stats["misses"] += 1
+    metrics.inc("chart_cache_misses")
+    return None
+
+def put(key, png, meta=None):
+    """Store a rendered chart in both tiers"""
+    if not CHART_CACHE_ENABLED or not png:
+        return
+    _memory_put(key, png, meta)
+    _disk_put(key, png, meta)
+
+def cached_render(key, render):
+    """
+    Return the cached PNG for key, rendering it with render() on a miss
+
+    render() must return (png_bytes, meta) or None on failure
+    """
+    entry = get(key)
+    if entry is None:
+        entry = render()
+        if entry is None:
+            return None
+        put(key, *entry)
+    return entry
+
+def get_cache_stats():
+    with _lock:
+        return dict(_stats, memory_entries=len(_memory), memory_bytes=_memory_bytes)
+
+def clear_cache(disk=True):
+    """Drop every cached chart"""
+    global _memory_bytes
+
+    with _lock:
+        _memory.clear()
+        _memory_bytes = 0
+
+    if disk and os.path.isdir(CHART_CACHE_DIR):
+        for entry in os.scandir(CHART_CACHE_DIR):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+# =============================================
+# RENDERING HELPERS
+# =============================================
+
+# Matplotlib writes alpha as an element "opacity" and bold as a numeric weight,
+# neither of which svglib understands
+_SVG_OPACITY = re.compile(rb"(?<![\w-])opacity:\s*([0-9.]+)")
+_SVG_BOLD = re.compile(rb"font-weight:\s*[6-9]00")
+
+def figure_png(fig, ax=None, dpi=100, tight=False, pad_inches=0.1, fmt=None):
+    """
+    Save a figure as chart bytes and record where ax landed in the image
+
+    Args:
+        fig: Matplotlib figure
+        ax: Axes whose data coordinates a later overlay will use
+        dpi: Output resolution (PNG pixels; SVG sizes are in points either way);
+             the output profile's dpi wins when it sets one
+        tight: Crop like bbox_inches="tight"
+        fmt: "png" or "svg" (defaults to chart_format())
+
+    Returns:
+        tuple: (chart_bytes, meta) where meta is None without ax
+    """
+    fmt = fmt or chart_format()
+    dpi = output_profiles.chart_dpi(dpi)
+
+    # Figure templates are reused, so leave them at their own dpi afterwards
+    fig_dpi = fig.get_dpi()
+    fig.set_dpi(dpi)
+    try:
+        fig.canvas.draw()
+        renderer = fig.canvas.get_renderer()
+
+        bbox_inches = None
+        offset_x, offset_y = 0.0, 0.0
+        width, height = fig.get_size_inches() * dpi
+
+        if tight:
+            bbox_inches = fig.get_tightbbox(renderer).padded(pad_inches)
+            offset_x, offset_y = bbox_inches.x0 * dpi, bbox_inches.y0 * dpi
+            width, height = bbox_inches.width * dpi, bbox_inches.height * dpi
+
+        buf = BytesIO()
+        if fmt == "svg":
+            import matplotlib
+            # Text stays text (the PDF's own Helvetica) instead of glyph outlines: far smaller
+            # and quicker to embed. No creation date, so identical charts give identical bytes.
+            with matplotlib.rc_context({"svg.fonttype": "none"}):
+                fig.savefig(buf, format="svg", dpi=dpi, bbox_inches=bbox_inches, metadata={"Date": None})
+            png = _SVG_OPACITY.sub(rb"fill-opacity: \1; stroke-opacity: \1", buf.getvalue())
+            png = _SVG_BOLD.sub(b"font-weight: bold", png)
+        else:
+            fig.savefig(buf, format="png", dpi=dpi, bbox_inches=bbox_inches)
+            png = buf.getvalue()
+
+        meta = None
+        if ax is not None:
+            box = ax.get_window_extent(renderer)
+            meta = {
+                "dpi": dpi,
+                "size": [width, height],
+                "axes": [box.x0 - offset_x, box.y0 - offset_y, box.width, box.height],
+                "xlim": list(ax.get_xlim()),
+                "ylim": list(ax.get_ylim())
+            }
+    finally:
+        fig.set_dpi(fig_dpi)
+
+    return png, meta
+
+def is_svg(chart):
+    """True for SVG chart bytes"""
+    return chart[:100].lstrip().startswith((b"<?xml", b"<svg"))
+
+def overlay_time_marker(png, meta, when, label=None, **line_kwargs):
+    """
+    Draw a vertical "now" marker over a cached base chart
+
+    Args:
+        png: Base chart PNG bytes
+        meta: Meta from figure_png()
+        when: datetime for the marker
+        label: Optional text drawn at the top of the marker
+        **line_kwargs: Line style (color, lw, ls...)
+
+    Returns:
+        bytes: Composited chart (the base unchanged if when is off the x axis)
+    """
+    import matplotlib.dates as mdates
+    import matplotlib.image as mimage
+    from core.chart_render import new_figure
+
+    x = mdates.date2num(when)
+    x0, x1 = meta["xlim"]
+    if not (min(x0, x1) <= x <= max(x0, x1)):
+        return png
+
+    if is_svg(png):
+        return _overlay_svg_marker(png, meta, x, label, **line_kwargs)
+
+    base = mimage.imread(BytesIO(png), format="png")
+    img_h, img_w = base.shape[:2]
+    dpi = meta["dpi"]
+
+    fig = new_figure((img_w / dpi, img_h / dpi), dpi=dpi)
+    fig.figimage(base, 0, 0, origin="upper")
+
+    ax_x, ax_y, ax_w, ax_h = meta["axes"]
+    ax = fig.add_axes([ax_x / img_w, ax_y / img_h, ax_w / img_w, ax_h / img_h])
+    ax.set_zorder(1)  # figure images draw after axes of equal zorder
+    ax.set_xlim(meta["xlim"])
+    ax.set_ylim(meta["ylim"])
+    ax.axis("off")
+    ax.patch.set_alpha(0)
+
+    ax.axvline(x, **line_kwargs)
+    if label:
+        ax.text(x, meta["ylim"][1], label, color="black", fontweight="bold", va="bottom", ha="left", fontsize=9,
+                bbox=dict(boxstyle="round", facecolor="white", alpha=0.8))
+
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi)
+    return buf.getvalue()
+
+def _overlay_svg_marker(svg, meta, x, label=None, color="black", lw=1.5, ls="-", linestyle=None, linewidth=None,
+                        **_):
+    """
+    overlay_time_marker for SVG charts: append the marker as SVG elements
+
+    SVG user units are points with y pointing down, so the pixel geometry
+    in meta is scaled by 72 / dpi and flipped.
+    """
+    from xml.sax.saxutils import escape, quoteattr
+    from matplotlib.colors import to_hex
+
+    lw = linewidth if linewidth is not None else lw
+    ls = linestyle if linestyle is not None else ls
+    scale = 72.0 / meta["dpi"]
+    height = meta["size"][1]
+    ax_x, ax_y, ax_w, ax_h = meta["axes"]
+    x0, x1 = meta["xlim"]
+
+    px = (ax_x + (x - x0) / (x1 - x0) * ax_w) * scale
+    top = (height - ax_y - ax_h) * scale
+    bottom = (height - ax_y) * scale
+
+    # Matplotlib's dash patterns, which scale with the line width
+    dashes = {"--": (3.7, 1.6), "dashed": (3.7, 1.6), ":": (1, 1.65), "dotted": (1, 1.65),
+              "-.": (6.4, 1.6, 1, 1.6), "dashdot": (6.4, 1.6, 1, 1.6)}.get(ls)
+    dash = f' stroke-dasharray="{",".join(f"{d * lw:.2f}" for d in dashes)}"' if dashes else ""
+
+    parts = [f'<g id="time_marker"><path d="M {px:.2f} {top:.2f} L {px:.2f} {bottom:.2f}" '
+             f'style="fill:none;stroke:{to_hex(color)};stroke-width:{lw}"{dash}/>']
+    if label:
+        # Rough text box: DejaVu Sans Bold averages about 0.62 em per character
+        width = len(label) * 9 * 0.62 + 4
+        parts.append(f'<rect x="{px:.2f}" y="{top - 15:.2f}" width="{width:.2f}" height="13" rx="3" '
+                     f'style="fill:#ffffff;fill-opacity:0.8;stroke:#000000;stroke-width:0.8"/>')
+        parts.append(f'<text x="{px + 2:.2f}" y="{top - 5:.2f}" font-family={quoteattr("DejaVu Sans")} '
+                     f'font-weight="bold" font-size="9" fill="#000000">{escape(label)}</text>')
+    parts.append("</g>")
+
+    end = svg.rindex(b"</svg>")
+    return svg[:end] + "".join(parts).encode("utf-8") + svg[end:]
@@ -0,0 +1,81 @@
+"""
+Chart Render - Pyplot-free, thread-safe figure handling for all workers
+Figures are plain matplotlib Figure objects on their own Agg canvas, so
+no global pyplot state is touched. Each chart keeps a reusable template
+per thread: the axes scaffold (twin axes, spines, labels, formatters) is
+built once and only the data artists are swapped on later renders.
+"""
+
+import threading
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from core import output_profiles
+
+_local = threading.local()
+_SUBPLOT_PARAMS = ("left", "bottom", "right", "top", "wspace", "hspace")
+
+# =============================================
+# FIGURES
+# =============================================
+
+def new_figure(figsize, dpi=100):
+    """Create a Figure attached to its own Agg canvas"""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+def clear_data(axes):
+    """Remove data artists and the legend from axes, keeping their scaffold"""
+    for ax in axes:
+        for artist in list(ax.lines) + list(ax.collections) + list(ax.patches) + list(ax.texts) + list(ax.images):
+            artist.remove()
+        # bar() and errorbar() keep a container per call that holds on to the removed artists
+        ax.containers.clear()
+
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.remove()
+
+        ax.relim()
+
+# =============================================
+# TEMPLATES
+# =============================================
+
+def get_template(name, build):
+    """
+    Return this thread's figure and axes for a chart, ready for new data
+
+    Args:
+        name: Chart name (one template per name per thread)
+        build: Function returning (fig, axes) with the static scaffold drawn
+
+    Returns:
+        tuple: (fig, axes) as returned by build
+    """
+    templates = getattr(_local, "templates", None)
+    if templates is None:
+        templates = _local.templates = {}
+
+    # Chart dimensions follow the output profile, with one template per size
+    scale = output_profiles.figure_scale()
+    entry = templates.get((name, scale))
+    if entry is None:
+        fig, axes = build()
+        if scale != 1.0:
+            fig.set_size_inches(fig.get_size_inches() * scale)
+        layout = {k: getattr(fig.subplotpars, k) for k in _SUBPLOT_PARAMS}
+        entry = templates[(name, scale)] = (fig, axes, layout)
+    else:
+        fig, axes, layout = entry
+        clear_data(axes if isinstance(axes, (tuple, list)) else (axes,))
+        # tight_layout starts from the current positions, so start every render from the same place
+        fig.subplots_adjust(**layout)
+
+    return fig, axes
+
+def clear_templates():
+    """Drop this thread's templates (e.g. after changing figure settings)"""
+    _local.templates = {}
@@ -0,0 +1,204 @@
+"""
+Combined Report Generator - Surf, sky and weather in one PDF
+Fetches the union of the three workers' variables in one request, runs
+each worker's analysis and charts on its share of the response, and
+builds a single document with one section per report (each section keeps
+its own page margins).
+"""
+
+import os
+from datetime import datetime
+from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, NextPageTemplate, PageBreak
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+
+from config.settings import BASE_OUTPUT
+from core import forecast_cache, pdf_render, metrics, spatial_index, report_catalog, output_profiles, bulk_fetch
+from core import surf_worker, sky_worker, weather_worker
+
+log = metrics.get_logger("combined")
+
+# (section, worker, report type), in page order
+SECTIONS = (
+    ("surf", surf_worker, "Surf"),
+    ("sky", sky_worker, "Sky"),
+    ("weather", weather_worker, "Weather")
+)
+
+# =============================================
+# FETCH COMBINED DATA
+# =============================================
+
+SECTION_VARS = {
+    "surf": (surf_worker.SURF_HOURLY_VARS, []),
+    "sky": (sky_worker.SKY_HOURLY_VARS, []),
+    "weather": (weather_worker.WEATHER_HOURLY_VARS, weather_worker.WEATHER_DAILY_VARS)
+}
+COMBINED_HOURLY_VARS = bulk_fetch._union(*(hourly for hourly, _ in SECTION_VARS.values()))
+COMBINED_DAILY_VARS = bulk_fetch._union(*(daily for _, daily in SECTION_VARS.values()))
+COMBINED_FORECAST_DAYS = max(surf_worker.SURF_FORECAST_DAYS, sky_worker.SKY_FORECAST_DAYS,
+                             weather_worker.DAILY_FORECAST_DAYS)
+
+def _section_response(data, hourly, daily):
+    """The part of a combined response one worker would have fetched itself"""
+    response = {key: value for key, value in data.items() if key not in ("hourly", "daily")}
+    response["hourly"] = {var: data["hourly"][var] for var in ["time"] + hourly}
+    if daily:
+        response["daily"] = {var: data["daily"][var] for var in ["time"] + daily}
+    return response
+
+def parse_combined_data(data):
+    """
+    Build every worker's data from one Open-Meteo location response
+
+    Returns:
+        dict: {"surf": DataFrame, "sky": DataFrame, "weather": (hourly_df, daily_df)}
+    """
+    parsers = {"surf": surf_worker.parse_surf_data, "sky": sky_worker.parse_sky_data,
+               "weather": weather_worker.parse_weather_data}
+    return {name: parsers[name](_section_response(data, *SECTION_VARS[name])) for name in parsers}
+
+def fetch_combined_data(lat, lon):
+    """Fetch surf, sky and weather data with one Open-Meteo request"""
+    try:
+        log.debug(f"[FETCH] Fetching combined data for {lat}, {lon}")
+
+        lat, lon = spatial_index.fetch_coords(lat, lon)
+        with metrics.span("fetch", report="combined"):
+            data = forecast_cache.get_forecast(lat, lon, hourly=COMBINED_HOURLY_VARS, daily=COMBINED_DAILY_VARS,
+                                               forecast_days=COMBINED_FORECAST_DAYS, models="best_match")
+        with metrics.span("parse", report="combined"):
+            frames = parse_combined_data(data)
+
+        log.debug(f"[OK] Got {len(frames['surf'])} hourly records")
+        return frames
+
+    except Exception as e:
+        log.error(f"[ERROR] Failed to fetch combined data: {e}")
+        return None
+
+# =============================================
+# REPORT STAGES
+# =============================================
+
+def fetch_data(coords):
+    """Stage 1: fetch every section's data for (lat, lon)"""
+    lat, lon = coords
+    data = fetch_combined_data(lat, lon)
+
+    if data is None:
+        raise Exception("Failed to fetch combined data")
+
+    return data
+
+def analyze_data(data):
+    """Stage 2: each worker's analysis of its section"""
+    return {name: worker.analyze_data(data[name]) for name, worker, _ in SECTIONS}
+
+def render_charts(data, summary=None, location=None):
+    """Stage 3: every section's charts, {section: [PNG bytes or None, ...]}"""
+    summary = summary or {}
+    charts = {}
+    for name, worker, _ in SECTIONS:
+        kwargs = {"location": location} if worker is sky_worker else {}
+        charts[name] = worker.render_charts(data[name], summary.get(name), **kwargs)
+    return charts
+
+# Bump when the layout changes; the section workers' own versions are included too
+REPORT_VERSION = 1
+
+def report_fingerprint(location, coords, data, summary, now=None):
+    """Hash of everything a report is built from: each section's own fingerprint plus the combined layout"""
+    sections = tuple(worker.report_fingerprint(location, coords, data[name], summary[name], now)
+                     for name, worker, _ in SECTIONS)
+    return report_catalog.input_hash("Combined", sections=sections, version=REPORT_VERSION)
+
+def report_path(location, output_dir=BASE_OUTPUT):
+    """Create the location folder and return a timestamped PDF path"""
+    loc_dir = output_profiles.report_dir(output_dir, location)
+    os.makedirs(loc_dir, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
+    filename = f"Combined_Report_{location}_{timestamp}.pdf"
+    return os.path.join(loc_dir, filename)
+
+def _page_template(name, worker):
+    """A4 page with the section worker's margins (ReportLab's 1 inch default where it sets none)"""
+    margins = dict({"leftMargin": inch, "rightMargin": inch, "topMargin": inch, "bottomMargin": inch},
+                   **worker.PAGE_MARGINS)
+    width, height = A4
+    frame = Frame(margins["leftMargin"], margins["bottomMargin"],
+                  width - margins["leftMargin"] - margins["rightMargin"],
+                  height - margins["topMargin"] - margins["bottomMargin"], id=name)
+    return PageTemplate(id=name, frames=[frame], pagesize=A4)
+
+def build_pdf(location, report_type, coords, summary, charts, save_path):
+    """Stage 4: one document with every section, each starting on a new page (save_path may be a file-like object)"""
+    doc = BaseDocTemplate(save_path, pagesize=A4)
+    doc.addPageTemplates([_page_template(name, worker) for name, worker, _ in SECTIONS])
+
+    story = []
+    for i, (name, worker, section_type) in enumerate(SECTIONS):
+        if i:
+            story += [NextPageTemplate(name), PageBreak()]
+        story += worker.build_story(location, section_type, coords, summary[name], charts[name])
+
+    with metrics.span("pdf", report="combined"):
+        doc.build(story)
+    metrics.inc("bytes_written", pdf_render.pdf_size(save_path), report="combined", profile=output_profiles.active_name())
+    return save_path
+
+# =============================================
+# GENERATE COMPLETE PDF REPORT
+# =============================================
+
+def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT, data=None, force=False, output="file"):
+    """
+    Generate the combined surf, sky and weather report PDF
+
+    Args:
+        data: Optional prefetched {"surf", "sky", "weather"} data (e.g. from a bulk fetch)
+        force: Rebuild even if the forecast is unchanged since the last report
+        output: "file" (save under output_dir, return the path), "bytes" (return the PDF
+                without saving) or a writable file-like object to stream it to
+    """
+    try:
+        log.info(f"\n{'='*50}")
+        log.info(f"GENERATING COMBINED REPORT: {location}")
+        log.info(f"{'='*50}")
+
+        data = data if data is not None else fetch_data(coords)
+
+        summary = analyze_data(data)
+        fingerprint = report_fingerprint(location, coords, data, summary)
+        # Only the default profile's reports are catalogued
+        catalogued = output_profiles.is_default()
+        existing = None
+        if catalogued and not force:
+            existing = report_catalog.unchanged_report(location, "Combined", fingerprint, output_dir)
+        if existing:
+            log.info(f"[OK] Forecast unchanged, keeping: {existing}")
+            log.info(f"{'='*50}\n")
+            return pdf_render.existing_pdf(existing, output)
+
+        save_path = pdf_render.pdf_target(output, lambda: report_path(location, output_dir))
+
+        log.info("[INFO] Generating charts...")
+        charts = render_charts(data, summary, location)
+
+        build_pdf(location, report_type, coords, summary, charts, save_path)
+        if output != "file":
+            log.info(f"[OK] Report built, not saved: {pdf_render.pdf_size(save_path)} bytes")
+            log.info(f"{'='*50}\n")
+            return pdf_render.pdf_result(save_path, output)
+        if catalogued:
+            report_catalog.record_report(save_path, location, "Combined", input_hash=fingerprint, output_dir=output_dir)
+
+        log.info(f"[OK] Report saved: {save_path}")
+        log.info(f"{'='*50}\n")
+        return save_path
+
+    except Exception as e:
+        log.exception(f"[ERROR] {e}")
+        log.info(f"{'='*50}\n")
+        raise
@@ -0,0 +1,246 @@
+"""
+Forecast Archive - Columnar history of every fetched hourly series
+Each fetched forecast is written into one float32 file per location,
+variable and month (<archive>/<lat>_<lon>/<variable>/<YYYY-MM>.f32),
+one slot per UTC hour with NaN where nothing was fetched. A later
+forecast for the same hour overwrites the earlier one, so past hours
+hold the last forecast issued for them. Writes are queued to one
+background thread, which merges everything waiting into one open and
+flush per month file, so fetches never wait on the archive. Reads
+memory-map only the months asked for, so a season of one variable is
+a few kilobytes of I/O.
+"""
+
+import os
+import queue
+import atexit
+import threading
+
+import numpy as np
+
+from config.settings import FORECAST_ARCHIVE_DIR, FORECAST_ARCHIVE_ENABLED, FORECAST_CACHE_PRECISION
+from core import metrics
+
+log = metrics.get_logger("forecast_archive")
+
+DTYPE = np.float32
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+# =============================================
+# LAYOUT
+# =============================================
+
+def _point_dir(lat, lon):
+    """Archive folder for a fetch point (rounded like forecast cache keys)"""
+    p = FORECAST_CACHE_PRECISION
+    return os.path.join(FORECAST_ARCHIVE_DIR, f"{round(float(lat), p):.{p}f}_{round(float(lon), p):.{p}f}")
+
+def _month_path(lat, lon, variable, month):
+    return os.path.join(_point_dir(lat, lon), variable, f"{month}.f32")
+
+def _month_hours(month):
+    """Number of hourly slots in a datetime64[M] month"""
+    return int(((month + 1).astype("datetime64[h]") - month.astype("datetime64[h]")).astype(np.int64))
+
+def _open_month(path, month, create=False):
+    """Memory-map one month file, creating it full of NaN if asked"""
+    shape = (_month_hours(month),)
+
+    if not os.path.exists(path):
+        if not create:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        np.full(shape, np.nan, dtype=DTYPE).tofile(tmp_path)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+
+    return np.memmap(path, dtype=DTYPE, mode="r+" if create else "r", shape=shape)
+
+# =============================================
+# WRITES
+# =============================================
+
+def utc_hours(data):
+    """
+    Hourly times of an Open-Meteo response as UTC hours
+
+    Responses are in the location's local time (timezone=auto), which
+    repeats or skips an hour at DST changes; utc_offset_seconds turns
+    them back into one continuous UTC axis. Half-hour zones land in the
+    UTC hour they start in.
+
+    Returns:
+        ndarray: datetime64[h] array, one entry per hourly value
+    """
+    local = np.array(data["hourly"]["time"], dtype="datetime64[m]")
+    offset = np.timedelta64(int(data.get("utc_offset_seconds") or 0), "s")
+    return (local - offset).astype("datetime64[h]")
+
+def append(lat, lon, data):
+    """
+    Queue the hourly block of one Open-Meteo response for archiving
+
+    Called for every forecast the forecast cache stores. Errors are
+    logged, never raised, so a full disk never fails a report.
+
+    Returns:
+        int: Number of values queued
+    """
+    hourly = (data or {}).get("hourly") or {}
+    if not FORECAST_ARCHIVE_ENABLED or not hourly.get("time"):
+        return 0
+
+    try:
+        hours = utc_hours(data)
+        columns = {var: np.array(values, dtype=DTYPE) for var, values in hourly.items()
+                   if var != "time" and len(values) == len(hours)}
+    except (ValueError, TypeError) as e:
+        log.warning(f"[WARN] Forecast not archived for {lat}, {lon}: {e}")
+        return 0
+
+    _start_writer()
+    _queue.put((lat, lon, hours, columns))
+    return len(hours) * len(columns)
+
+def _start_writer():
+    """Start the background thread that writes queued forecasts"""
+    global _writer
+
+    if _writer is not None:
+        return
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="forecast-archive", daemon=True)
+            _writer.start()
+
+def _run_writer():
+    while True:
+        batch = [_queue.get()]
+        while True:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            log.warning(f"[WARN] {len(batch)} forecasts not archived: {e}")
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+def _write_batch(batch):
+    """Write queued forecasts, opening and flushing each month file once"""
+    updates = {}
+    for lat, lon, hours, columns in batch:
+        months = hours.astype("datetime64[M]")
+        for month in np.unique(months):
+            rows = months == month
+            slots = (hours[rows] - month.astype("datetime64[h]")).astype(np.int64)
+            for var, values in columns.items():
+                # In queue order, so a later forecast for the same hour wins
+                updates.setdefault((_month_path(lat, lon, var, month), month), []).append((slots, values[rows]))
+
+    written = 0
+    with metrics.span("archive"):
+        for (path, month), writes in updates.items():
+            try:
+                mm = _open_month(path, month, create=True)
+                for slots, values in writes:
+                    mm[slots] = values
+                    written += len(slots)
+                mm.flush()
+                del mm
+            except (OSError, ValueError) as e:
+                log.warning(f"[WARN] Forecast not archived in {path}: {e}")
+
+    metrics.inc("archive_values", written)
+    return written
+
+def flush():
+    """Wait until every queued forecast is written (called at exit)"""
+    if _writer is not None:
+        _queue.join()
+
+atexit.register(flush)
+
+# =============================================
+# READS
+# =============================================
+
+def read_series(lat, lon, variable, start, end):
+    """
+    Hourly values of one variable between two UTC times (end exclusive)
+
+    Only the month files covering the range are mapped; months with no
+    file come back as NaN.
+
+    Returns:
+        tuple: (UTC times datetime64[h] array, float32 values array)
+    """
+    start = np.datetime64(start, "h")
+    end = np.datetime64(end, "h")
+    times = np.arange(start, end, dtype="datetime64[h]")
+    values = np.full(len(times), np.nan, dtype=DTYPE)
+
+    month = start.astype("datetime64[M]")
+    while month.astype("datetime64[h]") < end:
+        mm = _open_month(_month_path(lat, lon, variable, month), month)
+        if mm is not None:
+            month_start = month.astype("datetime64[h]")
+            lo = max(start, month_start)
+            hi = min(end, (month + 1).astype("datetime64[h]"))
+            out = int((lo - start) / np.timedelta64(1, "h"))
+            src = int((lo - month_start) / np.timedelta64(1, "h"))
+            n = int((hi - lo) / np.timedelta64(1, "h"))
+            values[out:out + n] = mm[src:src + n]
+            del mm
+        month += 1
+
+    return times, values
+
+def read_history(lat, lon, variables, start, end):
+    """
+    History of several variables as a DataFrame shaped like the workers' frames
+
+    Returns:
+        DataFrame: "time" column (UTC) plus one float32 column per variable
+    """
+    import pandas as pd
+
+    df = None
+    for variable in variables:
+        times, values = read_series(lat, lon, variable, start, end)
+        if df is None:
+            df = pd.DataFrame({"time": pd.to_datetime(times)})
+        df[variable] = values
+
+    return df if df is not None else pd.DataFrame({"time": []})
+
+def location_history(location, variables, start, end):
+    """History for a catalog location, read from the point its forecasts are fetched at"""
+    from config.settings import BASE_OUTPUT
+    from core import spatial_index
+    from core.location_manager import LocationManager
+
+    coords = LocationManager(BASE_OUTPUT).get_coordinates(location)
+    if coords is None:
+        raise KeyError(f"Unknown location: {location}")
+
+    lat, lon = spatial_index.fetch_coords(*coords)
+    return read_history(lat, lon, variables, start, end)
+
+def archived_variables(lat, lon):
+    """Variables with any history for a fetch point"""
+    try:
+        return sorted(os.listdir(_point_dir(lat, lon)))
+    except OSError:
+        return []
@@ -0,0 +1,282 @@
+"""
+Forecast Cache - Persistent on-disk cache in front of the Open-Meteo client
+Entries are keyed by rounded lat/lon, variable set and forecast_days.
+Fresh entries are served directly, stale ones are served immediately and
+refreshed in the background, and offline mode replays the cache only.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from config.settings import (CACHE_DIR, FORECAST_CACHE_TTL, FORECAST_CACHE_MAX_STALE, FORECAST_CACHE_MAX_ENTRIES,
+                             FORECAST_CACHE_PRECISION, FORECAST_CACHE_OFFLINE)
+from core import api_client, forecast_archive, metrics
+
+log = metrics.get_logger("forecast_cache")
+
+FORECAST_CACHE_DIR = os.path.join(CACHE_DIR, "forecasts")
+
+_offline = FORECAST_CACHE_OFFLINE
+_refreshing = set()
+_refresh_lock = threading.Lock()
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+class ForecastCacheMiss(LookupError):
+    """Raised in offline mode when a forecast is not in the cache"""
+
+# =============================================
+# KEYS AND STORAGE
+# =============================================
+
+def make_key(lat, lon, hourly=None, daily=None, forecast_days=7, **extra):
+    """Build the cache key for one forecast request"""
+    return {
+        "lat": round(float(lat), FORECAST_CACHE_PRECISION),
+        "lon": round(float(lon), FORECAST_CACHE_PRECISION),
+        "hourly": sorted(hourly or []),
+        "daily": sorted(daily or []),
+        "forecast_days": int(forecast_days),
+        "extra": {k: str(v) for k, v in sorted(extra.items())}
+    }
+
+def _entry_path(key):
+    """File path for a cache key"""
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(FORECAST_CACHE_DIR, f"{digest}.json")
+
+def _read_entry(path):
+    """Read a cache entry, returning None if missing or unreadable"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_entry(key, data):
+    """Atomically write a cache entry and enforce the size bound"""
+    path = _entry_path(key)
+    os.makedirs(FORECAST_CACHE_DIR, exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"key": key, "fetched_at": time.time(), "data": data}, f)
+    os.replace(tmp_path, path)
+
+    # Every fresh API response passes through here, so this is the one place history is kept
+    forecast_archive.append(key["lat"], key["lon"], data)
+    _evict()
+
+def _touch(path):
+    """Mark an entry as recently used (mtime doubles as the LRU clock)"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _evict():
+    """Delete least recently used entries beyond FORECAST_CACHE_MAX_ENTRIES"""
+    try:
+        entries = [e for e in os.scandir(FORECAST_CACHE_DIR) if e.name.endswith(".json")]
+    except OSError:
+        return
+
+    excess = len(entries) - FORECAST_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:excess]:
+        try:
+            os.remove(entry.path)
+            _count("evictions")
+        except OSError:
+            pass
+
+def _count(name, value=1):
+    with _stats_lock:
+        _stats[name] += value
+    metrics.inc(f"forecast_cache_{name}", value)
+
+# =============================================
+# LOOKUPS
+# =============================================
+
+def _lookup(key):
+    """
+    Look up a key
+
+    Returns:
+        tuple: (data, state) where state is "fresh", "stale" or "miss"
+    """
+    path = _entry_path(key)
+    entry = _read_entry(path)
+
+    if entry is None:
+        return None, "miss"
+
+    age = time.time() - entry.get("fetched_at", 0)
+
+    # Inside require_fresh() anything fetched before the cut-off is refetched
+    max_age = getattr(_local, "max_age", None)
+    if max_age is not None and not _offline and age > max_age:
+        return None, "miss"
+
+    if _offline or age < FORECAST_CACHE_TTL:
+        _touch(path)
+        return entry["data"], "fresh"
+
+    if age < FORECAST_CACHE_TTL + FORECAST_CACHE_MAX_STALE:
+        _touch(path)
+        return entry["data"], "stale"
+
+    return None, "miss"
+
+def _fetch_and_store(key, lat, lon, hourly, daily, forecast_days, extra):
+    """Fetch one forecast from the API and store it"""
+    data = api_client.fetch_forecast(lat, lon, hourly=hourly, daily=daily, forecast_days=forecast_days, **extra)
+    _write_entry(key, data)
+    return data
+
+def _refresh_in_background(keys, fetch):
+    """Run fetch() in a daemon thread unless these keys are already refreshing"""
+    ids = [_entry_path(key) for key in keys]
+
+    with _refresh_lock:
+        ids = [i for i in ids if i not in _refreshing]
+        if not ids:
+            return
+        _refreshing.update(ids)
+
+    def run():
+        try:
+            fetch()
+            _count("refreshes", len(ids))
+        except Exception as e:
+            log.warning(f"[WARN] Background forecast refresh failed: {e}")
+        finally:
+            with _refresh_lock:
+                _refreshing.difference_update(ids)
+
+    threading.Thread(target=run, name="forecast-refresh", daemon=True).start()
+
+def get_forecast(lat, lon, hourly=None, daily=None, forecast_days=7, **extra):
+    """
+    Cached equivalent of api_client.fetch_forecast()
+
+    Returns:
+        Decoded JSON response for the location
+
+    Raises:
+        ForecastCacheMiss: In offline mode when nothing is cached
+    """
+    key = make_key(lat, lon, hourly=hourly, daily=daily, forecast_days=forecast_days, **extra)
+    data, state = _lookup(key)
+
+    if state == "fresh":
+        _count("hits")
+        return data
+
+    if state == "stale":
+        _count("stale_hits")
+        _refresh_in_background([key], lambda: _fetch_and_store(key, lat, lon, hourly, daily, forecast_days, extra))
+        return data
+
+    if _offline:
+        raise ForecastCacheMiss(f"No cached forecast for {lat}, {lon} (offline mode)")
+
+    _count("misses")
+    return _fetch_and_store(key, lat, lon, hourly, daily, forecast_days, extra)
+
+def get_forecasts_bulk(coords, hourly=None, daily=None, forecast_days=7, batch_size=None, **extra):
+    """
+    Cached equivalent of api_client.fetch_forecast_bulk()
+
+    Only missing locations are fetched (in multi-location batches); stale
+    locations are returned as-is and refreshed together in the background.
+
+    Returns:
+        list: One decoded JSON response per location, in input order
+    """
+    keys = [make_key(lat, lon, hourly=hourly, daily=daily, forecast_days=forecast_days, **extra) for lat, lon in coords]
+    results = [None] * len(coords)
+    missing = []
+    stale = []
+
+    for i, key in enumerate(keys):
+        data, state = _lookup(key)
+        results[i] = data
+
+        if state == "fresh":
+            _count("hits")
+        elif state == "stale":
+            _count("stale_hits")
+            stale.append(i)
+        else:
+            missing.append(i)
+
+    def fetch(indices):
+        responses = api_client.fetch_forecast_bulk([coords[i] for i in indices], hourly=hourly, daily=daily,
+                                                   forecast_days=forecast_days, batch_size=batch_size, **extra)
+        for i, data in zip(indices, responses):
+            _write_entry(keys[i], data)
+        return responses
+
+    if stale:
+        _refresh_in_background([keys[i] for i in stale], lambda: fetch(stale))
+
+    if missing:
+        if _offline:
+            raise ForecastCacheMiss(f"{len(missing)} locations not cached (offline mode)")
+
+        _count("misses", len(missing))
+        for i, data in zip(missing, fetch(missing)):
+            results[i] = data
+
+    return results
+
+# =============================================
+# CONTROL
+# =============================================
+
+def set_offline(offline=True):
+    """Enable or disable offline replay-only mode"""
+    global _offline
+    _offline = bool(offline)
+
+def is_offline():
+    return _offline
+
+@contextmanager
+def require_fresh(max_age):
+    """
+    Treat entries older than max_age seconds as misses in this thread
+
+    Used by the scheduler so a refresh after a model run never reuses a
+    forecast cached (or served stale) from before it.
+    """
+    previous = getattr(_local, "max_age", None)
+    _local.max_age = max_age
+    try:
+        yield
+    finally:
+        _local.max_age = previous
+
+def get_cache_stats():
+    """Return hit/miss/refresh/eviction counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+def clear_cache():
+    """Delete every cached forecast"""
+    try:
+        for entry in os.scandir(FORECAST_CACHE_DIR):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
+    except OSError:
+        pass
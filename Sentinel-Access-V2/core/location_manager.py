@@ -1,13 +1,142 @@
 """
 Location Manager - Handles all location operations
-Reads from locations.json file
+Reads from locations.json file into a shared in-memory store that is
+only re-read when the file changes
 """
 
 import os
 import json
+import threading
 from pathlib import Path
 from datetime import datetime
 
+def normalize_coords(coords):
+    """
+    Convert a stored location entry to a (latitude, longitude) tuple
+    
+    Accepts both the [lat, lon] list format and the
+    {"latitude": ..., "longitude": ...} dict format
+    """
+    if isinstance(coords, dict):
+        return float(coords["latitude"]), float(coords["longitude"])
+    
+    lat, lon = coords
+    return float(lat), float(lon)
+
+# =============================================
+# LOCATION STORE
+# =============================================
+
+class LocationStore:
+    """
+    Names plus contiguous float64 latitude/longitude arrays for one locations file
+    
+    Shared by every LocationManager reading the same file; reloads only
+    when the file's mtime or size changes
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.names = []
+        self.index = {}
+        self.lats = None
+        self.lons = None
+        self.invalid = {}  # raw entries that could not be parsed, kept so rewrites don't drop them
+        self.read_error = None
+        self._order = []
+        self._coords = {}
+        self._stamp = ()  # never a real stamp, so the first refresh loads
+        self._lock = threading.Lock()
+    
+    def refresh(self):
+        """Reload the file if it changed since the last load"""
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        
+        if stamp == self._stamp:
+            return self
+        
+        with self._lock:
+            if stamp != self._stamp:
+                self._load(stamp)
+        return self
+    
+    def invalidate(self):
+        """Force a reload on the next lookup (e.g. after writing the file)"""
+        self._stamp = ()
+    
+    def _load(self, stamp):
+        import numpy as np
+        
+        raw = {}
+        read_error = None
+        if stamp is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    raw = json.load(f)
+            except Exception as e:
+                print(f"❌ Error reading locations.json: {e}")
+                raw = {}
+                read_error = e
+        
+        names = []
+        coords = {}
+        invalid = {}
+        for name, entry in raw.items():
+            try:
+                coords[name] = normalize_coords(entry)
+                names.append(name)
+            except (KeyError, TypeError, ValueError):
+                print(f"⚠️ Skipping location with bad coordinates: {name}")
+                invalid[name] = entry
+        
+        lats = np.fromiter((coords[name][0] for name in names), dtype=np.float64, count=len(names))
+        lons = np.fromiter((coords[name][1] for name in names), dtype=np.float64, count=len(names))
+        lats.flags.writeable = False
+        lons.flags.writeable = False
+        
+        # Swap everything in at once so readers never see a half-built store
+        self.names, self.index, self.lats, self.lons, self._coords = (
+            names, {name: i for i, name in enumerate(names)}, lats, lons, coords)
+        self.invalid, self.read_error, self._order = invalid, read_error, list(raw)
+        self._stamp = stamp
+        
+        if stamp is not None:
+            print(f"✅ Loaded {len(names)} locations from JSON")
+    
+    def get(self, name):
+        """(lat, lon) for a name or None"""
+        return self._coords.get(name)
+    
+    def as_dict(self):
+        """{name: (lat, lon)} for every location"""
+        return dict(self._coords)
+    
+    def file_entries(self):
+        """
+        Every entry in file order, as it should be written back: parsed
+        locations in [lat, lon] form, unparseable ones exactly as read
+        """
+        return {name: list(self._coords[name]) if name in self._coords else self.invalid[name]
+                for name in self._order}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(path):
+    """Return the refreshed shared store for a locations file"""
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, LocationStore(key))
+    
+    return store.refresh()
+
 class LocationManager:
     """Manages locations, their coordinates, and available reports"""
     
@@ -24,26 +153,29 @@ class LocationManager:
         if not self.locations_file.exists():
             print(f"⚠️ locations.json not found at: {self.locations_file}")
     
+    @property
+    def store(self):
+        """The shared LocationStore for this file, reloaded if the file changed"""
+        return get_store(self.locations_file)
+    
     def get_all_locations(self):
         """
         Read all locations from locations.json
         
         Returns:
-            dict: {location_name: coords_dict, ...}
+            dict: {location_name: (latitude, longitude), ...}
         """
-        locations = {}
-        
-        try:
-            if self.locations_file.exists():
-                with open(self.locations_file, 'r') as f:
-                    locations = json.load(f)
-                print(f"✅ Loaded {len(locations)} locations from JSON")
-            else:
-                print(f"❌ locations.json not found at {self.locations_file}")
-        except Exception as e:
-            print(f"❌ Error reading locations.json: {e}")
+        return self.store.as_dict()
+    
+    def get_coordinate_arrays(self):
+        """
+        All locations as arrays for vectorized work
         
-        return locations
+        Returns:
+            tuple: (names, latitudes, longitudes) with read-only float64 arrays in the same order as names
+        """
+        store = self.store
+        return store.names, store.lats, store.lons
     
     def add_location(self, location_name, latitude, longitude):
         """
@@ -58,23 +190,26 @@ class LocationManager:
             bool: True if successful
         """
         try:
-            # Read existing locations
-            if self.locations_file.exists():
-                with open(self.locations_file, 'r') as f:
-                    locations = json.load(f)
-            else:
-                locations = {}
+            store = self.store
+            if store.read_error is not None:
+                # Rewriting would replace the whole file with just the new location
+                print(f"❌ Not adding {location_name}: locations.json could not be read ({store.read_error})")
+                return False
             
-            # Add new location
-            locations[location_name] = {
-                "latitude": latitude,
-                "longitude": longitude
-            }
+            # Parsed entries are written in the file's [lat, lon] format, unparseable ones are kept as they were
+            locations = store.file_entries()
+            locations[location_name] = list(normalize_coords((latitude, longitude)))
+            kept = [name for name in store.invalid if name != location_name]
+            if kept:
+                print(f"⚠️ Keeping locations with bad coordinates unchanged: {', '.join(kept)}")
             
             # Write back to file
             self.locations_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.locations_file, 'w') as f:
+            tmp_file = self.locations_file.with_name(f"{self.locations_file.name}.{os.getpid()}.tmp")
+            with open(tmp_file, 'w') as f:
                 json.dump(locations, f, indent=2)
+            os.replace(tmp_file, self.locations_file)
+            store.invalidate()
             
             print(f"✅ Location added: {location_name}")
             return True
@@ -85,8 +220,7 @@ class LocationManager:
     
     def location_exists(self, location_name):
         """Check if a location exists"""
-        locations = self.get_all_locations()
-        return location_name in locations
+        return location_name in self.store.index
     
     def get_coordinates(self, location_name):
         """
@@ -96,10 +230,9 @@ class LocationManager:
             location_name: Name of location
         
         Returns:
-            dict: {latitude, longitude} or None
+            tuple: (latitude, longitude) or None
         """
-        locations = self.get_all_locations()
-        return locations.get(location_name)
+        return self.store.get(location_name)
     
     def get_available_reports(self, location_name):
         """
@@ -109,23 +242,15 @@ class LocationManager:
             location_name: Name of location
         
         Returns:
-            dict: {report_type: [list of files], ...}
+            dict: {report_type: [list of files], ...} newest first
         """
-        reports = {'Surf': [], 'Sky': []}
+        from core import report_catalog
+        
+        reports = {report_type: [] for report_type in report_catalog.REPORT_TYPES}
         
         try:
-            # Try to find reports in folder if it exists
-            loc_dir = self.base_path / location_name
-            if loc_dir.exists():
-                for file in loc_dir.iterdir():
-                    if file.is_file() and file.suffix == '.pdf':
-                        if 'surf' in file.name.lower():
-                            reports['Surf'].append(file.name)
-                        elif 'sky' in file.name.lower():
-                            reports['Sky'].append(file.name)
-                
-                reports['Surf'].sort(reverse=True)
-                reports['Sky'].sort(reverse=True)
+            for row in report_catalog.list_reports(location_name, output_dir=str(self.base_path)):
+                reports[row['report_type']].append(os.path.basename(row['path']))
         except Exception as e:
             print(f"⚠️ Error getting reports: {e}")
         
@@ -133,13 +258,20 @@ class LocationManager:
     
     def get_latest_report(self, location_name, report_type):
         """Get the latest report file for a location and type"""
-        reports = self.get_available_reports(location_name)
+        from core import report_catalog
         
-        if reports.get(report_type):
-            latest = reports[report_type][0]
-            return self.base_path / location_name / latest
+        try:
+            row = report_catalog.latest_report(location_name, report_type, output_dir=str(self.base_path))
+        except Exception as e:
+            print(f"⚠️ Error getting reports: {e}")
+            return None
         
-        return None
+        return Path(row['path']) if row else None
+    
+    def rebuild_report_catalog(self):
+        """Re-index every report PDF under the storage folder"""
+        from core import report_catalog
+        return report_catalog.rebuild(str(self.base_path))
     
     def export_to_csv(self, csv_path):
         """Export all locations to CSV file"""
@@ -151,9 +283,7 @@ class LocationManager:
             with open(csv_path, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['Location', 'Latitude', 'Longitude'])
-                for loc_name, coords in sorted(locations.items()):
-                    lat = coords.get('latitude', '')
-                    lon = coords.get('longitude', '')
+                for loc_name, (lat, lon) in sorted(locations.items()):
                     writer.writerow([loc_name, lat, lon])
             
             print(f"✅ CSV exported to: {csv_path}")
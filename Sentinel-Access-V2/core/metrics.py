@@ -0,0 +1,308 @@
+"""
+Metrics - Stage timing, counters and non-blocking logging for all workers
+Spans time a stage (fetch, parse, analysis, chart, pdf...) and counters
+track cache hits, API calls, bytes written and failures. Every span is
+also written as one JSON line, and the aggregates can be exported in
+the Prometheus text format. Log records go through a QueueHandler so
+the hot path never waits on stdout or disk; the listener thread and the
+events file only start with the first record, not at import.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import warnings
+import threading
+import logging.handlers
+from contextlib import contextmanager
+
+from config.settings import LOG_LEVEL, METRICS_ENABLED, METRICS_JSONL, METRICS_PROM_FILE, METRICS_PROM_INTERVAL
+
+_counters = {}
+_spans = {}
+_lock = threading.Lock()
+
+_log_queue = queue.SimpleQueue()
+_configured = False
+_listener = None
+_listener_lock = threading.Lock()
+
+_prom_timer = None
+_prom_last = 0.0
+_prom_lock = threading.Lock()
+
+EVENTS_LOGGER = "sentinel.metrics.events"
+
+# =============================================
+# LOGGING
+# =============================================
+
+class _EventsOnly(logging.Filter):
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    def filter(self, record):
+        return (record.name == EVENTS_LOGGER) == self.events
+
+class _EventsFile(logging.FileHandler):
+    """JSON lines file, created with its folder on the first span event"""
+
+    def __init__(self, path):
+        super().__init__(path, encoding="utf-8", delay=True)
+        self.failed = False
+
+    def emit(self, record):
+        if self.failed:
+            return
+        if self.stream is None:
+            try:
+                os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+                self.stream = self._open()
+            except OSError as e:
+                self.failed = True
+                warnings.warn(f"Metrics events disabled: {e}", RuntimeWarning)
+                return
+        super().emit(record)
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that starts the listener with the first record"""
+
+    def enqueue(self, record):
+        _start_listener()
+        super().enqueue(record)
+
+def _configure():
+    """Point the "sentinel" loggers at the queue (no threads or files yet)"""
+    global _configured
+
+    with _listener_lock:
+        if _configured:
+            return
+
+        root = logging.getLogger("sentinel")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_LazyQueueHandler(_log_queue))
+        root.propagate = False
+
+        # Span events are recorded whatever the console log level is
+        logging.getLogger(EVENTS_LOGGER).setLevel(logging.INFO)
+        _configured = True
+
+def _start_listener():
+    """Start the background thread writing queued records to stdout and the events file"""
+    global _listener
+
+    if _listener is not None:
+        return
+
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter("%(message)s"))
+        console.addFilter(_EventsOnly(False))
+        handlers = [console]
+
+        if METRICS_ENABLED and METRICS_JSONL:
+            events = _EventsFile(METRICS_JSONL)
+            events.setFormatter(logging.Formatter("%(message)s"))
+            events.addFilter(_EventsOnly(True))
+            handlers.append(events)
+
+        _listener = logging.handlers.QueueListener(_log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+def get_logger(name):
+    """
+    Return a logger for a module ("surf", "api"...)
+
+    Messages keep the repo's [OK]/[ERROR] style and are written by a background thread
+    """
+    _configure()
+    return logging.getLogger(f"sentinel.{name}")
+
+def flush():
+    """Write out queued log records, span events and a pending Prometheus file (called at exit)"""
+    global _listener, _prom_timer
+
+    with _prom_lock:
+        pending, _prom_timer = _prom_timer, None
+    if pending is not None:
+        pending.cancel()
+        write_prometheus()
+
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            # A later record starts a new listener
+            _listener = None
+
+atexit.register(flush)
+
+# =============================================
+# COUNTERS AND SPANS
+# =============================================
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def inc(name, value=1, **labels):
+    """Add value to a counter (e.g. inc("api_calls"), inc("failures", stage="pdf"))"""
+    if not METRICS_ENABLED:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, ok=True, **labels):
+    """Record one timed stage and emit it as a JSON line"""
+    if not METRICS_ENABLED:
+        return
+
+    key = (name, _label_key(labels))
+    with _lock:
+        entry = _spans.get(key)
+        if entry is None:
+            entry = _spans[key] = {"count": 0, "sum": 0.0, "max": 0.0, "errors": 0}
+        entry["count"] += 1
+        entry["sum"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+        if not ok:
+            entry["errors"] += 1
+
+    if METRICS_JSONL:
+        event = {"ts": round(time.time(), 3), "span": name, "seconds": round(seconds, 6), "ok": ok,
+                 "pid": os.getpid()}
+        event.update({k: v for k, v in labels.items() if v is not None})
+        get_logger("metrics.events").info(json.dumps(event, default=str))
+
+@contextmanager
+def span(name, **labels):
+    """
+    Time a block as one stage
+
+    Usage:
+        with metrics.span("chart", report="surf", chart="today"):
+            ...
+    """
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        inc("failures", stage=name, **labels)
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, ok=ok, **labels)
+
+def snapshot():
+    """
+    Current counters and span aggregates
+
+    Returns:
+        dict: {"counters": [{name, labels, value}], "spans": [{name, labels, count, sum, max, errors}]}
+    """
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+        spans = [dict({"name": name, "labels": dict(labels)}, **entry)
+                 for (name, labels), entry in sorted(_spans.items())]
+    return {"counters": counters, "spans": spans}
+
+def reset():
+    """Clear every counter and span aggregate"""
+    with _lock:
+        _counters.clear()
+        _spans.clear()
+
+# =============================================
+# PROMETHEUS EXPORT
+# =============================================
+
+def _prom_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+def prometheus_text():
+    """Render counters and spans in the Prometheus text exposition format"""
+    data = snapshot()
+    lines = []
+
+    seen = set()
+    for counter in data["counters"]:
+        metric = f"sentinel_{counter['name']}_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_prom_labels(counter['labels'])} {counter['value']}")
+
+    for name in sorted({s["name"] for s in data["spans"]}):
+        metric = f"sentinel_{name}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for s in (s for s in data["spans"] if s["name"] == name):
+            labels = _prom_labels(s["labels"])
+            lines.append(f"{metric}_count{labels} {s['count']}")
+            lines.append(f"{metric}_sum{labels} {s['sum']:.6f}")
+        lines.append(f"# TYPE {metric}_max gauge")
+        for s in (s for s in data["spans"] if s["name"] == name):
+            lines.append(f"{metric}_max{_prom_labels(s['labels'])} {s['max']:.6f}")
+
+    return "\n".join(lines) + "\n"
+
+def _scheduled_write():
+    global _prom_timer, _prom_last
+
+    with _prom_lock:
+        if _prom_timer is None:
+            return
+        _prom_timer = None
+        _prom_last = time.monotonic()
+    write_prometheus()
+
+def schedule_prometheus():
+    """
+    Write the Prometheus file soon, off the caller's thread
+
+    Writes are at most one per METRICS_PROM_INTERVAL seconds; each includes
+    everything recorded up to then, and flush() writes any pending one at exit.
+    """
+    global _prom_timer
+
+    if not (METRICS_ENABLED and METRICS_PROM_FILE):
+        return
+
+    with _prom_lock:
+        if _prom_timer is not None:
+            return
+        delay = max(0.0, _prom_last + METRICS_PROM_INTERVAL - time.monotonic())
+        _prom_timer = threading.Timer(delay, _scheduled_write)
+        _prom_timer.daemon = True
+        _prom_timer.start()
+
+def write_prometheus(path=None):
+    """Atomically write prometheus_text() (node_exporter textfile collector style)"""
+    path = path or METRICS_PROM_FILE
+    if not path:
+        return None
+
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+    except OSError as e:
+        get_logger("metrics").warning(f"[WARN] Could not write metrics: {e}")
+        return None
@@ -0,0 +1,132 @@
+"""
+Output Profiles - Named size/quality presets for generated reports
+One table sets chart resolution, chart codec and chart dimensions for all
+the workers; the charts are where a report's size is (ReportLab already
+Flate-compresses every page and image, whatever the profile). The active profile is per thread:
+report_wrapper.generate_report(..., profile="email") selects it for one
+report, REPORT_PROFILE sets the default.
+
+Profiles other than the default are delivery variants: saved reports go
+to <location>/<profile>/ and are not catalogued, so they never replace
+the location's latest report.
+"""
+
+import os
+import threading
+from io import BytesIO
+from contextlib import contextmanager
+
+from config.settings import REPORT_PROFILE
+
+PROFILES = {
+    # dpi: chart resolution (None keeps each chart's own 130-150 dpi)
+    # codec: "png", "png8" (palette-quantized to `colors`) or "jpeg" (at `quality`)
+    # figure_scale: chart figure size factor; text keeps its point size, so it reads larger
+    "standard": {"dpi": None, "codec": "png", "figure_scale": 1.0},
+    "print": {"dpi": 200, "codec": "png", "figure_scale": 1.0},
+    "email": {"dpi": 100, "codec": "png8", "colors": 64, "figure_scale": 1.0},
+    "mobile": {"dpi": 80, "codec": "jpeg", "quality": 70, "figure_scale": 0.75}
+}
+
+_local = threading.local()
+
+# =============================================
+# SELECTION
+# =============================================
+
+def get_profile(name=None):
+    """
+    Profile settings by name (default: the active profile)
+
+    Returns:
+        dict: The profile's settings plus "name"
+    """
+    name = (name or active_name()).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown output profile: {name} (choose from {', '.join(PROFILES)})")
+    return dict(PROFILES[name], name=name)
+
+def active_name():
+    """Name of the profile in use on this thread"""
+    return getattr(_local, "name", None) or REPORT_PROFILE
+
+@contextmanager
+def use(name=None):
+    """
+    Build reports on this thread with a profile
+
+    Usage:
+        with output_profiles.use("mobile"):
+            surf_worker.generate_report(...)
+
+    None leaves the current profile in place.
+    """
+    if name is None:
+        yield get_profile()
+        return
+
+    profile = get_profile(name)
+    previous = getattr(_local, "name", None)
+    _local.name = profile["name"]
+    try:
+        yield profile
+    finally:
+        _local.name = previous
+
+def is_default():
+    """True when the active profile is REPORT_PROFILE (the catalogued one)"""
+    return active_name() == REPORT_PROFILE.lower()
+
+def report_dir(output_dir, location):
+    """Folder for a location's saved reports under the active profile"""
+    if is_default():
+        return os.path.join(output_dir, location)
+    return os.path.join(output_dir, location, active_name())
+
+# =============================================
+# CHARTS
+# =============================================
+
+def chart_dpi(dpi):
+    """The active profile's chart dpi, or the chart's own"""
+    return get_profile()["dpi"] or dpi
+
+def figure_scale():
+    """The active profile's chart figure size factor"""
+    return get_profile()["figure_scale"]
+
+def chart_signature():
+    """
+    What the active profile changes in a rendered chart, for chart cache keys
+
+    Returns:
+        tuple: Empty when charts render exactly as without profiles
+    """
+    profile = get_profile()
+    if profile["dpi"] is None and profile["figure_scale"] == 1.0:
+        return ()
+    return (profile["dpi"], profile["figure_scale"])
+
+def encode_chart(png):
+    """
+    Re-encode a rendered PNG chart with the active profile's codec
+
+    ReportLab embeds JPEG data as-is; PNG and palette PNG are decoded and
+    Flate-compressed, where fewer colours compress better.
+    """
+    profile = get_profile()
+    codec = profile["codec"]
+    if codec == "png":
+        return png
+
+    from PIL import Image
+
+    image = Image.open(BytesIO(png)).convert("RGB")
+    buf = BytesIO()
+    if codec == "png8":
+        image.quantize(colors=profile.get("colors", 256)).save(buf, format="PNG", optimize=True)
+    elif codec == "jpeg":
+        image.save(buf, format="JPEG", quality=profile.get("quality", 75), optimize=True)
+    else:
+        raise ValueError(f"Unknown chart codec: {codec}")
+    return buf.getvalue()
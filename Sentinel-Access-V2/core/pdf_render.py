@@ -0,0 +1,112 @@
+"""
+PDF Render - Shared ReportLab helpers for all workers
+ReportLab is imported on first use and the sample style sheet is built
+once per process instead of once per report.
+
+PDFs can be written to a file (the default), returned as bytes or
+streamed to a file-like object, so on-demand reports (e.g. a Streamlit
+download) never touch storage.
+"""
+
+import os
+import shutil
+import threading
+from io import BytesIO
+
+_styles = None
+_styles_lock = threading.Lock()
+
+# =============================================
+# STYLES
+# =============================================
+
+def get_styles():
+    """Return the shared ReportLab sample style sheet (treat as read-only)"""
+    global _styles
+
+    if _styles is None:
+        with _styles_lock:
+            if _styles is None:
+                from reportlab import rl_config
+                from reportlab.lib.styles import getSampleStyleSheet
+                # Binary streams: ASCII85 text encoding makes every image and page a quarter larger
+                rl_config.useA85 = 0
+                _styles = getSampleStyleSheet()
+
+    return _styles
+
+# =============================================
+# CHARTS
+# =============================================
+
+def chart_flowable(chart, width, height):
+    """
+    Flowable for chart bytes, scaled to width x height
+
+    PNG charts become an Image, re-encoded with the output profile's codec;
+    SVG charts (CHART_FORMAT=svg) become a vector Drawing via svglib, so the
+    PDF keeps lines and text as paths instead of a bitmap.
+    """
+    from core.chart_cache import is_svg
+
+    if is_svg(chart):
+        from svglib.svglib import svg2rlg
+
+        drawing = svg2rlg(BytesIO(chart))
+        drawing.scale(width / drawing.width, height / drawing.height)
+        drawing.width, drawing.height = width, height
+        drawing.hAlign = "CENTER"  # like Image
+        return drawing
+
+    from reportlab.platypus import Image
+    from core import output_profiles
+    return Image(BytesIO(output_profiles.encode_chart(chart)), width, height)
+
+# =============================================
+# OUTPUT MODES
+# =============================================
+
+# generate_report(output=...): "file" saves under output_dir and returns the path,
+# "bytes" returns the PDF bytes; any object with a write() method is streamed to
+OUTPUT_MODES = ("file", "bytes")
+
+def pdf_target(output, make_path):
+    """
+    Where build_pdf should write for an output mode
+
+    Args:
+        output: "file", "bytes" or a writable file-like object
+        make_path: Zero-argument callable returning the save path (only called for "file")
+    """
+    if output == "file":
+        return make_path()
+    if output == "bytes":
+        return BytesIO()
+    if hasattr(output, "write"):
+        return output
+    raise ValueError(f"Unknown PDF output: {output!r} (use {', '.join(OUTPUT_MODES)} or a file-like object)")
+
+def pdf_result(target, output):
+    """What generate_report returns once the PDF is built into target"""
+    return target.getvalue() if output == "bytes" else target
+
+def existing_pdf(path, output):
+    """An existing report file delivered in the requested output mode"""
+    if output == "file":
+        return path
+    with open(path, "rb") as f:
+        if output == "bytes":
+            return f.read()
+        shutil.copyfileobj(f, output)
+    return output
+
+def pdf_size(target):
+    """Bytes in a built PDF (path, BytesIO or stream position; 0 if unknown)"""
+    if isinstance(target, (str, os.PathLike)):
+        return os.path.getsize(target)
+    if isinstance(target, BytesIO):
+        return target.getbuffer().nbytes
+    try:
+        return target.tell()
+    except (AttributeError, OSError):
+        return 0
@@ -0,0 +1,313 @@
+"""
+Ranking Engine - Cross-location leaderboards in one vectorized pass
+Stacks every location's hourly forecast into a locations x hours array
+per variable, then computes daily and nightly aggregates, best days and
+current conditions for all locations at once. Answers questions like
+"top surf spots for Saturday" or "clearest sky tonight" across the whole
+catalog without a pandas groupby per location.
+
+Columns are local wall-clock hours (Open-Meteo timezone=auto), so
+"tonight" means tonight at each spot. Nights run noon to noon and cover
+each spot's astronomical dark hours (core.astronomy), as in the sky report.
+"""
+
+from datetime import datetime, date
+
+import numpy as np
+
+from core import metrics, astronomy
+
+# Night window for locations without a known position and UTC offset
+NIGHT_START_HOUR = 20
+NIGHT_END_HOUR = 4
+
+LEADERBOARDS = {
+    # name: (variable, nightly, better)
+    "surf": ("wave_height", False, "max"),
+    "sky": ("cloud_cover", True, "min"),
+    "warm": ("temperature_2m", False, "max"),
+    "calm": ("wind_gusts_10m", False, "min")
+}
+
+# =============================================
+# GRID
+# =============================================
+
+class ForecastGrid:
+    """
+    Hourly forecasts for many locations on one shared time axis
+
+    Attributes:
+        names: Location names (one row each)
+        hours: datetime64[h] column times
+        values: {variable: float32 array of shape (locations, hours)}, NaN where missing
+        sites: (lat, lon, utc_offset_seconds) per location, None where unknown
+    """
+
+    def __init__(self, names, hours, values, sites=None):
+        self.names = list(names)
+        self.hours = hours
+        self.values = values
+        self.sites = list(sites) if sites is not None else [None] * len(self.names)
+        self._days = {}
+        self._night_mask = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_series(cls, names, times, columns, variables, sites=None):
+        """
+        Build a grid from per-location time and value lists
+
+        Args:
+            names: Location names
+            times: One sequence of times per location
+            columns: One {variable: values} mapping per location
+            variables: Variables to stack
+            sites: Optional (lat, lon, utc_offset_seconds) per location, for the night windows
+        """
+        times = [np.asarray(t, dtype="datetime64[h]") for t in times]
+        lengths = [len(t) for t in times]
+        if not any(lengths):
+            return cls(names, np.array([], dtype="datetime64[h]"), {v: np.empty((len(names), 0), np.float32)
+                                                                    for v in variables}, sites)
+
+        start = min(t[0] for t in times if len(t))
+        stop = max(t[-1] for t in times if len(t)) + 1
+        hours = np.arange(start, stop, dtype="datetime64[h]")
+
+        values = {v: np.full((len(names), len(hours)), np.nan, dtype=np.float32) for v in variables}
+        for row, (t, cols) in enumerate(zip(times, columns)):
+            if not len(t):
+                continue
+            slots = (t - start).astype(np.int64)
+            for v in variables:
+                if v in cols:
+                    values[v][row, slots] = np.asarray(cols[v], dtype=np.float32)
+
+        return cls(names, hours, values, sites)
+
+    @classmethod
+    def from_responses(cls, responses, variables):
+        """Grid from {location_name: Open-Meteo response} (e.g. bulk_fetch.fetch_all_responses)"""
+        names = list(responses)
+        hourly = [responses[name].get("hourly") or {} for name in names]
+        sites = [_site(responses[name]) for name in names]
+        return cls.from_series(names, [h.get("time", []) for h in hourly], hourly, variables, sites)
+
+    @classmethod
+    def from_frames(cls, frames, variables):
+        """Grid from {location_name: worker DataFrame with a "time" column}"""
+        names = list(frames)
+        return cls.from_series(names, [frames[n]["time"].to_numpy() for n in names],
+                               [{v: frames[n][v].to_numpy(dtype=float) for v in variables if v in frames[n]}
+                                for n in names], variables, [frames[n].attrs.get("site") for n in names])
+
+    # =============================================
+    # AGGREGATES
+    # =============================================
+
+    def _day_bounds(self, nightly=False):
+        """Dates (or the dates nights start on) on the axis and the first column of each"""
+        if nightly not in self._days:
+            days = astronomy.night_of(self.hours) if nightly else self.hours.astype("datetime64[D]")
+            self._days[nightly] = np.unique(days, return_index=True)
+        return self._days[nightly]
+
+    def night_mask(self):
+        """
+        (locations, hours) mask of each location's dark hours, as in the sky report
+
+        Locations without a known site use the fixed NIGHT_START_HOUR-NIGHT_END_HOUR
+        window. The tail of the night before the axis starts is left out.
+        """
+        if self._night_mask is None:
+            hour = (self.hours - self.hours.astype("datetime64[D]")).astype(np.int64)
+            mask = np.tile((hour >= NIGHT_START_HOUR) | (hour <= NIGHT_END_HOUR), (len(self), 1))
+
+            known = np.array([site is not None for site in self.sites], dtype=bool)
+            if known.any() and len(self.hours):
+                lats, lons, offsets = np.array([site for site in self.sites if site is not None], dtype=float).T
+                mask[known] = astronomy.dark_mask(self.hours, lats, lons, offsets)
+
+            if len(self.hours):
+                mask &= astronomy.night_of(self.hours) >= self.hours[0].astype("datetime64[D]")
+            self._night_mask = mask
+        return self._night_mask
+
+    def daily(self, variable, nightly=False):
+        """
+        Per-location, per-date aggregates
+
+        Nightly aggregates cover each night's dark hours, keyed by the date the
+        night starts on, as in find_best_viewing_night.
+
+        Returns:
+            dict: {"dates": datetime64[D] array, "mean", "min", "max", "count"} with
+                  (locations, dates) arrays; mean/min/max are NaN where count is 0
+        """
+        data = self.values[variable]
+        dates, starts = self._day_bounds(nightly)
+        if not len(dates):
+            empty = np.empty((len(self), 0))
+            return {"dates": dates, "mean": empty, "min": empty, "max": empty, "count": empty}
+
+        if nightly:
+            data = np.where(self.night_mask(), data, np.nan)
+
+        valid = ~np.isnan(data)
+        count = np.add.reduceat(valid, starts, axis=1)
+        total = np.add.reduceat(np.where(valid, data, 0.0), starts, axis=1, dtype=np.float64)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+        return {
+            "dates": dates,
+            "mean": mean,
+            "min": np.fmin.reduceat(data, starts, axis=1),
+            "max": np.fmax.reduceat(data, starts, axis=1),
+            "count": count
+        }
+
+    def best(self, variable, better="max", nightly=False):
+        """
+        Best date per location by daily (or nightly) mean
+
+        Returns:
+            tuple: (dates array with NaT where no data, mean values array)
+        """
+        stats = self.daily(variable, nightly=nightly)
+        mean = stats["mean"]
+        dates = np.full(len(self), np.datetime64("NaT"), dtype="datetime64[D]")
+        best = np.full(len(self), np.nan)
+        if not mean.shape[1]:
+            return dates, best
+
+        # First best date wins ties, like idxmax/idxmin
+        fill = -np.inf if better == "max" else np.inf
+        filled = np.where(np.isnan(mean), fill, mean)
+        idx = filled.argmax(axis=1) if better == "max" else filled.argmin(axis=1)
+
+        has_data = stats["count"].sum(axis=1) > 0
+        rows = np.flatnonzero(has_data)
+        dates[rows] = stats["dates"][idx[rows]]
+        best[rows] = mean[rows, idx[rows]]
+        return dates, best
+
+    def current(self, variable, now=None):
+        """
+        Value at the current hour for every location
+
+        Falls back to each location's latest earlier value when the current
+        hour is missing, and NaN when there is none.
+        """
+        data = self.values[variable]
+        if not data.shape[1]:
+            return np.full(len(self), np.nan)
+
+        now = np.datetime64(now or datetime.now(), "h")
+        col = int(np.clip((now - self.hours[0]).astype(np.int64), 0, data.shape[1] - 1))
+
+        window = data[:, :col + 1]
+        valid = ~np.isnan(window)
+        last = col - np.argmax(valid[:, ::-1], axis=1)
+        out = window[np.arange(len(self)), last].astype(np.float64)
+        out[~valid.any(axis=1)] = np.nan
+        return out
+
+# =============================================
+# LEADERBOARDS
+# =============================================
+
+def _ranked(names, values, better, n, **columns):
+    """Sort locations by value (NaN last) and return the top n as dicts"""
+    values = np.asarray(values, dtype=np.float64)
+    key = -values if better == "max" else values
+    valid = np.flatnonzero(~np.isnan(values))
+    order = valid[np.argsort(key[valid], kind="stable")][:n]
+
+    board = []
+    for rank, i in enumerate(order, 1):
+        row = {"rank": rank, "location": names[i], "value": float(values[i])}
+        for name, column in columns.items():
+            value = column[i]
+            row[name] = value.astype(date) if isinstance(value, np.datetime64) else value
+        board.append(row)
+    return board
+
+def leaderboard(grid, board="surf", day=None, n=10):
+    """
+    Rank every location in a grid
+
+    Args:
+        grid: ForecastGrid holding the board's variable
+        board: "surf" (wave height), "sky" (night cloud), "warm" or "calm"
+        day: Date to rank on (date, "YYYY-MM-DD", "today"/"tonight"/"tomorrow");
+             None ranks each location on its own best day this week
+        n: Number of places to return
+
+    Returns:
+        list: [{"rank", "location", "value", "date"}, ...] best first
+    """
+    if board not in LEADERBOARDS:
+        raise ValueError(f"Unknown leaderboard: {board} (choose from {', '.join(LEADERBOARDS)})")
+
+    variable, nightly, better = LEADERBOARDS[board]
+    with metrics.span("ranking", board=board):
+        if day is None:
+            dates, values = grid.best(variable, better=better, nightly=nightly)
+        else:
+            target = _parse_day(day)
+            stats = grid.daily(variable, nightly=nightly)
+            hit = np.flatnonzero(stats["dates"] == target)
+            values = stats["mean"][:, hit[0]] if len(hit) else np.full(len(grid), np.nan)
+            dates = np.full(len(grid), target)
+
+        return _ranked(grid.names, values, better, n, date=dates)
+
+def _site(response):
+    """(lat, lon, utc_offset_seconds) of an Open-Meteo response, None if it lacks them"""
+    if "latitude" not in response or "longitude" not in response:
+        return None
+    return (response["latitude"], response["longitude"], response.get("utc_offset_seconds", 0))
+
+def _parse_day(day):
+    """datetime64[D] for a date, ISO string or today/tonight/tomorrow"""
+    if isinstance(day, str):
+        today = np.datetime64(date.today(), "D")
+        named = {"today": today, "tonight": today, "tomorrow": today + 1}
+        if day.lower() in named:
+            return named[day.lower()]
+        return np.datetime64(day, "D")
+    if isinstance(day, datetime):
+        day = day.date()
+    return np.datetime64(day, "D")
+
+# =============================================
+# CONVENIENCE
+# =============================================
+
+def fetch_grid(report_types=("Surf", "Sky", "Weather"), locations=None):
+    """
+    Bulk fetch every location and stack the forecast variables of the given report types
+
+    Shares forecast cache entries with report_wrapper.generate_all_reports
+    for the same report types
+    """
+    from core import bulk_fetch
+
+    specs = bulk_fetch._get_specs()
+    variables = bulk_fetch._union(*(specs[t.lower()]["hourly"] for t in report_types if t.lower() in specs))
+    responses = bulk_fetch.fetch_all_responses(report_types, locations)
+
+    with metrics.span("ranking_stack", locations=len(responses)):
+        return ForecastGrid.from_responses(responses, variables)
+
+def top_surf_spots(day=None, n=10, grid=None):
+    """Best average wave height, on one day or each spot's best day"""
+    return leaderboard(grid or fetch_grid(), "surf", day=day, n=n)
+
+def clearest_skies(day="tonight", n=10, grid=None):
+    """Lowest night cloud cover, tonight by default"""
+    return leaderboard(grid or fetch_grid(), "sky", day=day, n=n)
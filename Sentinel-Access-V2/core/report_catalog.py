@@ -0,0 +1,345 @@
+"""
+Report Catalog - SQLite index of every generated report PDF
+Workers record each PDF as they write it (location, type, timestamp,
+size and a hash of the forecast it was built from), so listing and
+latest-report lookups are indexed queries instead of folder scans.
+A new catalog is built in one pass over the output folder. After that
+each location folder's mtime is remembered, and a query for a location
+whose folder has changed since (PDFs copied in or deleted by hand, a
+write that was never catalogued) re-scans just that folder first.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from config.settings import BASE_OUTPUT, REPORT_CATALOG_FILE, REPORT_SKIP_UNCHANGED
+from core import metrics
+
+log = metrics.get_logger("catalog")
+
+REPORT_TYPES = ("Surf", "Sky", "Weather", "Combined")
+
+# <Type>_Report_<Location>_<YYYY-MM-DD_HHMM>.pdf (see each worker's report_path)
+FILENAME_PATTERN = re.compile(r"^(Surf|Sky|Weather|Combined)_Report_(.+)_(\d{4}-\d{2}-\d{2}_\d{4})\.pdf$", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    path TEXT PRIMARY KEY,
+    location TEXT NOT NULL,
+    report_type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    input_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS reports_by_location ON reports (location, report_type, created_at DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_ready = set()
+_lock = threading.Lock()
+
+# =============================================
+# CONNECTION
+# =============================================
+
+def catalog_path(output_dir=BASE_OUTPUT):
+    """Catalog database for an output folder"""
+    return os.path.join(output_dir, REPORT_CATALOG_FILE)
+
+def _connect(output_dir):
+    """Open the catalog, creating it and rebuilding it from disk the first time"""
+    db_path = catalog_path(output_dir)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        if db_path not in _ready:
+            with _lock:
+                if db_path not in _ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    if conn.execute("SELECT value FROM meta WHERE key = 'rebuilt_at'").fetchone() is None:
+                        _rebuild(conn, output_dir)
+                    _ready.add(db_path)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+def _report_type(name):
+    """Normalise "surf"/"night"... to the catalog's "Surf"/"Sky" spelling"""
+    from core.report_wrapper import WORKER_MODULES
+    entry = WORKER_MODULES.get(name.strip().lower())
+    return entry[1] if entry else name.strip().capitalize()
+
+# =============================================
+# RECORDING
+# =============================================
+
+def input_hash(report_type, *data, **params):
+    """
+    Hash of the inputs a report is built from
+
+    Args:
+        report_type: "Surf", "Sky", "Weather" or "Combined"
+        *data: DataFrames or arrays the report is drawn from
+        **params: Any other values that change the report (coords...)
+    """
+    from core.chart_cache import chart_key
+    return chart_key(f"report_{_report_type(report_type).lower()}", *data, **params)
+
+def report_period(now=None):
+    """
+    The hour a report is built in ("YYYY-MM-DD HH")
+
+    Part of every report fingerprint: alert look-ahead windows, "tonight"
+    and the charts' now marker move with the clock, so a report from an
+    earlier hour is never reused even when the forecast is the same.
+    """
+    return (now or datetime.now()).strftime("%Y-%m-%d %H")
+
+def _created_at(stat):
+    """
+    A report's creation time: when its PDF was written
+
+    Used both when recording and when rebuilding, so rows compare the same
+    way either way (the filename's timestamp only has minute precision).
+    """
+    return stat.st_mtime
+
+def record_report(path, location, report_type, input_hash=None, output_dir=None):
+    """
+    Add a newly written PDF to the catalog
+
+    A catalog failure never fails the report: it is logged, and the
+    next query for the location re-scans its folder and picks the file up
+    (without its input hash, so that report is rebuilt once).
+
+    Args:
+        path: PDF path (inside output_dir/location)
+        output_dir: Output folder (default: two levels above path)
+    """
+    output_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(path)))
+
+    try:
+        stat = os.stat(path)
+        conn = _connect(output_dir)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO reports (path, location, report_type, created_at, size, input_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (os.path.abspath(path), location, _report_type(report_type), _created_at(stat), stat.st_size,
+                     input_hash)
+                )
+        finally:
+            conn.close()
+        metrics.inc("catalog_writes", report=_report_type(report_type).lower())
+    except (OSError, sqlite3.Error) as e:
+        log.warning(f"[WARN] Report not catalogued ({path}): {e}")
+
+# =============================================
+# QUERIES
+# =============================================
+
+def _forget(output_dir, paths):
+    """Drop rows whose files have been deleted outside the app"""
+    conn = _connect(output_dir)
+    try:
+        with conn:
+            conn.executemany("DELETE FROM reports WHERE path = ?", [(p,) for p in paths])
+    finally:
+        conn.close()
+
+def list_reports(location, report_type=None, output_dir=BASE_OUTPUT, limit=None):
+    """
+    Catalogued reports for a location, newest first
+
+    Re-scans the location's folder first if it changed since the last scan.
+
+    Returns:
+        list: [{"path", "location", "report_type", "created_at", "size", "input_hash"}, ...]
+    """
+    sql = "SELECT path, location, report_type, created_at, size, input_hash FROM reports WHERE location = ?"
+    args = [location]
+    if report_type:
+        sql += " AND report_type = ?"
+        args.append(_report_type(report_type))
+    sql += " ORDER BY created_at DESC"
+    if limit:
+        sql += " LIMIT ?"
+        args.append(int(limit))
+
+    keys = ("path", "location", "report_type", "created_at", "size", "input_hash")
+    conn = _connect(output_dir)
+    try:
+        _sync_location(conn, output_dir, location)
+        return [dict(zip(keys, row)) for row in conn.execute(sql, args).fetchall()]
+    finally:
+        conn.close()
+
+def latest_report(location, report_type, output_dir=BASE_OUTPUT):
+    """
+    The newest report of one type for a location
+
+    Returns:
+        dict: Catalog row (see list_reports), or None
+    """
+    missing = []
+    try:
+        # Usually the first row; older rows are only read if files were deleted by hand
+        for row in list_reports(location, report_type, output_dir):
+            if os.path.exists(row["path"]):
+                return row
+            missing.append(row["path"])
+        return None
+    finally:
+        if missing:
+            _forget(output_dir, missing)
+
+def unchanged_report(location, report_type, input_hash, output_dir=BASE_OUTPUT):
+    """
+    The last report's path if it was built from the same inputs
+
+    Lets a worker skip charts and doc.build when the forecast has not
+    changed. Set REPORT_SKIP_UNCHANGED=False to always rebuild.
+
+    Returns:
+        str: Existing PDF path, or None
+    """
+    if not REPORT_SKIP_UNCHANGED or not input_hash:
+        return None
+
+    try:
+        row = latest_report(location, report_type, output_dir)
+    except sqlite3.Error as e:
+        log.warning(f"[WARN] Report catalog unavailable: {e}")
+        return None
+
+    if row is None or row["input_hash"] != input_hash:
+        return None
+
+    metrics.inc("reports_unchanged", report=_report_type(report_type).lower())
+    return row["path"]
+
+# =============================================
+# REBUILD
+# =============================================
+
+def _folder_state(path):
+    """A folder's mtime as stored in meta (changes whenever a file is added or removed)"""
+    try:
+        return str(os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+def _scan_location(loc_dir, location, known=None):
+    """
+    Every report PDF in one location folder
+
+    Args:
+        known: Optional {path: row} already catalogued; those files are not stat'ed again
+    """
+    known = known or {}
+    for entry in os.scandir(loc_dir):
+        if not entry.is_file() or not entry.name.lower().endswith(".pdf"):
+            continue
+
+        path = os.path.abspath(entry.path)
+        if path in known:
+            yield known[path]
+            continue
+
+        match = FILENAME_PATTERN.match(entry.name)
+        if match:
+            report_type = _report_type(match.group(1))
+        else:
+            # Older or renamed files: fall back to the type in the name
+            lower = entry.name.lower()
+            report_type = next((t for t in REPORT_TYPES if t.lower() in lower), None)
+            if report_type is None:
+                continue
+
+        stat = entry.stat()
+        yield (path, location, report_type, _created_at(stat), stat.st_size, None)
+
+def _scan(output_dir):
+    """Every report PDF under output_dir/<location>/, with each folder's state before it was read"""
+    states = {}
+    rows = []
+    for loc_entry in os.scandir(output_dir):
+        if not loc_entry.is_dir() or loc_entry.name.startswith("."):
+            continue
+        states[loc_entry.name] = _folder_state(loc_entry.path)
+        rows.extend(_scan_location(loc_entry.path, loc_entry.name))
+    return rows, states
+
+def _sync_location(conn, output_dir, location):
+    """
+    Re-scan a location folder if it changed since the catalog last looked
+
+    The folder's state is read before the scan, so a PDF written during
+    the scan leaves it out of step and is picked up next time.
+
+    Returns:
+        bool: True if the folder was re-scanned
+    """
+    loc_dir = os.path.join(output_dir, location)
+    state = _folder_state(loc_dir)
+    key = f"scanned:{location}"
+    stored = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    if state is None or (stored and stored[0] == state):
+        return False
+
+    with conn:
+        known = {row[0]: row for row in conn.execute(
+            "SELECT path, location, report_type, created_at, size, input_hash FROM reports WHERE location = ?",
+            (location,))}
+        rows = list(_scan_location(loc_dir, location, known))
+        conn.execute("DELETE FROM reports WHERE location = ?", (location,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO reports (path, location, report_type, created_at, size, input_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, state))
+
+    added = len(set(row[0] for row in rows) - set(known))
+    if added or len(rows) != len(known):
+        log.info(f"[OK] Report catalog re-synced {location}: {len(rows)} reports ({added} new)")
+    metrics.inc("catalog_resyncs")
+    return True
+
+def _rebuild(conn, output_dir):
+    rows, states = _scan(output_dir) if os.path.isdir(output_dir) else ([], {})
+
+    with conn:
+        known = dict(conn.execute("SELECT path, input_hash FROM reports"))
+        conn.execute("DELETE FROM reports")
+        conn.executemany(
+            "INSERT INTO reports (path, location, report_type, created_at, size, input_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            [row[:5] + (known.get(row[0]),) for row in rows]
+        )
+        conn.execute("DELETE FROM meta WHERE key LIKE 'scanned:%'")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                         [(f"scanned:{location}", state) for location, state in states.items() if state])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rebuilt_at', ?)",
+                     (datetime.now().isoformat(timespec="seconds"),))
+
+    log.info(f"[OK] Report catalog rebuilt: {len(rows)} reports in {output_dir}")
+    return len(rows)
+
+def rebuild(output_dir=BASE_OUTPUT):
+    """
+    Re-index every report PDF on disk (keeps known input hashes)
+
+    Returns:
+        int: Number of reports catalogued
+    """
+    conn = _connect(output_dir)
+    try:
+        return _rebuild(conn, output_dir)
+    finally:
+        conn.close()
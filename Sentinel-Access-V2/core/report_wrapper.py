@@ -1,28 +1,160 @@
 #!/usr/bin/env python3
 import os
 
+import threading
+import importlib
+
+from config.settings import SINGLE_FLIGHT_LOCKS, REPORT_PROFILE
+from core import metrics, output_profiles
+from core.single_flight import SingleFlight
+
+log = metrics.get_logger("report_wrapper")
+
+# Concurrent identical report requests share one generation
+_in_flight = SingleFlight()
+
 # --- INTEGRATION WITH WORKERS ---
-try:
-    from core.surf_worker import generate_report as surf_report
-    from core.sky_worker import generate_report as sky_report
-    from core.weather_worker import generate_report as weather_report 
-except ImportError as e:
-    print(f"Import error: {e}")
-    def surf_report(*args, **kwargs):
-        raise Exception("Surf Worker not found")
-    def sky_report(*args, **kwargs):
-        raise Exception("Sky Worker not found")
-
-def generate_report(location, report_type, coords, output_dir):
+# Workers are imported on first use so the router (and the app) starts without
+# pulling in pandas, matplotlib and reportlab
+WORKER_MODULES = {
+    "surf": ("core.surf_worker", "Surf"),
+    "sky": ("core.sky_worker", "Sky"),
+    "night": ("core.sky_worker", "Sky"),
+    "weather": ("core.weather_worker", "Weather"),
+    "combined": ("core.combined_worker", "Combined")
+}
+
+def get_worker(report_type):
+    """Import and return the worker module for a report type"""
+    entry = WORKER_MODULES.get(report_type.lower())
+    if entry is None:
+        raise Exception(f"Unknown Report Type: {report_type}")
+    
+    module, name = entry
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        log.error(f"Import error: {e}")
+        raise Exception(f"{name} Worker not found") from e
+
+def generate_report(location, report_type, coords, output_dir, data=None, force=False, output="file", profile=None):
     """
     Main report generator - routes to correct worker
+    
+    report_type "Combined" puts the surf, sky and weather reports in one PDF
+    built from a single forecast fetch (see core.combined_worker).
+    data is an optional prefetched forecast for the worker (see core.bulk_fetch).
+    Unless force is set, the last report is returned when the forecast is unchanged.
+    output is "file" (returns the saved path), "bytes" (returns the PDF without
+    saving it) or a writable file-like object the PDF is streamed to.
+    profile picks the output profile ("standard", "print", "email", "mobile";
+    default REPORT_PROFILE, see core.output_profiles).
+    
+    Identical requests running at the same time (same location, coordinates,
+    report type, output folder, mode and profile) share one generation, across
+    threads and, for saved default-profile reports, through a lock file in
+    <output_dir>/.locks, across processes. Requests with force or their own
+    data always run on their own.
     """
+    worker = get_worker(report_type)
+    name = WORKER_MODULES[report_type.lower()][1]
+    profile = output_profiles.get_profile(profile)["name"]
+    
+    def run():
+        with output_profiles.use(profile):
+            with metrics.span("report", report=report_type.lower(), profile=profile):
+                return worker.generate_report(location, report_type, coords, output_dir, data=data, force=force,
+                                              output=output)
+    
+    if output not in ("file", "bytes") or force or data is not None:
+        # Every caller has its own stream, or wants a report from its own inputs, so there is nothing to share
+        try:
+            return run()
+        finally:
+            metrics.schedule_prometheus()
+    
+    from core.location_manager import normalize_coords
+    key = (location, normalize_coords(coords), name, os.path.abspath(output_dir), output, profile)
+    
+    def finished_elsewhere(started):
+        # Another process held the lock: use its report if it finished after we asked
+        from core import report_catalog
+        latest = report_catalog.latest_report(location, name, output_dir)
+        if latest and latest["created_at"] >= started - 1:
+            log.info(f"[OK] Report generated by another process: {latest['path']}")
+            return latest["path"]
+        return None
+    
+    try:
+        # Another process's result is found through the catalog, which only holds default-profile reports
+        shared = SINGLE_FLIGHT_LOCKS and output == "file" and profile == REPORT_PROFILE
+        lock_dir = os.path.join(output_dir, ".locks") if shared else None
+        return _in_flight.do(key, run, lock_dir=lock_dir, after_wait=finished_elsewhere)
+    finally:
+        metrics.schedule_prometheus()
+
+def warm_up(report_types=("Surf", "Sky", "Weather"), background=False):
+    """
+    Load the workers and build the matplotlib font cache and ReportLab
+    style sheet ahead of the first report
+    
+    Args:
+        report_types: Workers to import
+        background: Run in a daemon thread and return it instead of blocking
+    """
+    if background:
+        thread = threading.Thread(target=warm_up, args=(report_types,), name="report-warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    try:
+        for report_type in report_types:
+            get_worker(report_type)
+        
+        # Drawing text once builds the font list cache and loads the fonts the charts use
+        from core import chart_render, pdf_render
+        fig = chart_render.new_figure((1, 1))
+        ax = fig.add_subplot()
+        ax.set_title("Warm up", fontweight="bold")
+        fig.canvas.draw()
+        
+        pdf_render.get_styles()
+        log.info("[OK] Report workers warmed up")
+    except Exception as e:
+        log.warning(f"[WARN] Warm up failed: {e}")
+
+def generate_all_reports(output_dir, report_types=("Surf", "Sky", "Weather"), locations=None, force=False,
+                         profile=None):
+    """
+    Generate every report type for every location from one bulk fetch
+    
+    Returns:
+        dict: {(location, report_type): pdf_path or Exception}
+    """
+    from core import api_client
+    from core.bulk_fetch import fetch_all_forecasts
+    from core.location_manager import LocationManager, normalize_coords
+    
+    if locations is None:
+        locations = LocationManager(output_dir).get_all_locations()
+    
+    results = {}
+    with api_client.count_calls(f"Bulk fetch of {len(locations)} locations"):
+        bulk = fetch_all_forecasts(report_types, locations, errors=results)
     
-    if report_type.lower() == "surf":
-        return surf_report(location, report_type, coords, output_dir)
+    for report_type, frames in bulk.items():
+        for location, data in frames.items():
+            try:
+                coords = normalize_coords(locations[location])
+                results[(location, report_type)] = generate_report(location, report_type, coords, output_dir, data=data,
+                                                                   force=force, profile=profile)
+            except Exception as e:
+                results[(location, report_type)] = e
     
-    elif report_type.lower() == "night" or report_type.lower() == "sky":
-        return sky_report(location, report_type, coords, output_dir)
+    # Every requested report gets an outcome, even if its data never arrived
+    for report_type in report_types:
+        for location in locations:
+            results.setdefault((location, report_type),
+                               RuntimeError(f"No {report_type} data fetched for {location}"))
     
-    else:
-        raise Exception(f"Unknown Report Type: {report_type}")
\ No newline at end of file
+    return results
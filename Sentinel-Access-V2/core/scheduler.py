@@ -0,0 +1,275 @@
+"""
+Refresh Scheduler - Long-running daemon that keeps every report fresh
+Holds a priority queue of (location, report_type) refresh tasks. Each
+task is due when the next forecast model run is available upstream
+(MODEL_RUN_HOURS_UTC + MODEL_RUN_DELAY_MINUTES), but no sooner than its
+report type's interval after the last refresh. Due times carry random
+jitter, tasks due close together run as one bulk fetch per report type,
+and failures back off exponentially. Reports whose forecast did not
+change are skipped by the workers (see report_catalog).
+
+Usage (from Sentinel-Access-V2):
+    python -m core.scheduler                 # run forever
+    python -m core.scheduler --once          # refresh everything due now, then exit
+    python -m core.scheduler Surf Weather    # only these report types
+"""
+
+import sys
+import time
+import heapq
+import random
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+
+from config.settings import (BASE_OUTPUT, SCHEDULE_REPORT_TYPES, SCHEDULE_INTERVALS, MODEL_RUN_HOURS_UTC,
+                             MODEL_RUN_DELAY_MINUTES, SCHEDULE_JITTER_SECONDS, SCHEDULE_BATCH_WINDOW_SECONDS,
+                             SCHEDULE_BACKOFF_SECONDS, SCHEDULE_BACKOFF_MAX_SECONDS)
+from core import metrics
+
+log = metrics.get_logger("scheduler")
+
+# =============================================
+# TIMING
+# =============================================
+
+def parse_intervals(text=SCHEDULE_INTERVALS):
+    """"Surf=360,Weather=180" -> {"surf": 21600, "weather": 10800} (minutes to seconds)"""
+    intervals = {}
+    for part in text.split(","):
+        if "=" in part:
+            name, minutes = part.split("=", 1)
+            intervals[name.strip().lower()] = float(minutes) * 60
+    return intervals
+
+def model_slots(after, run_hours=None, delay_minutes=MODEL_RUN_DELAY_MINUTES):
+    """
+    Times new model data becomes available, from the day before `after` onwards
+
+    Args:
+        after: Epoch seconds
+        run_hours: Model run hours in UTC (default MODEL_RUN_HOURS_UTC)
+
+    Yields:
+        float: Epoch seconds, ascending
+    """
+    if run_hours is None:
+        run_hours = sorted(int(h) for h in MODEL_RUN_HOURS_UTC.split(",") if h.strip())
+    day = datetime.fromtimestamp(after, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    day -= timedelta(days=1)
+
+    while True:
+        for hour in run_hours:
+            yield (day + timedelta(hours=hour, minutes=delay_minutes)).timestamp()
+        day += timedelta(days=1)
+
+def last_model_slot(now):
+    """When the newest model run available at `now` became available"""
+    latest = None
+    for slot in model_slots(now):
+        if slot > now:
+            return latest
+        latest = slot
+
+def next_due(last_run, interval):
+    """
+    First model availability at or after last_run + interval
+
+    A refresh never runs twice for one model run, and never more often
+    than the report type's interval.
+    """
+    earliest = last_run + interval
+    for slot in model_slots(earliest):
+        if slot >= earliest and slot > last_run:
+            return slot
+
+def backoff(failures):
+    """Delay before retry number `failures` (exponential, capped)"""
+    return min(SCHEDULE_BACKOFF_SECONDS * 2 ** (failures - 1), SCHEDULE_BACKOFF_MAX_SECONDS)
+
+# =============================================
+# SCHEDULER
+# =============================================
+
+class Scheduler:
+    """Priority queue of refresh tasks feeding the report workers"""
+
+    def __init__(self, report_types=None, output_dir=BASE_OUTPUT, intervals=None, jitter=SCHEDULE_JITTER_SECONDS,
+                 batch_window=SCHEDULE_BATCH_WINDOW_SECONDS):
+        self.report_types = [t.strip() for t in (report_types or SCHEDULE_REPORT_TYPES) if t.strip()]
+        self.output_dir = output_dir
+        self.intervals = intervals if intervals is not None else parse_intervals()
+        self.jitter = jitter
+        self.batch_window = batch_window
+
+        self._queue = []
+        self._tasks = {}
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+
+    def _interval(self, report_type):
+        return self.intervals.get(report_type.lower(), 0)
+
+    def _push(self, key, due, failures=0):
+        """Queue (location, report_type) at `due`, replacing any earlier entry"""
+        due += random.uniform(0, self.jitter)
+        self._tasks[key] = (due, failures)
+        heapq.heappush(self._queue, (due, next(self._seq), key))
+
+    def sync(self, now=None):
+        """
+        Add tasks for new locations and drop removed ones
+
+        New tasks are due at the next model run after their last catalogued
+        report, or straight away if there is none (or it is older than that)
+        """
+        from core import report_catalog
+        from core.location_manager import LocationManager
+
+        now = now or time.time()
+        locations = LocationManager(self.output_dir).get_all_locations()
+        wanted = {(location, report_type) for location in locations for report_type in self.report_types}
+
+        for key in list(self._tasks):
+            if key not in wanted:
+                del self._tasks[key]
+
+        for key in sorted(wanted - set(self._tasks)):
+            latest = report_catalog.latest_report(key[0], key[1], self.output_dir)
+            due = next_due(latest["created_at"], self._interval(key[1])) if latest else now
+            self._push(key, max(due, now))
+
+        return locations
+
+    def _pop_batch(self):
+        """Pop the head task and every task due within batch_window of it"""
+        batch = []
+        head_due = None
+
+        while self._queue:
+            due, _, key = self._queue[0]
+            if key not in self._tasks or self._tasks[key][0] != due:
+                heapq.heappop(self._queue)  # replaced or removed
+                continue
+            if head_due is None:
+                head_due = due
+            elif due > head_due + self.batch_window:
+                break
+            heapq.heappop(self._queue)
+            batch.append((key, self._tasks[key][1]))
+
+        return head_due, batch
+
+    def run_batch(self, batch, locations, now=None):
+        """
+        Refresh one batch: one bulk fetch and report run per report type
+
+        Returns:
+            dict: {(location, report_type): pdf_path or Exception}
+        """
+        from core import forecast_cache
+        from core.report_wrapper import generate_all_reports
+
+        now = now or time.time()
+        results = {}
+        by_type = {}
+        for (location, report_type), _ in batch:
+            if location in locations:
+                by_type.setdefault(report_type, {})[location] = locations[location]
+
+        # Anything cached before the newest model run became available is refetched
+        slot = last_model_slot(now)
+        max_age = max(now - slot, 60) if slot else None
+
+        for report_type, subset in by_type.items():
+            log.info(f"[SCHEDULE] Refreshing {report_type} for {len(subset)} locations")
+            try:
+                with metrics.span("scheduled", report=report_type.lower(), locations=len(subset)):
+                    with forecast_cache.require_fresh(max_age):
+                        results.update(generate_all_reports(self.output_dir, (report_type,), locations=subset))
+            except Exception as e:
+                log.error(f"[ERROR] Scheduled {report_type} refresh failed: {e}")
+                results.update({(location, report_type): e for location in subset})
+
+        return results
+
+    def _reschedule(self, batch, results, now):
+        """Queue each task's next refresh: the next model run on success, a backoff on failure"""
+        failed = {}
+        for key, failures in batch:
+            if key not in self._tasks:
+                continue
+            outcome = results.get(key)
+            if outcome is None or isinstance(outcome, Exception):
+                failures += 1
+                log.debug(f"[WARN] {key[0]} {key[1]} failed ({failures}x): {outcome}")
+                failed.setdefault(key[1], []).append(backoff(failures))
+                metrics.inc("scheduler_tasks", report=key[1].lower(), status="failed")
+                self._push(key, now + backoff(failures), failures)
+            else:
+                metrics.inc("scheduler_tasks", report=key[1].lower(), status="ok")
+                self._push(key, next_due(now, self._interval(key[1])))
+
+        for report_type, delays in failed.items():
+            log.warning(f"[WARN] {len(delays)} {report_type} refreshes failed, retrying in {min(delays) / 60:.0f}+ min")
+
+    def run(self, once=False):
+        """
+        Process tasks until stop() (or, with once, until nothing is due now)
+
+        Returns:
+            int: Number of batches run
+        """
+        locations = self.sync()
+        batches = 0
+        log.info(f"[OK] Scheduler started: {len(self._tasks)} tasks ({', '.join(self.report_types)})")
+
+        while not self._stop.is_set():
+            due, batch = self._pop_batch()
+            if not batch:
+                if once:
+                    break
+                self._stop.wait(60)
+                locations = self.sync()
+                continue
+
+            wait = due - time.time()
+            if wait > 0:
+                if once:
+                    # Leave the future tasks queued for the next run
+                    for key, failures in batch:
+                        heapq.heappush(self._queue, (self._tasks[key][0], next(self._seq), key))
+                    break
+                log.info(f"[SCHEDULE] Next refresh in {wait / 60:.1f} min")
+                # Wake early for stop() and to pick up new locations
+                if self._stop.wait(min(wait, 900)):
+                    break
+                for key, failures in batch:
+                    heapq.heappush(self._queue, (self._tasks[key][0], next(self._seq), key))
+                locations = self.sync()
+                continue
+
+            results = self.run_batch(batch, locations)
+            self._reschedule(batch, results, time.time())
+            batches += 1
+
+        return batches
+
+    def stop(self):
+        self._stop.set()
+
+    def pending(self):
+        """[(due_epoch, location, report_type, failures), ...] soonest first"""
+        return sorted((due, key[0], key[1], failures) for key, (due, failures) in self._tasks.items())
+
+if __name__ == "__main__":
+    once = "--once" in sys.argv
+    types = [a for a in sys.argv[1:] if not a.startswith("--")] or None
+    # A one-off run refreshes whatever is due now, so no jitter
+    scheduler = Scheduler(report_types=types, jitter=0 if once else SCHEDULE_JITTER_SECONDS)
+    try:
+        count = scheduler.run(once=once)
+        print(f"[OK] Scheduler ran {count} batches")
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print("[OK] Scheduler stopped")
@@ -0,0 +1,153 @@
+"""
+Single Flight - Coalesce concurrent identical calls into one execution
+Within a process, callers asking for a key that is already in flight
+wait on the first caller's Future and share its result. Across
+processes (several Streamlit servers, the scheduler, the CLI) the
+leader also holds an exclusive file lock, so a second process waits
+for the first instead of repeating the work.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    import msvcrt
+    fcntl = None
+
+from core import metrics
+
+log = metrics.get_logger("single_flight")
+
+# =============================================
+# FILE LOCK
+# =============================================
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file (fcntl.flock, or msvcrt.locking on Windows)
+
+    Usage:
+        with FileLock(path) as lock:
+            if lock.waited: ...  # another process held it first
+    """
+
+    def __init__(self, path, poll=0.1):
+        self.path = path
+        self.poll = poll
+        self.waited = False
+        self._fd = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.waited = True
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            # LK_LOCK gives up after 10 seconds, so poll the non-blocking form instead
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    self.waited = True
+                    time.sleep(self.poll)
+        return self
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+# =============================================
+# SINGLE FLIGHT
+# =============================================
+
+def _lock_name(key):
+    """Readable, filesystem-safe lock file name for a key"""
+    readable = re.sub(r"[^A-Za-z0-9_.-]+", "_", "_".join(str(k) for k in key[:2]))[:80]
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:10]
+    return f"{readable}-{digest}.lock"
+
+class SingleFlight:
+    """Run fn once per key at a time; concurrent callers for the key share the result"""
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, lock_dir=None, after_wait=None):
+        """
+        Call fn() unless an identical call is already running
+
+        Args:
+            key: Hashable identity of the call (e.g. (location, report_type, output_dir))
+            fn: Zero-argument callable doing the work
+            lock_dir: Folder for the cross-process lock file (default self.lock_dir)
+            after_wait: Optional callable(started) run when another process held the
+                        lock; a non-None return is used instead of calling fn
+
+        Returns:
+            fn()'s result (or the in-flight call's result); its exception is raised to every caller
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            metrics.inc("single_flight_shared")
+            log.debug(f"[OK] Joined in-flight call: {key}")
+            return future.result()
+
+        try:
+            result = self._run(key, fn, lock_dir or self.lock_dir, after_wait)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def _run(self, key, fn, lock_dir, after_wait):
+        if not lock_dir:
+            return fn()
+
+        started = time.time()
+        with FileLock(os.path.join(lock_dir, _lock_name(key))) as lock:
+            if lock.waited and after_wait is not None:
+                result = after_wait(started)
+                if result is not None:
+                    metrics.inc("single_flight_shared", scope="process")
+                    return result
+            return fn()
@@ -9,42 +9,34 @@ Generates comprehensive sky forecasts with 3 charts:
 import os
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import cm
 import requests
 
 from config.settings import BASE_OUTPUT
+from core import (forecast_cache, chart_cache, chart_render, pdf_render, metrics, spatial_index, report_catalog,
+                  output_profiles, astronomy)
+
+log = metrics.get_logger("sky")
 
 # =============================================
 # MOON PHASE LOGIC
 # =============================================
 
 def get_moon_phase(d=None):
-    """Calculates moon phase and returns name and emoji"""
+    """Moon phase name and emoji at a time (default now), from the moon's age"""
     if d is None:
         d = datetime.now()
+    if not isinstance(d, datetime):
+        d = datetime.combine(d, datetime.min.time()).replace(hour=12)
     
-    year, month, day = d.year, d.month, d.day
-    if month <= 2:
-        year -= 1
-        month += 12
-    
-    a = year // 100
-    b = a // 4
-    c = 2 - a + b
-    e = int(365.25 * (year + 4716))
-    f = int(30.6001 * (month + 1))
-    jd = e + f + day + c - 1524.5
-    days_since_new = (jd - 2451549.5) % 29.53
+    _, age = astronomy.moon_phase(astronomy.julian_day(d.timestamp()))
+    days_since_new = float(age) * 29.53
     
     if days_since_new < 1.84: return "New Moon", "🌑"
     elif days_since_new < 5.53: return "Waxing Crescent", "🌒"
@@ -67,74 +59,141 @@ def check_astro_window(cloud_cover):
 # SKY DATA FETCHING
 # =============================================
 
+SKY_HOURLY_VARS = ["cloud_cover"]
+SKY_FORECAST_DAYS = 7
+
+def parse_sky_data(data):
+    """Build the sky DataFrame from one Open-Meteo location response"""
+    df = pd.DataFrame(data['hourly'])
+    df['time'] = pd.to_datetime(df['time'])
+    # Where the forecast is and its UTC offset, for the night windows
+    if 'latitude' in data and 'longitude' in data:
+        df.attrs['site'] = (data['latitude'], data['longitude'], data.get('utc_offset_seconds', 0))
+    return df
+
 def fetch_sky_data(lat, lon):
     """Fetch sky data from Open-Meteo API (7 day forecast)"""
     try:
-        print(f"\n🌌 FETCHING SKY DATA")
-        print(f"   Latitude: {lat}")
-        print(f"   Longitude: {lon}")
+        log.debug(f"\n🌌 FETCHING SKY DATA")
+        log.debug(f"   Latitude: {lat}")
+        log.debug(f"   Longitude: {lon}")
         
         # Only cloud_cover - no visibility or humidity
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=cloud_cover&forecast_days=7&timezone=auto"
-        print(f"   URL: {url}")
-        
-        print(f"   Sending request...")
-        response = requests.get(url, timeout=15)
-        
-        print(f"   Status Code: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"   ❌ API returned status {response.status_code}")
-            print(f"   Response: {response.text[:500]}")
+        log.debug(f"   Sending request...")
+        try:
+            lat, lon = spatial_index.fetch_coords(lat, lon)
+            with metrics.span("fetch", report="sky"):
+                data = forecast_cache.get_forecast(lat, lon, hourly=SKY_HOURLY_VARS, forecast_days=SKY_FORECAST_DAYS)
+        except requests.exceptions.HTTPError as e:
+            log.error(f"   ❌ API returned status {e.response.status_code}")
+            log.error(f"   Response: {e.response.text[:500]}")
             return None
         
-        data = response.json()
-        print(f"   ✅ Response received")
+        log.debug(f"   ✅ Response received")
         
         if 'hourly' not in data:
-            print(f"   ❌ No 'hourly' key in response")
+            log.error(f"   ❌ No 'hourly' key in response")
             return None
         
-        hourly_data = data['hourly']
-        df = pd.DataFrame(hourly_data)
-        df['time'] = pd.to_datetime(df['time'])
+        with metrics.span("parse", report="sky"):
+            df = parse_sky_data(data)
         
-        print(f"   ✅ DataFrame created: {len(df)} rows")
-        print(f"   Columns: {list(df.columns)}")
+        log.debug(f"   ✅ DataFrame created: {len(df)} rows")
+        log.debug(f"   Columns: {list(df.columns)}")
         
         return df
         
     except requests.exceptions.Timeout:
-        print(f"   ❌ TIMEOUT: API server not responding")
+        log.error(f"   ❌ TIMEOUT: API server not responding")
         return None
     except requests.exceptions.ConnectionError as e:
-        print(f"   ❌ CONNECTION ERROR: {e}")
+        log.error(f"   ❌ CONNECTION ERROR: {e}")
         return None
     except Exception as e:
-        print(f"   ❌ ERROR: {type(e).__name__}: {e}")
+        log.error(f"   ❌ ERROR: {type(e).__name__}: {e}")
         return None
 
+# =============================================
+# NIGHT WINDOWS
+# =============================================
+
+def night_windows(df):
+    """
+    Sunset, astronomical dark window, sunrise and moon for every forecast night
+    
+    Returns:
+        DataFrame: One row per night, indexed by the date it starts on (columns as
+                   astronomy.night_grid), or None when the frame has no site
+    """
+    site = df.attrs.get('site')
+    if site is None:
+        return None
+    
+    lat, lon, utc_offset = site
+    dates = np.unique(df['time'].to_numpy().astype('datetime64[D]'))
+    grid = astronomy.night_grid([lat], [lon], [utc_offset], dates)
+    return pd.DataFrame({name: values[0] for name, values in grid.items()}, index=pd.DatetimeIndex(dates).date)
+
+def night_hours(df):
+    """
+    Forecast hours with cloud cover, labelled "night" (the date the night
+    starts on; nights run noon to noon), "dark" (inside the astronomical dark
+    window, to the nearest hour) and "moon_up". Without a site the dark
+    window is a fixed 20:00-04:00 and the moon is ignored.
+    """
+    hours = df.dropna(subset=['cloud_cover']).copy()
+    times = hours['time'].to_numpy()
+    hours['night'] = astronomy.night_of(times).astype(object)
+    
+    site = df.attrs.get('site')
+    if site is None:
+        hour = hours['time'].dt.hour
+        hours['dark'] = (hour >= 20) | (hour <= 4)
+        hours['moon_up'] = False
+    else:
+        lat, lon, utc_offset = site
+        hours['dark'] = astronomy.dark_mask(times, [lat], [lon], [utc_offset])[0]
+        hours['moon_up'] = astronomy.altitudes(times, lat, lon, utc_offset)[1] > 0
+    
+    return hours
+
+def nightly_cloud_cover(df):
+    """
+    Mean and minimum cloud cover over each night's dark hours
+    
+    Returns:
+        DataFrame: date, avg_cloud, min_cloud (the tail of the night before the forecast starts is left out)
+    """
+    hours = night_hours(df)
+    if len(hours):
+        hours = hours[hours['dark'] & (hours['night'] >= hours['time'].min().date())]
+    
+    nightly = hours.groupby('night')['cloud_cover'].agg(['mean', 'min']).reset_index()
+    nightly.columns = ['date', 'avg_cloud', 'min_cloud']
+    return nightly
+
+def night_span(nights, night):
+    """Chart range for the night starting on a date: sunset to sunrise (to the hour), or 20:00-04:00"""
+    start = datetime.combine(night, datetime.min.time()).replace(hour=20)
+    end = start + timedelta(hours=8)
+    
+    if nights is not None and night in nights.index:
+        row = nights.loc[night]
+        if not pd.isna(row['sunset']) and not pd.isna(row['sunrise']):
+            start = pd.Timestamp(row['sunset']).floor('h').to_pydatetime()
+            end = pd.Timestamp(row['sunrise']).ceil('h').to_pydatetime()
+    
+    return start, end
+
 def find_best_viewing_night(df):
-    """Find the best night for stargazing in the next 7 days"""
+    """Find the clearest night in the next 7 days, over each night's dark hours"""
     try:
-        df_copy = df.copy()
-        df_copy['date'] = df_copy['time'].dt.date
-        df_copy['hour'] = df_copy['time'].dt.hour
-        
-        # Remove None/NaN values
-        df_copy = df_copy.dropna(subset=['cloud_cover'])
-        
-        # Only look at night hours (20:00 to 04:00)
-        night_df = df_copy[(df_copy['hour'] >= 20) | (df_copy['hour'] <= 4)]
+        nightly_clouds = nightly_cloud_cover(df)
         
-        if len(night_df) == 0:
-            print("No night data available")
+        if len(nightly_clouds) == 0:
+            log.warning("No night data available")
             return None, 0
         
-        # Calculate average cloud cover for each night
-        nightly_clouds = night_df.groupby('date')['cloud_cover'].agg(['mean', 'min']).reset_index()
-        nightly_clouds.columns = ['date', 'avg_cloud', 'min_cloud']
-        
         # Find night with lowest cloud cover (clearest night)
         if len(nightly_clouds) > 0:
             best_idx = nightly_clouds['avg_cloud'].idxmin()
@@ -144,204 +203,238 @@ def find_best_viewing_night(df):
         
         return None, 0
     except Exception as e:
-        print(f"Error finding best viewing night: {e}")
+        log.error(f"Error finding best viewing night: {e}")
         return None, 0
 
 # =============================================
 # CHART GENERATION
 # =============================================
 
+def _night_scaffold(title=None):
+    """Static axes shared by the tonight and best night charts"""
+    fig = chart_render.new_figure((10, 3.5))
+    ax = fig.add_subplot()
+    ax.set_ylabel("Clarity (%)", fontsize=11, fontweight="bold")
+    if title:
+        ax.set_title(title, fontsize=12, fontweight="bold")
+    ax.set_ylim(0, 110)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    ax.tick_params(axis='x', labelrotation=45, labelsize=9)
+    return fig, ax
+
+def _tonight_scaffold():
+    return _night_scaffold("TONIGHT'S SKY CONDITIONS")
+
+def _best_night_scaffold():
+    return _night_scaffold()
+
+def _weekly_sky_scaffold():
+    """Static axes for the 7-night chart"""
+    fig = chart_render.new_figure((10, 3.5))
+    ax = fig.add_subplot()
+    ax.set_ylabel("Sky Clarity (%)", fontsize=11, fontweight="bold")
+    ax.set_xlabel("Date", fontsize=11, fontweight="bold")
+    ax.set_title("7-NIGHT SKY FORECAST", fontsize=12, fontweight="bold")
+    ax.set_ylim(0, 110)
+    ax.grid(True, alpha=0.3, axis='y', linestyle='--')
+    return fig, ax
+
+def _night_shading(nights, night):
+    """
+    What to shade on a night chart: the astronomical dark window and the moon
+    
+    Returns:
+        dict: {"dark": (start, end) or None, "moon": legend label}, empty without night windows
+    """
+    if nights is None or night not in nights.index:
+        return {}
+    
+    row = nights.loc[night]
+    dark = None if pd.isna(row['dusk']) else (pd.Timestamp(row['dusk']), pd.Timestamp(row['dawn']))
+    return {"dark": dark, "moon": f"Moon up ({row['moon_illumination']:.0%} lit)"}
+
+def _shade_night(ax, night_df, shading, start, end):
+    """Shade the dark window and the hours the moon is up"""
+    if shading.get("dark"):
+        dusk, dawn = shading["dark"]
+        ax.axvspan(max(dusk, pd.Timestamp(start)), min(dawn, pd.Timestamp(end)), color="midnightblue", alpha=0.12,
+                   label="Astronomical dark")
+    if shading and night_df["moon_up"].any():
+        ax.fill_between(night_df["time"], 0, 110, where=night_df["moon_up"], step="mid", color="silver", alpha=0.35,
+                        lw=0, label=shading["moon"])
+
 def generate_tonight_sky_chart(df, location):
-    """Chart 1: Tonight's sky clarity"""
+    """Chart 1: Tonight's sky clarity, sunset to sunrise"""
     try:
         now = datetime.now()
-        night_start = now.replace(hour=20, minute=0, second=0, microsecond=0)
-        night_end = now.replace(hour=4, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        nights = night_windows(df)
+        night_start, night_end = night_span(nights, now.date())
         
-        night_df = df[(df["time"] >= night_start) & (df["time"] <= night_end)].copy()
+        hours = night_hours(df)
+        night_df = hours[(hours["time"] >= night_start) & (hours["time"] <= night_end)]
         
         if len(night_df) == 0:
-            night_df = df[df["time"].dt.date == now.date()].copy()
-        
-        # Remove NaN values
-        night_df = night_df.dropna(subset=['cloud_cover'])
+            night_df = hours[hours["time"].dt.date == now.date()]
         
         if len(night_df) == 0:
-            print("No data for tonight's chart")
+            log.warning("No data for tonight's chart")
             return None
         
-        fig, ax = plt.subplots(figsize=(10, 3.5))
-        
-        clarity = 100 - night_df["cloud_cover"]
-        ax.plot(night_df["time"], clarity, color="#4b0082", lw=3, label="Sky Clarity %")
-        ax.fill_between(night_df["time"], clarity, color="#4b0082", alpha=0.3)
-        
-        # Mark excellent viewing windows
-        for i, row in night_df.iterrows():
-            if pd.notna(row['cloud_cover']) and row['cloud_cover'] <= 15:
-                ax.scatter(row["time"], 100 - row["cloud_cover"], color="gold", marker="*", s=200, zorder=5, edgecolor='yellow', linewidth=1.5)
-        
-        ax.axvline(now, color="red", lw=2, ls="--", label="Current Time")
-        ax.set_ylabel("Clarity (%)", fontsize=11, fontweight="bold")
-        ax.set_title("TONIGHT'S SKY CONDITIONS", fontsize=12, fontweight="bold")
-        ax.set_ylim(0, 110)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.legend(loc="upper left", fontsize=10)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        plt.xticks(rotation=45, fontsize=9)
-        
-        plt.tight_layout(pad=0.5)
-        
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        plt.close()
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        shading = _night_shading(nights, now.date())
+        
+        def render():
+            fig, ax = chart_render.get_template("sky_tonight", _tonight_scaffold)
+            
+            _shade_night(ax, night_df, shading, night_start, night_end)
+            clarity = 100 - night_df["cloud_cover"]
+            ax.plot(night_df["time"], clarity, color="#4b0082", lw=3, label="Sky Clarity %")
+            ax.fill_between(night_df["time"], clarity, color="#4b0082", alpha=0.3)
+            
+            # Mark excellent viewing windows (one scatter for every clear hour)
+            clear = night_df[night_df['cloud_cover'] <= 15]
+            if len(clear) > 0:
+                ax.scatter(clear["time"], 100 - clear["cloud_cover"], color="gold", marker="*", s=200, zorder=5, edgecolor='yellow', linewidth=1.5)
+            
+            # The current hour stays inside the x range; the marker itself is a cached-base overlay
+            ax.axvline(hour, visible=False)
+            ax.plot([], [], color="red", lw=2, ls="--", label="Current Time")
+            ax.legend(loc="upper left", fontsize=10)
+            fig.tight_layout(pad=0.5)
+            
+            return chart_cache.figure_png(fig, ax, dpi=150, tight=True)
+        
+        key = chart_cache.chart_key("sky_tonight", night_df[["time", "cloud_cover", "moon_up"]], hour=hour,
+                                    span=(night_start, night_end), shading=shading)
+        png, meta = chart_cache.cached_render(key, render)
+        
+        buf = BytesIO(chart_cache.overlay_time_marker(png, meta, now, color="red", lw=2, ls="--"))
         buf.seek(0)
         return buf
     except Exception as e:
-        print(f"Error generating tonight chart: {e}")
+        log.error(f"Error generating tonight chart: {e}")
         return None
 
-def generate_best_night_chart(df, location):
-    """Chart 2: Best night for viewing"""
+def generate_best_night_chart(df, location, best_date=None):
+    """Chart 2: Best night for viewing (best_date from analyze_data if known)"""
     try:
-        best_date, _ = find_best_viewing_night(df)
+        if best_date is None:
+            best_date, _ = find_best_viewing_night(df)
         
         if best_date is None:
             best_date = datetime.now().date() + timedelta(days=1)
         
-        best_night_start = datetime.combine(best_date, datetime.min.time()).replace(hour=20)
-        best_night_end = best_night_start + timedelta(hours=8)
-        
-        best_df = df[(df["time"] >= best_night_start) & (df["time"] <= best_night_end)].copy()
+        nights = night_windows(df)
+        best_night_start, best_night_end = night_span(nights, best_date)
         
-        # Remove NaN values
-        best_df = best_df.dropna(subset=['cloud_cover'])
+        hours = night_hours(df)
+        best_df = hours[(hours["time"] >= best_night_start) & (hours["time"] <= best_night_end)]
         
         if len(best_df) == 0:
-            print("No data for best night chart")
+            log.warning("No data for best night chart")
             return None
         
-        fig, ax = plt.subplots(figsize=(10, 3.5))
-        
-        clarity = 100 - best_df["cloud_cover"]
-        ax.plot(best_df["time"], clarity, color="#FFD700", lw=3, label="Sky Clarity %")
-        ax.fill_between(best_df["time"], clarity, color="#FFD700", alpha=0.3)
-        
-        # Mark excellent viewing windows
-        for i, row in best_df.iterrows():
-            if pd.notna(row['cloud_cover']) and row['cloud_cover'] <= 15:
-                ax.scatter(row["time"], 100 - row["cloud_cover"], color="gold", marker="*", s=200, zorder=5, edgecolor='yellow', linewidth=1.5)
-        
-        ax.set_ylabel("Clarity (%)", fontsize=11, fontweight="bold")
-        ax.set_title(f"BEST VIEWING NIGHT: {best_date.strftime('%A, %B %d')}", fontsize=12, fontweight="bold")
-        ax.set_ylim(0, 110)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.legend(loc="upper left", fontsize=10)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        plt.xticks(rotation=45, fontsize=9)
-        
-        plt.tight_layout(pad=0.5)
-        
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        plt.close()
+        title = f"BEST VIEWING NIGHT: {best_date.strftime('%A, %B %d')}"
+        shading = _night_shading(nights, best_date)
+        
+        def render():
+            fig, ax = chart_render.get_template("sky_best_night", _best_night_scaffold)
+            
+            _shade_night(ax, best_df, shading, best_night_start, best_night_end)
+            clarity = 100 - best_df["cloud_cover"]
+            ax.plot(best_df["time"], clarity, color="#FFD700", lw=3, label="Sky Clarity %")
+            ax.fill_between(best_df["time"], clarity, color="#FFD700", alpha=0.3)
+            
+            # Mark excellent viewing windows (one scatter for every clear hour)
+            clear = best_df[best_df['cloud_cover'] <= 15]
+            if len(clear) > 0:
+                ax.scatter(clear["time"], 100 - clear["cloud_cover"], color="gold", marker="*", s=200, zorder=5, edgecolor='yellow', linewidth=1.5)
+            
+            ax.set_title(title, fontsize=12, fontweight="bold")
+            ax.legend(loc="upper left", fontsize=10)
+            fig.tight_layout(pad=0.5)
+            
+            return chart_cache.figure_png(fig, dpi=150, tight=True)
+        
+        key = chart_cache.chart_key("sky_best_night", best_df[["time", "cloud_cover", "moon_up"]], title=title,
+                                    shading=shading)
+        png, _ = chart_cache.cached_render(key, render)
+        
+        buf = BytesIO(png)
         buf.seek(0)
         return buf
     except Exception as e:
-        print(f"Error generating best night chart: {e}")
+        log.error(f"Error generating best night chart: {e}")
         return None
 
 def generate_weekly_sky_chart(df, location):
-    """Chart 3: 7-night sky forecast"""
+    """Chart 3: 7-night sky forecast (clarity over each night's dark hours)"""
     try:
-        df_copy = df.copy()
-        df_copy = df_copy.dropna(subset=['cloud_cover'])
-        
-        df_copy['date'] = df_copy['time'].dt.date
-        df_copy['hour'] = df_copy['time'].dt.hour
-        
-        # Focus on night hours only
-        night_df = df_copy[(df_copy['hour'] >= 20) | (df_copy['hour'] <= 4)]
-        
-        if len(night_df) == 0:
-            print("No night data for weekly chart")
-            return None
-        
         # Calculate average cloud cover for each night
-        nightly = night_df.groupby('date')['cloud_cover'].agg(['mean', 'min']).reset_index()
-        nightly.columns = ['date', 'avg_cloud', 'min_cloud']
+        nightly = nightly_cloud_cover(df)
         nightly['clarity'] = 100 - nightly['avg_cloud']
         
         if len(nightly) == 0:
-            print("No nightly data for weekly chart")
+            log.warning("No nightly data for weekly chart")
             return None
         
-        # Identify best night
-        best_idx = nightly['avg_cloud'].idxmin()
-        
-        fig, ax = plt.subplots(figsize=(10, 3.5))
-        
-        # Bar chart with best night highlighted
-        colors_list = ['#FFD700' if i == best_idx else '#4b0082' for i in range(len(nightly))]
-        
-        x_pos = np.arange(len(nightly))
-        bars = ax.bar(x_pos, nightly['clarity'], color=colors_list, alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Add clarity percentage on top of bars
-        for i, (bar, clarity) in enumerate(zip(bars, nightly['clarity'])):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 2,
-                    f'{clarity:.0f}%', ha='center', va='bottom', fontsize=9, fontweight='bold')
-        
-        ax.set_ylabel("Sky Clarity (%)", fontsize=11, fontweight="bold")
-        ax.set_xlabel("Date", fontsize=11, fontweight="bold")
-        ax.set_title("7-NIGHT SKY FORECAST", fontsize=12, fontweight="bold")
-        ax.set_xticks(x_pos)
-        ax.set_xticklabels([d.strftime('%a\n%m/%d') for d in nightly['date']], fontsize=9)
-        ax.set_ylim(0, 110)
-        ax.grid(True, alpha=0.3, axis='y', linestyle='--')
-        
-        plt.tight_layout(pad=0.5)
-        
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        plt.close()
+        date_labels = [d.strftime('%a\n%m/%d') for d in nightly['date']]
+        nights = night_windows(df)
+        if nights is not None:
+            moon = nights['moon_illumination'].reindex(nightly['date']).to_numpy()
+            date_labels = [label if np.isnan(lit) else f"{label}\nMoon {lit:.0%}" for label, lit in zip(date_labels, moon)]
+        
+        def render():
+            # Identify best night
+            best_idx = nightly['avg_cloud'].idxmin()
+            
+            fig, ax = chart_render.get_template("sky_weekly", _weekly_sky_scaffold)
+            
+            # Bar chart with best night highlighted
+            colors_list = ['#FFD700' if i == best_idx else '#4b0082' for i in range(len(nightly))]
+            
+            x_pos = np.arange(len(nightly))
+            bars = ax.bar(x_pos, nightly['clarity'], color=colors_list, alpha=0.7, edgecolor='black', linewidth=1.5)
+            
+            # Add clarity percentage on top of bars
+            for i, (bar, clarity) in enumerate(zip(bars, nightly['clarity'])):
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 2,
+                        f'{clarity:.0f}%', ha='center', va='bottom', fontsize=9, fontweight='bold')
+            
+            ax.set_xticks(x_pos)
+            ax.set_xticklabels(date_labels, fontsize=9)
+            fig.tight_layout(pad=0.5)
+            
+            return chart_cache.figure_png(fig, dpi=150, tight=True)
+        
+        key = chart_cache.chart_key("sky_weekly", nightly[['avg_cloud', 'clarity']], labels=date_labels)
+        png, _ = chart_cache.cached_render(key, render)
+        
+        buf = BytesIO(png)
         buf.seek(0)
         return buf
     except Exception as e:
-        print(f"Error generating weekly chart: {e}")
+        log.error(f"Error generating weekly chart: {e}")
         return None
 # =============================================
-# PDF GENERATION
+# REPORT STAGES
 # =============================================
 
-def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT):
-    """Generate complete night sky report PDF with 3 charts"""
-    try:
-        print(f"\n{'='*50}")
-        print(f"GENERATING SKY REPORT")
-        print(f"{'='*50}")
-        print(f"Location: {location}")
-        print(f"Coordinates: {coords}")
-        
-        lat, lon = coords
-        df = fetch_sky_data(lat, lon)
-        
-        if df is None or len(df) == 0:
-            raise RuntimeError("Failed to fetch sky data or no data returned")
-        
-        print(f"✅ Data fetched successfully")
-        
-        # Create location folder
-        loc_dir = os.path.join(output_dir, location)
-        os.makedirs(loc_dir, exist_ok=True)
-        
-        # Generate filename
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
-        filename = f"Sky_Report_{location.replace(' ', '_')}_{timestamp}.pdf"
-        save_path = os.path.join(loc_dir, filename)
-        
-                # Get current conditions
+def fetch_data(coords):
+    """Stage 1: fetch the sky DataFrame for (lat, lon)"""
+    lat, lon = coords
+    df = fetch_sky_data(lat, lon)
+    
+    if df is None or len(df) == 0:
+        raise RuntimeError("Failed to fetch sky data or no data returned")
+    
+    return df
+
+def analyze_data(df):
+    """Stage 2: current clarity, moon phase, tonight's dark window and best viewing night"""
+    with metrics.span("analysis", report="sky"):
         current_cloud = df.iloc[-1]['cloud_cover']
         
         # Handle None/NaN values
@@ -353,88 +446,210 @@ def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT):
             else:
                 current_cloud = 50  # Default fallback
         
-        current_clarity = 100 - current_cloud
         condition, symbol = check_astro_window(current_cloud)
-        
-        # Moon phase
         phase_name, phase_icon = get_moon_phase()
-        
-        # Best viewing night
         best_date, best_clarity = find_best_viewing_night(df)
         
-        print(f"Current Clarity: {current_clarity:.0f}%")
-        print(f"Moon Phase: {phase_name}")
-        print(f"Best Night: {best_date}")
-        
-        # Build PDF
-        doc = SimpleDocTemplate(save_path, pagesize=A4, topMargin=0.5*cm, bottomMargin=0.5*cm, leftMargin=0.5*cm, rightMargin=0.5*cm)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Title
-        story.append(Paragraph("<b>🌌 SENTINEL NIGHT SKY REPORT</b>", styles["Title"]))
-        story.append(Spacer(1, 10))
-        
-        # Info Table
-        info_data = [
-            ['LOCATION', location.upper()],
-            ['COORDINATES', f"{lat:.4f}, {lon:.4f}"],
-            ['MOON PHASE', f"{phase_icon} {phase_name}"],
-            ['CURRENT CONDITION', f"{symbol} {condition}"],
-            ['CURRENT CLARITY', f"{current_clarity:.0f}%"],
-            ['BEST VIEWING NIGHT', f"{best_date.strftime('%A') if best_date else 'N/A'} - {best_clarity:.0f}% Clarity" if best_date else "No data"],
-            ['GENERATED', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-        ]
-        
-        t = Table(info_data, colWidths=[4*cm, 12*cm])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#4b0082')),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 12))
-        
-        # Chart 1
-        story.append(Paragraph("<b>Chart 1: Tonight's Sky Clarity</b>", styles["Normal"]))
-        tonight_buf = generate_tonight_sky_chart(df, location)
-        if tonight_buf:
-            story.append(Image(tonight_buf, width=18*cm, height=5*cm))
-        story.append(Spacer(1, 10))
-        
-        # Chart 2
-        story.append(Paragraph("<b>Chart 2: Best Night for Viewing</b>", styles["Normal"]))
-        best_buf = generate_best_night_chart(df, location)
-        if best_buf:
-            story.append(Image(best_buf, width=18*cm, height=5*cm))
-        story.append(Spacer(1, 10))
-        
-        # Chart 3
-        story.append(Paragraph("<b>Chart 3: 7-Night Sky Forecast</b>", styles["Normal"]))
-        weekly_buf = generate_weekly_sky_chart(df, location)
-        if weekly_buf:
-            story.append(Image(weekly_buf, width=18*cm, height=5*cm))
-        story.append(Spacer(1, 8))
-        
-        # Analysis
-        story.append(Paragraph(
-            f"<b>Analysis:</b> Gold stars (⭐) indicate cloud cover <15% (optimal for stargazing). "
-            f"Analysis based on night hours (20:00-04:00). Report generated at {datetime.now().strftime('%H:%M')}.",
-            styles["Normal"]
-        ))
-        
-        # Build PDF
+        nights = night_windows(df)
+        today = datetime.now().date()
+        tonight = nights.loc[today].to_dict() if nights is not None and today in nights.index else None
+    
+    return {
+        'current_clarity': 100 - current_cloud,
+        'condition': condition,
+        'symbol': symbol,
+        'phase_name': phase_name,
+        'phase_icon': phase_icon,
+        'best_date': best_date,
+        'best_clarity': best_clarity,
+        'tonight': tonight
+    }
+
+def render_charts(df, summary=None, location=None):
+    """Stage 3: render the three charts, returns PNG bytes (None for a failed chart)"""
+    charts = []
+    best = {"best_date": summary["best_date"]} if summary else {}
+    
+    for name, chart_fn, kwargs in (("tonight", generate_tonight_sky_chart, {}),
+                                   ("best_night", generate_best_night_chart, best),
+                                   ("weekly", generate_weekly_sky_chart, {})):
+        with metrics.span("chart", report="sky", chart=name):
+            buf = chart_fn(df, location, **kwargs)
+        charts.append(buf.getvalue() if buf else None)
+    
+    return charts
+
+# Bump when the charts or PDF layout change so unchanged forecasts still get the new layout
+REPORT_VERSION = 2
+
+def report_fingerprint(location, coords, data, summary, now=None):
+    """
+    Hash of everything a report is built from, compared with the last report to skip unchanged runs
+
+    Includes the analysis summary (moon phase, tonight's window...) and the
+    hour the report is built in (see report_catalog.report_period).
+    """
+    key = tuple(summary[k] for k in ('current_clarity', 'condition', 'phase_name', 'best_date', 'best_clarity',
+                                     'tonight'))
+    return report_catalog.input_hash("Sky", data, location=location, coords=tuple(coords), version=REPORT_VERSION,
+                                     summary=key, period=report_catalog.report_period(now))
+
+def report_path(location, output_dir=BASE_OUTPUT):
+    """Create the location folder and return a timestamped PDF path"""
+    loc_dir = output_profiles.report_dir(output_dir, location)
+    os.makedirs(loc_dir, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
+    filename = f"Sky_Report_{location.replace(' ', '_')}_{timestamp}.pdf"
+    return os.path.join(loc_dir, filename)
+
+# Page margins, also used for the sky section of a combined report
+PAGE_MARGINS = {"topMargin": 0.5*cm, "bottomMargin": 0.5*cm, "leftMargin": 0.5*cm, "rightMargin": 0.5*cm}
+
+def _clock(t):
+    """HH:MM for a night window time, -- when the event does not happen"""
+    return "--" if pd.isna(t) else pd.Timestamp(t).strftime('%H:%M')
+
+def build_story(location, report_type, coords, summary, charts):
+    """The report's flowables, shared by build_pdf and the combined report"""
+    lat, lon = coords
+    best_date = summary['best_date']
+    best_clarity = summary['best_clarity']
+    tonight = summary.get('tonight')
+    
+    moon_phase = f"{summary['phase_icon']} {summary['phase_name']}"
+    dark_tonight = "N/A"
+    if tonight:
+        moon_phase += f" ({tonight['moon_illumination']:.0%} lit)"
+        dark_tonight = (f"{_clock(tonight['dusk'])} - {_clock(tonight['dawn'])} | "
+                        f"Moonrise {_clock(tonight['moonrise'])}, Moonset {_clock(tonight['moonset'])}")
+    
+    styles = pdf_render.get_styles()
+    story = []
+    
+    # Title
+    story.append(Paragraph("<b>🌌 SENTINEL NIGHT SKY REPORT</b>", styles["Title"]))
+    story.append(Spacer(1, 10))
+    
+    # Info Table
+    info_data = [
+        ['LOCATION', location.upper()],
+        ['COORDINATES', f"{lat:.4f}, {lon:.4f}"],
+        ['MOON PHASE', moon_phase],
+        ['DARK SKY TONIGHT', dark_tonight],
+        ['CURRENT CONDITION', f"{summary['symbol']} {summary['condition']}"],
+        ['CURRENT CLARITY', f"{summary['current_clarity']:.0f}%"],
+        ['BEST VIEWING NIGHT', f"{best_date.strftime('%A') if best_date else 'N/A'} - {best_clarity:.0f}% Clarity" if best_date else "No data"],
+        ['GENERATED', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+    ]
+    shared = spatial_index.shared_forecast_note(lat, lon)
+    if shared:
+        info_data.insert(2, ['FORECAST', shared])
+    
+    t = Table(info_data, colWidths=[4*cm, 12*cm])
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#4b0082')),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 12))
+    
+    # Charts
+    titles = ["Chart 1: Tonight's Sky Clarity", "Chart 2: Best Night for Viewing", "Chart 3: 7-Night Sky Forecast"]
+    for i, (title, chart) in enumerate(zip(titles, charts)):
+        story.append(Paragraph(f"<b>{title}</b>", styles["Normal"]))
+        if chart:
+            story.append(pdf_render.chart_flowable(chart, width=18*cm, height=5*cm))
+        story.append(Spacer(1, 8 if i == len(titles) - 1 else 10))
+    
+    # Analysis
+    hours_text = ("each night's astronomical dark hours (sun 18° below the horizon, shaded), moon-up hours in grey"
+                  if tonight else "night hours (20:00-04:00)")
+    story.append(Paragraph(
+        f"<b>Analysis:</b> Gold stars (⭐) indicate cloud cover <15% (optimal for stargazing). "
+        f"Analysis based on {hours_text}. Report generated at {datetime.now().strftime('%H:%M')}.",
+        styles["Normal"]
+    ))
+    
+    return story
+
+def build_pdf(location, report_type, coords, summary, charts, save_path):
+    """Stage 4: assemble the PDF from the summary and rendered charts (save_path may be a file-like object)"""
+    doc = SimpleDocTemplate(save_path, pagesize=A4, **PAGE_MARGINS)
+    story = build_story(location, report_type, coords, summary, charts)
+    
+    # Build PDF
+    with metrics.span("pdf", report="sky"):
         doc.build(story)
-        print(f"✅ PDF saved: {save_path}")
-        print(f"{'='*50}\n")
+    metrics.inc("bytes_written", pdf_render.pdf_size(save_path), report="sky", profile=output_profiles.active_name())
+    return save_path
+
+# =============================================
+# PDF GENERATION
+# =============================================
+
+def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT, data=None, force=False, output="file"):
+    """
+    Generate complete night sky report PDF with 3 charts
+    
+    Args:
+        data: Optional prefetched sky DataFrame (e.g. from a bulk fetch)
+        force: Rebuild even if the forecast is unchanged since the last report
+        output: "file" (save under output_dir, return the path), "bytes" (return the PDF
+                without saving) or a writable file-like object to stream it to
+    """
+    try:
+        log.info(f"\n{'='*50}")
+        log.info(f"GENERATING SKY REPORT")
+        log.info(f"{'='*50}")
+        log.info(f"Location: {location}")
+        log.info(f"Coordinates: {coords}")
+        
+        df = data if data is not None else fetch_data(coords)
+        
+        if df is None or len(df) == 0:
+            raise RuntimeError("Failed to fetch sky data or no data returned")
+        
+        log.info(f"✅ Data fetched successfully")
+        
+        summary = analyze_data(df)
+        fingerprint = report_fingerprint(location, coords, df, summary)
+        # Only the default profile's reports are catalogued
+        catalogued = output_profiles.is_default()
+        existing = None
+        if catalogued and not force:
+            existing = report_catalog.unchanged_report(location, "Sky", fingerprint, output_dir)
+        if existing:
+            log.info(f"✅ Forecast unchanged, keeping: {existing}")
+            log.info(f"{'='*50}\n")
+            return pdf_render.existing_pdf(existing, output)
+        
+        save_path = pdf_render.pdf_target(output, lambda: report_path(location, output_dir))
+        
+        log.info(f"Current Clarity: {summary['current_clarity']:.0f}%")
+        log.info(f"Moon Phase: {summary['phase_name']}")
+        log.info(f"Best Night: {summary['best_date']}")
+        
+        charts = render_charts(df, summary, location)
+        build_pdf(location, report_type, coords, summary, charts, save_path)
+        if output != "file":
+            log.info(f"✅ PDF built, not saved: {pdf_render.pdf_size(save_path)} bytes")
+            log.info(f"{'='*50}\n")
+            return pdf_render.pdf_result(save_path, output)
+        if catalogued:
+            report_catalog.record_report(save_path, location, "Sky", input_hash=fingerprint, output_dir=output_dir)
+        
+        log.info(f"✅ PDF saved: {save_path}")
+        log.info(f"{'='*50}\n")
         return save_path
         
     except Exception as e:
-        print(f"\n❌ SKY REPORT GENERATION FAILED")
-        print(f"Error: {type(e).__name__}: {e}")
-        print(f"{'='*50}\n")
-        raise
\ No newline at end of file
+        log.error(f"\n❌ SKY REPORT GENERATION FAILED")
+        log.error(f"Error: {type(e).__name__}: {e}")
+        log.info(f"{'='*50}\n")
+        raise
@@ -0,0 +1,200 @@
+"""
+Spatial Index - Nearest, bounding box and grid-cell queries over locations
+Built on the LocationManager coordinate arrays: distances are vectorized
+haversine over the whole catalog, and catalog locations within
+FORECAST_COALESCE_KM of each other (e.g. Kirra and Snapper Rocks) are grouped
+so they can share one API fetch. Points that are not in the catalog
+always fetch at their own coordinates.
+"""
+
+import threading
+
+import numpy as np
+
+from config.settings import BASE_OUTPUT, FORECAST_COALESCE_KM, FORECAST_COALESCE
+
+EARTH_RADIUS_KM = 6371.0088
+
+_index = None
+_index_lock = threading.Lock()
+
+# =============================================
+# GEOMETRY
+# =============================================
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km between points (scalars or broadcastable arrays)"""
+    lat1 = np.radians(lat)
+    lats2 = np.radians(lats)
+    dlat = lats2 - lat1
+    dlon = np.radians(lons) - np.radians(lon)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lats2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# =============================================
+# INDEX
+# =============================================
+
+class SpatialIndex:
+    """Read-only index over a set of named points"""
+
+    def __init__(self, names, lats, lons, radius_km=FORECAST_COALESCE_KM):
+        self.names = list(names)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.radius_km = radius_km
+        self._members = {(float(lat), float(lon)): i for i, (lat, lon) in enumerate(zip(self.lats, self.lons))}
+        self._rep = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, lat, lon, n=5, max_km=None):
+        """
+        The n locations closest to a point
+
+        Returns:
+            list: [(name, distance_km), ...] nearest first
+        """
+        if len(self) == 0 or n <= 0:
+            return []
+
+        dist = haversine_km(lat, lon, self.lats, self.lons)
+        n = min(n, len(dist))
+        idx = np.argpartition(dist, n - 1)[:n]
+        idx = idx[np.argsort(dist[idx], kind="stable")]
+
+        if max_km is not None:
+            idx = idx[dist[idx] <= max_km]
+
+        return [(self.names[i], float(dist[i])) for i in idx]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Names of every location inside a bounding box
+
+        A box with min_lon > max_lon wraps across the antimeridian
+        """
+        lat_ok = (self.lats >= min_lat) & (self.lats <= max_lat)
+        if min_lon <= max_lon:
+            lon_ok = (self.lons >= min_lon) & (self.lons <= max_lon)
+        else:
+            lon_ok = (self.lons >= min_lon) | (self.lons <= max_lon)
+
+        return [self.names[i] for i in np.flatnonzero(lat_ok & lon_ok)]
+
+    def _representative_index(self):
+        """
+        Index of the location each location shares its forecast with
+
+        Greedy grouping: the location with the most ungrouped neighbours
+        within radius_km takes all of them, until every location is grouped.
+        Every member is within radius_km of its representative, which is
+        always a real spot (a point between spots may be over land or water
+        where a coastal or inland variable is missing).
+        """
+        if self._rep is None:
+            n = len(self)
+            rep = np.arange(n)
+            if n:
+                near = haversine_km(self.lats[:, None], self.lons[:, None], self.lats, self.lons) <= self.radius_km
+                # Locations with no neighbour keep their own forecast
+                open_ = near.sum(axis=1) > 1
+                while open_.any():
+                    counts = np.where(open_, (near & open_).sum(axis=1), -1)
+                    i = int(np.argmax(counts))
+                    members = near[i] & open_
+                    rep[members] = i
+                    open_ &= ~members
+            self._rep = rep
+        return self._rep
+
+    def groups(self):
+        """
+        Locations that share one forecast fetch
+
+        Returns:
+            dict: {representative name: [member names...]} for groups of two or more
+        """
+        rep = self._representative_index()
+        groups = {}
+        for i, r in enumerate(rep):
+            groups.setdefault(self.names[r], []).append(self.names[i])
+        return {name: members for name, members in groups.items() if len(members) > 1}
+
+    def shared_forecast(self, lat, lon):
+        """
+        The catalog location whose forecast a catalog location uses instead of its own
+
+        Returns:
+            tuple: (name, lat, lon, distance_km), or None for a point outside the
+                   catalog or one that fetches its own forecast
+        """
+        i = self._members.get((float(lat), float(lon)))
+        if i is None:
+            return None
+
+        r = int(self._representative_index()[i])
+        if r == i:
+            return None
+        distance = float(haversine_km(lat, lon, self.lats[r], self.lons[r]))
+        return self.names[r], float(self.lats[r]), float(self.lons[r]), distance
+
+    def fetch_coords(self, lat, lon):
+        """
+        Coordinates to fetch a forecast for a point with
+
+        Catalog locations fetch at their group's representative, so the whole
+        group shares one request and cache entry; any other point is unchanged
+        """
+        shared = self.shared_forecast(lat, lon)
+        return (shared[1], shared[2]) if shared else (lat, lon)
+
+def get_index():
+    """The shared index over locations.json, rebuilt when the file changes"""
+    global _index
+    from core.location_manager import LocationManager
+
+    names, lats, lons = LocationManager(BASE_OUTPUT).get_coordinate_arrays()
+
+    index = _index
+    if index is None or index.lats is not lats:
+        with _index_lock:
+            if _index is None or _index.lats is not lats:
+                _index = SpatialIndex(names, lats, lons)
+            index = _index
+
+    return index
+
+# =============================================
+# CONVENIENCE
+# =============================================
+
+def nearest_locations(lat, lon, n=5, max_km=None):
+    """[(name, distance_km), ...] for the n catalog locations nearest a point"""
+    return get_index().nearest(lat, lon, n=n, max_km=max_km)
+
+def locations_in_bbox(min_lat, min_lon, max_lat, max_lon):
+    """Catalog locations inside a bounding box"""
+    return get_index().within_bbox(min_lat, min_lon, max_lat, max_lon)
+
+def fetch_coords(lat, lon):
+    """
+    Shared-fetch coordinates for a point (unchanged when coalescing is off)
+
+    Set FORECAST_COALESCE=False to fetch every location at its own coordinates
+    """
+    if not FORECAST_COALESCE:
+        return lat, lon
+    return get_index().fetch_coords(lat, lon)
+
+def shared_forecast_note(lat, lon):
+    """Report text naming the location whose forecast a point uses, or None if it uses its own"""
+    if not FORECAST_COALESCE:
+        return None
+    shared = get_index().shared_forecast(lat, lon)
+    if shared is None:
+        return None
+    name, _, _, distance = shared
+    return f"Shared with {name} ({distance:.1f} km away)"
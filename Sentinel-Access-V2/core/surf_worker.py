@@ -1,53 +1,58 @@
 """
 Surf Report Generator - Real API Data
 Generates comprehensive surf forecasts with 3 charts
-Using temporary PNG files that are referenced in PDF
+Charts are rendered to in-memory PNG buffers that are embedded in the PDF
 """
 
 import os
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from io import BytesIO
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import cm
-import requests
-import tempfile
-import shutil
 
 from config.settings import BASE_OUTPUT
+from core import forecast_cache, chart_cache, chart_render, pdf_render, metrics, spatial_index, report_catalog, output_profiles
+
+log = metrics.get_logger("surf")
 
 # =============================================
 # FETCH REAL SURF DATA
 # =============================================
 
+SURF_HOURLY_VARS = ["wave_height", "wave_period"]
+SURF_FORECAST_DAYS = 7
+
+def parse_surf_data(data):
+    """Build the surf DataFrame from one Open-Meteo location response"""
+    df = pd.DataFrame(data['hourly'])
+    df['time'] = pd.to_datetime(df['time'])
+    
+    df['wave_height'] = pd.to_numeric(df['wave_height'], errors='coerce')
+    df['wave_period'] = pd.to_numeric(df['wave_period'], errors='coerce')
+    
+    return df
+
 def fetch_surf_data(lat, lon):
     """Fetch wave data from Open-Meteo API"""
     try:
-        print(f"[FETCH] Fetching surf data for {lat}, {lon}")
+        log.debug(f"[FETCH] Fetching surf data for {lat}, {lon}")
         
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=wave_height,wave_period&forecast_days=7&timezone=auto"
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
+        lat, lon = spatial_index.fetch_coords(lat, lon)
+        with metrics.span("fetch", report="surf"):
+            data = forecast_cache.get_forecast(lat, lon, hourly=SURF_HOURLY_VARS, forecast_days=SURF_FORECAST_DAYS)
+        with metrics.span("parse", report="surf"):
+            df = parse_surf_data(data)
         
-        data = response.json()
-        df = pd.DataFrame(data['hourly'])
-        df['time'] = pd.to_datetime(df['time'])
-        
-        df['wave_height'] = pd.to_numeric(df['wave_height'], errors='coerce')
-        df['wave_period'] = pd.to_numeric(df['wave_period'], errors='coerce')
-        
-        print(f"[OK] Got {len(df)} records")
+        log.debug(f"[OK] Got {len(df)} records")
         return df
         
     except Exception as e:
-        print(f"[ERROR] Error fetching surf data: {e}")
+        log.error(f"[ERROR] Error fetching surf data: {e}")
         return None
 
 # =============================================
@@ -86,15 +91,34 @@ def find_best_swell_day(df):
         
         return best_idx, best_height
     except Exception as e:
-        print(f"[ERROR] find_best_swell_day: {e}")
+        log.error(f"[ERROR] find_best_swell_day: {e}")
         return None, 0.0
 
+def _write_png(chart_path, png):
+    """Write PNG bytes to a file path or a writable buffer"""
+    if hasattr(chart_path, 'write'):
+        chart_path.write(png)
+    else:
+        with open(chart_path, 'wb') as f:
+            f.write(png)
+
 # =============================================
 # CHART 1: TODAY'S CONDITIONS
 # =============================================
 
+def _today_scaffold():
+    """Static axes for chart 1"""
+    fig = chart_render.new_figure((11, 5.5))
+    ax = fig.add_subplot()
+    ax.set_ylabel("Wave Height (m)", fontweight='bold', fontsize=11)
+    ax.set_title("TODAY'S WAVE CONDITIONS", fontweight='bold', fontsize=15)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig, ax
+
 def generate_today_chart(df, chart_path):
-    """Chart 1: Today's wave conditions - saves to file"""
+    """Chart 1: Today's wave conditions - saves to a file path or buffer"""
     try:
         now = datetime.now()
         day_df = df[df["time"].dt.date == now.date()].copy()
@@ -108,43 +132,55 @@ def generate_today_chart(df, chart_path):
         if len(day_df) == 0:
             return False
         
-        fig, ax = plt.subplots(figsize=(11, 5.5))
-        
-        ax.plot(day_df["time"], day_df["wave_height"], color="#1f77b4", lw=3.5, label="Wave Height (m)")
-        ax.fill_between(day_df["time"], day_df["wave_height"], alpha=0.3, color="#1f77b4")
-        
-        good_waves = day_df[day_df['wave_height'] >= 2.0]
-        if len(good_waves) > 0:
-            ax.scatter(good_waves["time"], good_waves["wave_height"], color="green", marker="x", s=120, zorder=10, lw=3, label="Excellent (>2.0m)")
-        
-        ax.axvline(now, color="red", lw=2, label="Current Time")
-        ax.set_ylabel("Wave Height (m)", fontweight='bold', fontsize=11)
-        ax.set_title("TODAY'S WAVE CONDITIONS", fontweight='bold', fontsize=15)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        ax.legend(loc='upper left', fontsize=10)
-        ax.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        plt.savefig(chart_path, format='png', dpi=140)
-        plt.close(fig)
-        
-        print(f"[OK] Chart 1 saved: {chart_path}")
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        
+        def render():
+            fig, ax = chart_render.get_template("surf_today", _today_scaffold)
+            
+            ax.plot(day_df["time"], day_df["wave_height"], color="#1f77b4", lw=3.5, label="Wave Height (m)")
+            ax.fill_between(day_df["time"], day_df["wave_height"], alpha=0.3, color="#1f77b4")
+            
+            good_waves = day_df[day_df['wave_height'] >= 2.0]
+            if len(good_waves) > 0:
+                ax.scatter(good_waves["time"], good_waves["wave_height"], color="green", marker="x", s=120, zorder=10, lw=3, label="Excellent (>2.0m)")
+            
+            # The current hour stays inside the x range; the marker itself is a cached-base overlay
+            ax.axvline(hour, visible=False)
+            ax.plot([], [], color="red", lw=2, label="Current Time")
+            ax.legend(loc='upper left', fontsize=10)
+            fig.tight_layout()
+            
+            return chart_cache.figure_png(fig, ax, dpi=140)
+        
+        key = chart_cache.chart_key("surf_today", day_df[["time", "wave_height"]], hour=hour)
+        png, meta = chart_cache.cached_render(key, render)
+        _write_png(chart_path, chart_cache.overlay_time_marker(png, meta, now, color="red", lw=2))
+        
+        log.debug(f"[OK] Chart 1 rendered")
         return True
     except Exception as e:
-        print(f"[ERROR] Chart 1: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"[ERROR] Chart 1: {e}")
         return False
 
 # =============================================
 # CHART 2: BEST SWELL DAY
 # =============================================
 
-def generate_best_day_chart(df, chart_path):
-    """Chart 2: Best day for surfing - saves to file"""
+def _best_day_scaffold():
+    """Static axes for chart 2"""
+    fig = chart_render.new_figure((11, 5.5))
+    ax = fig.add_subplot()
+    ax.set_ylabel("Wave Height (m)", fontweight='bold', fontsize=11)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig, ax
+
+def generate_best_day_chart(df, chart_path, best_date=None):
+    """Chart 2: Best day for surfing - saves to a file path or buffer (best_date from analyze_data if known)"""
     try:
-        best_date, _ = find_best_swell_day(df)
+        if best_date is None:
+            best_date, _ = find_best_swell_day(df)
         
         if best_date is None:
             best_date = datetime.now().date() + timedelta(days=1)
@@ -160,17 +196,6 @@ def generate_best_day_chart(df, chart_path):
         if len(day_df) == 0:
             return False
         
-        fig, ax = plt.subplots(figsize=(11, 5.5))
-        
-        ax.plot(day_df["time"], day_df["wave_height"], color="#ff7f0e", lw=3.5, label="Wave Height (m)")
-        ax.fill_between(day_df["time"], day_df["wave_height"], alpha=0.3, color="#ff7f0e")
-        
-        good_waves = day_df[day_df['wave_height'] >= 2.0]
-        if len(good_waves) > 0:
-            ax.scatter(good_waves["time"], good_waves["wave_height"], color="red", marker="x", s=120, zorder=10, lw=3, label="Excellent (>2.0m)")
-        
-        ax.set_ylabel("Wave Height (m)", fontweight='bold', fontsize=11)
-        
         if best_date is not None:
             try:
                 title_date = best_date.strftime('%A, %B %d')
@@ -179,30 +204,47 @@ def generate_best_day_chart(df, chart_path):
         else:
             title_date = "Best Day"
         
-        ax.set_title(f"BEST SWELL DAY: {title_date}", fontweight='bold', fontsize=15)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        ax.legend(loc='upper left', fontsize=10)
-        ax.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        plt.savefig(chart_path, format='png', dpi=140)
-        plt.close(fig)
-        
-        print(f"[OK] Chart 2 saved: {chart_path}")
+        def render():
+            fig, ax = chart_render.get_template("surf_best_day", _best_day_scaffold)
+            
+            ax.plot(day_df["time"], day_df["wave_height"], color="#ff7f0e", lw=3.5, label="Wave Height (m)")
+            ax.fill_between(day_df["time"], day_df["wave_height"], alpha=0.3, color="#ff7f0e")
+            
+            good_waves = day_df[day_df['wave_height'] >= 2.0]
+            if len(good_waves) > 0:
+                ax.scatter(good_waves["time"], good_waves["wave_height"], color="red", marker="x", s=120, zorder=10, lw=3, label="Excellent (>2.0m)")
+            
+            ax.set_title(f"BEST SWELL DAY: {title_date}", fontweight='bold', fontsize=15)
+            ax.legend(loc='upper left', fontsize=10)
+            fig.tight_layout()
+            
+            return chart_cache.figure_png(fig, dpi=140)
+        
+        key = chart_cache.chart_key("surf_best_day", day_df[["time", "wave_height"]], title=title_date)
+        png, _ = chart_cache.cached_render(key, render)
+        _write_png(chart_path, png)
+        
+        log.debug(f"[OK] Chart 2 rendered")
         return True
     except Exception as e:
-        print(f"[ERROR] Chart 2: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"[ERROR] Chart 2: {e}")
         return False
 
 # =============================================
 # CHART 3: 7-DAY FORECAST
 # =============================================
 
+def _weekly_scaffold():
+    """Static axes for chart 3"""
+    fig = chart_render.new_figure((11, 5.5))
+    ax = fig.add_subplot()
+    ax.set_ylabel("Average Wave Height (m)", fontweight='bold', fontsize=11)
+    ax.set_title("7-DAY SWELL FORECAST", fontweight='bold', fontsize=15)
+    ax.grid(True, alpha=0.3, axis='y')
+    return fig, ax
+
 def generate_weekly_chart(df, chart_path):
-    """Chart 3: 7-day swell forecast - saves to file"""
+    """Chart 3: 7-day swell forecast - saves to a file path or buffer"""
     try:
         df_copy = df.copy()
         df_copy['wave_height'] = pd.to_numeric(df_copy['wave_height'], errors='coerce')
@@ -214,150 +256,227 @@ def generate_weekly_chart(df, chart_path):
         if len(daily) == 0:
             return False
         
-        fig, ax = plt.subplots(figsize=(11, 5.5))
-        
-        best_idx = daily['mean'].idxmax()
-        colors_list = ['#ff7f0e' if d == best_idx else '#1f77b4' for d in daily.index]
-        
-        bars = ax.bar(range(len(daily)), daily['mean'], color=colors_list, alpha=0.7, edgecolor='black', lw=2)
-        
-        for i, (bar, max_h) in enumerate(zip(bars, daily['max'])):
-            ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1, 
-                   f'{max_h:.1f}m', ha='center', fontsize=9, fontweight='bold')
-        
-        ax.set_ylabel("Average Wave Height (m)", fontweight='bold', fontsize=11)
-        ax.set_title("7-DAY SWELL FORECAST", fontweight='bold', fontsize=15)
-        ax.set_xticks(range(len(daily)))
-        
         date_labels = [d.strftime('%a %d') for d in daily.index]
-        ax.set_xticklabels(date_labels, fontsize=10)
-        ax.grid(True, alpha=0.3, axis='y')
-        plt.tight_layout()
-        
-        plt.savefig(chart_path, format='png', dpi=140)
-        plt.close(fig)
         
-        print(f"[OK] Chart 3 saved: {chart_path}")
+        def render():
+            fig, ax = chart_render.get_template("surf_weekly", _weekly_scaffold)
+            
+            best_idx = daily['mean'].idxmax()
+            colors_list = ['#ff7f0e' if d == best_idx else '#1f77b4' for d in daily.index]
+            
+            bars = ax.bar(range(len(daily)), daily['mean'], color=colors_list, alpha=0.7, edgecolor='black', lw=2)
+            
+            for i, (bar, max_h) in enumerate(zip(bars, daily['max'])):
+                ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1, 
+                       f'{max_h:.1f}m', ha='center', fontsize=9, fontweight='bold')
+            
+            ax.set_xticks(range(len(daily)))
+            ax.set_xticklabels(date_labels, fontsize=10)
+            fig.tight_layout()
+            
+            return chart_cache.figure_png(fig, dpi=140)
+        
+        key = chart_cache.chart_key("surf_weekly", daily, labels=date_labels)
+        png, _ = chart_cache.cached_render(key, render)
+        _write_png(chart_path, png)
+        
+        log.debug(f"[OK] Chart 3 rendered")
         return True
     except Exception as e:
-        print(f"[ERROR] Chart 3: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"[ERROR] Chart 3: {e}")
         return False
 
 # =============================================
-# GENERATE COMPLETE PDF REPORT
+# REPORT STAGES
 # =============================================
 
-def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT):
-    """Generate complete surf report PDF"""
-    temp_dir = tempfile.mkdtemp()
+def fetch_data(coords):
+    """Stage 1: fetch the surf DataFrame for (lat, lon)"""
+    lat, lon = coords
+    df = fetch_surf_data(lat, lon)
     
-    try:
-        print(f"\n{'='*50}")
-        print(f"GENERATING SURF REPORT: {location}")
-        print(f"{'='*50}")
-        
-        lat, lon = coords
-        df = fetch_surf_data(lat, lon)
-        
-        if df is None or len(df) == 0:
-            raise Exception("No surf data fetched")
-        
-        # Create output directory
-        loc_dir = os.path.join(output_dir, location)
-        os.makedirs(loc_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
-        filename = f"Surf_Report_{location}_{timestamp}.pdf"
-        save_path = os.path.join(loc_dir, filename)
-        
-        # Get current conditions
+    if df is None or len(df) == 0:
+        raise Exception("No surf data fetched")
+    
+    return df
+
+def analyze_data(df):
+    """Stage 2: current conditions and best swell day"""
+    with metrics.span("analysis", report="surf"):
         try:
             current_height = float(df.iloc[-1]['wave_height'])
         except:
             current_height = 0.0
         
         best_date, best_height = find_best_swell_day(df)
-        best_day_text = best_date.strftime('%A') if best_date else "N/A"
-        
-        print(f"Current height: {current_height:.2f}m")
-        print(f"Best day: {best_day_text}, height: {best_height:.2f}m")
-        
-        # Generate charts to temp files
-        print("[INFO] Generating charts...")
-        chart1_path = os.path.join(temp_dir, 'chart1.png')
-        chart2_path = os.path.join(temp_dir, 'chart2.png')
-        chart3_path = os.path.join(temp_dir, 'chart3.png')
-        
-        c1_ok = generate_today_chart(df, chart1_path)
-        c2_ok = generate_best_day_chart(df, chart2_path)
-        c3_ok = generate_weekly_chart(df, chart3_path)
-        
-        # Build PDF
-        doc = SimpleDocTemplate(save_path, pagesize=A4, topMargin=0.5*cm, bottomMargin=0.5*cm)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Title
-        story.append(Paragraph(f"<b>SENTINEL SURF REPORT: {location.upper()}</b>", styles["Title"]))
-        
-        # Info Table
-        t = Table([
-            ['LOCATION', location.upper()],
-            ['COORDINATES', f"{lat:.4f}, {lon:.4f}"],
-            ['CURRENT WAVE', f"{current_height:.1f}m - {get_condition_text(current_height)}"],
-            ['BEST SWELL DAY', f"{best_day_text} - {best_height:.1f}m"],
-            ['GENERATED', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-        ], colWidths=[5*cm, 13.5*cm])
-        
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#1f77b4')),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f0f0f0')]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-        ]))
-        
-        story.append(t)
-        story.append(Spacer(1, 10))
-        
-        # Add Charts if they exist
-        if c1_ok and os.path.exists(chart1_path):
-            story.append(Image(chart1_path, 19*cm, 9*cm))
-            story.append(Spacer(1, 10))
-        
-        if c2_ok and os.path.exists(chart2_path):
-            story.append(Image(chart2_path, 19*cm, 9*cm))
-            story.append(Spacer(1, 10))
-        
-        if c3_ok and os.path.exists(chart3_path):
-            story.append(Image(chart3_path, 19*cm, 9*cm))
+    
+    return {
+        'current_height': current_height,
+        'best_date': best_date,
+        'best_height': best_height
+    }
+
+def render_charts(df, summary=None):
+    """Stage 3: render the three charts, returns PNG bytes (None for a failed chart)"""
+    charts = []
+    best = {"best_date": summary["best_date"]} if summary else {}
+    
+    for name, chart_fn, kwargs in (("today", generate_today_chart, {}), ("best_day", generate_best_day_chart, best),
+                                   ("weekly", generate_weekly_chart, {})):
+        buf = BytesIO()
+        with metrics.span("chart", report="surf", chart=name):
+            ok = chart_fn(df, buf, **kwargs)
+        charts.append(buf.getvalue() if ok else None)
+    
+    return charts
+
+# Bump when the charts or PDF layout change so unchanged forecasts still get the new layout
+REPORT_VERSION = 1
+
+def report_fingerprint(location, coords, data, summary, now=None):
+    """
+    Hash of everything a report is built from, compared with the last report to skip unchanged runs
+
+    Includes the analysis summary and the hour the report is built in
+    (see report_catalog.report_period), which the charts depend on too.
+    """
+    key = (summary['current_height'], summary['best_date'], summary['best_height'])
+    return report_catalog.input_hash("Surf", data, location=location, coords=tuple(coords), version=REPORT_VERSION,
+                                     summary=key, period=report_catalog.report_period(now))
+
+def report_path(location, output_dir=BASE_OUTPUT):
+    """Create the location folder and return a timestamped PDF path"""
+    loc_dir = output_profiles.report_dir(output_dir, location)
+    os.makedirs(loc_dir, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
+    filename = f"Surf_Report_{location}_{timestamp}.pdf"
+    return os.path.join(loc_dir, filename)
+
+# Page margins (left/right keep ReportLab's 1 inch default), also used for the surf section of a combined report
+PAGE_MARGINS = {"topMargin": 0.5*cm, "bottomMargin": 0.5*cm}
+
+def build_story(location, report_type, coords, summary, charts):
+    """The report's flowables, shared by build_pdf and the combined report"""
+    lat, lon = coords
+    current_height = summary['current_height']
+    best_date = summary['best_date']
+    best_height = summary['best_height']
+    best_day_text = best_date.strftime('%A') if best_date else "N/A"
+    
+    styles = pdf_render.get_styles()
+    story = []
+    
+    # Title
+    story.append(Paragraph(f"<b>SENTINEL SURF REPORT: {location.upper()}</b>", styles["Title"]))
+    
+    # Info Table
+    info_data = [
+        ['LOCATION', location.upper()],
+        ['COORDINATES', f"{lat:.4f}, {lon:.4f}"],
+        ['CURRENT WAVE', f"{current_height:.1f}m - {get_condition_text(current_height)}"],
+        ['BEST SWELL DAY', f"{best_day_text} - {best_height:.1f}m"],
+        ['GENERATED', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+    ]
+    shared = spatial_index.shared_forecast_note(lat, lon)
+    if shared:
+        info_data.insert(2, ['FORECAST', shared])
+    t = Table(info_data, colWidths=[5*cm, 13.5*cm])
+    
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#1f77b4')),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f0f0f0')]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    
+    story.append(t)
+    story.append(Spacer(1, 10))
+    
+    # Add Charts if they rendered
+    for chart in charts:
+        if chart:
+            story.append(pdf_render.chart_flowable(chart, 19*cm, 9*cm))
             story.append(Spacer(1, 10))
+    
+    story.append(Paragraph(
+        f"<font size=8><b>Legend:</b> Green X = Excellent (>2.0m) | Red X = Weekly Peak</font>",
+        styles["Normal"]
+    ))
+    
+    return story
+
+def build_pdf(location, report_type, coords, summary, charts, save_path):
+    """Stage 4: assemble the PDF from the summary and rendered charts (save_path may be a file-like object)"""
+    doc = SimpleDocTemplate(save_path, pagesize=A4, **PAGE_MARGINS)
+    story = build_story(location, report_type, coords, summary, charts)
+    
+    # Build PDF
+    with metrics.span("pdf", report="surf"):
+        doc.build(story)
+    metrics.inc("bytes_written", pdf_render.pdf_size(save_path), report="surf", profile=output_profiles.active_name())
+    return save_path
+
+# =============================================
+# GENERATE COMPLETE PDF REPORT
+# =============================================
+
+def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT, data=None, force=False, output="file"):
+    """
+    Generate complete surf report PDF
+    
+    Args:
+        data: Optional prefetched surf DataFrame (e.g. from a bulk fetch)
+        force: Rebuild even if the forecast is unchanged since the last report
+        output: "file" (save under output_dir, return the path), "bytes" (return the PDF
+                without saving) or a writable file-like object to stream it to
+    """
+    try:
+        log.info(f"\n{'='*50}")
+        log.info(f"GENERATING SURF REPORT: {location}")
+        log.info(f"{'='*50}")
         
-        story.append(Paragraph(
-            f"<font size=8><b>Legend:</b> Green X = Excellent (>2.0m) | Red X = Weekly Peak</font>",
-            styles["Normal"]
-        ))
+        df = data if data is not None else fetch_data(coords)
         
-        # Build PDF
-        doc.build(story)
+        if df is None or len(df) == 0:
+            raise Exception("No surf data fetched")
         
-        print(f"[OK] Report saved: {save_path}")
-        print(f"{'='*50}\n")
+        summary = analyze_data(df)
+        fingerprint = report_fingerprint(location, coords, df, summary)
+        # Only the default profile's reports are catalogued
+        catalogued = output_profiles.is_default()
+        existing = None
+        if catalogued and not force:
+            existing = report_catalog.unchanged_report(location, "Surf", fingerprint, output_dir)
+        if existing:
+            log.info(f"[OK] Forecast unchanged, keeping: {existing}")
+            log.info(f"{'='*50}\n")
+            return pdf_render.existing_pdf(existing, output)
+        
+        save_path = pdf_render.pdf_target(output, lambda: report_path(location, output_dir))
+        
+        best_date = summary['best_date']
+        log.info(f"Current height: {summary['current_height']:.2f}m")
+        log.info(f"Best day: {best_date.strftime('%A') if best_date else 'N/A'}, height: {summary['best_height']:.2f}m")
+        
+        log.info("[INFO] Generating charts...")
+        charts = render_charts(df, summary)
+        
+        build_pdf(location, report_type, coords, summary, charts, save_path)
+        if output != "file":
+            log.info(f"[OK] Report built, not saved: {pdf_render.pdf_size(save_path)} bytes")
+            log.info(f"{'='*50}\n")
+            return pdf_render.pdf_result(save_path, output)
+        if catalogued:
+            report_catalog.record_report(save_path, location, "Surf", input_hash=fingerprint, output_dir=output_dir)
+        
+        log.info(f"[OK] Report saved: {save_path}")
+        log.info(f"{'='*50}\n")
         return save_path
         
     except Exception as e:
-        print(f"[ERROR] {e}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*50}\n")
+        log.exception(f"[ERROR] {e}")
+        log.info(f"{'='*50}\n")
         raise
-    finally:
-        # Cleanup temp files AFTER PDF is built
-        try:
-            shutil.rmtree(temp_dir)
-            print(f"[OK] Temp files cleaned up")
-        except:
-            pass
\ No newline at end of file
@@ -7,293 +7,464 @@ Supports multiple locations and report types
 import os
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import cm
 from io import BytesIO
-import requests
-import shutil
 
 from config.settings import BASE_OUTPUT
+from core import (forecast_cache, chart_cache, chart_render, pdf_render, metrics, spatial_index, report_catalog,
+                  output_profiles, alert_rules)
+
+log = metrics.get_logger("weather")
 
 # =============================================
 # ANALYSIS FUNCTIONS
 # =============================================
 
+COMPASS_DIRS = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+
 def deg_to_nsew(deg):
     """Convert degrees to compass direction"""
     if pd.isna(deg): 
         return ""
-    dirs = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
-    return dirs[int((deg + 11.25) // 22.5) % 16]
+    return COMPASS_DIRS[int((deg + 11.25) // 22.5) % 16]
+
+def deg_to_nsew_array(degs):
+    """Vectorized deg_to_nsew: array of degrees to array of compass labels ("" for NaN)"""
+    degs = np.asarray(degs, dtype=float)
+    valid = ~np.isnan(degs)
+    idx = np.zeros(degs.shape, dtype=int)
+    idx[valid] = ((degs[valid] + 11.25) // 22.5).astype(int) % 16
+    return np.where(valid, np.asarray(COMPASS_DIRS)[idx], "")
+
+def is_northerly(degs):
+    """Boolean mask of northerly wind directions (315-45 degrees)"""
+    degs = np.asarray(degs, dtype=float)
+    return (degs >= 315) | (degs <= 45)
+
+WEATHER_HOURLY_VARS = ["temperature_2m", "precipitation", "wind_speed_10m", "wind_direction_10m", "wind_gusts_10m", "weather_code"]
+WEATHER_DAILY_VARS = ["temperature_2m_max", "wind_speed_10m_max", "wind_gusts_10m_max", "wind_direction_10m_dominant", "precipitation_sum", "weather_code"]
+HOURLY_FORECAST_DAYS = 3
+DAILY_FORECAST_DAYS = 7
+
+def parse_weather_data(data):
+    """Build the hourly and daily DataFrames from one Open-Meteo location response"""
+    h_df = pd.DataFrame(data["hourly"]).head(HOURLY_FORECAST_DAYS * 24)
+    d_df = pd.DataFrame(data["daily"])
+    return h_df, d_df
 
 def fetch_weather_data(lat, lon):
     """Fetch weather data from Open-Meteo API"""
     try:
-        print(f"[FETCH] Fetching weather for {lat}, {lon}")
-        
-        h_url = (f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-                 f"&hourly=temperature_2m,precipitation,wind_speed_10m,wind_direction_10m,wind_gusts_10m,weather_code"
-                 f"&models=best_match&timezone=auto&forecast_days=3")
+        log.debug(f"[FETCH] Fetching weather for {lat}, {lon}")
         
-        d_url = (f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-                 f"&daily=temperature_2m_max,wind_speed_10m_max,wind_gusts_10m_max,wind_direction_10m_dominant,precipitation_sum,weather_code"
-                 f"&models=best_match&timezone=auto&forecast_days=7")
+        # Hourly and daily come back in one request; hourly is trimmed to its shorter horizon
+        lat, lon = spatial_index.fetch_coords(lat, lon)
+        with metrics.span("fetch", report="weather"):
+            data = forecast_cache.get_forecast(lat, lon, hourly=WEATHER_HOURLY_VARS, daily=WEATHER_DAILY_VARS,
+                                               forecast_days=DAILY_FORECAST_DAYS, models="best_match")
         
-        h = requests.get(h_url, timeout=15).json()
-        d = requests.get(d_url, timeout=15).json()
+        with metrics.span("parse", report="weather"):
+            h_df, d_df = parse_weather_data(data)
         
-        print(f"[OK] Hourly: {len(h['hourly']['time'])} records, Daily: {len(d['daily']['time'])} records")
-        return pd.DataFrame(h["hourly"]), pd.DataFrame(d["daily"])
+        log.debug(f"[OK] Hourly: {len(h_df)} records, Daily: {len(d_df)} records")
+        return h_df, d_df
         
     except Exception as e:
-        print(f"[ERROR] Failed to fetch weather data: {e}")
+        log.error(f"[ERROR] Failed to fetch weather data: {e}")
         return None, None
 
 # =============================================
 # ALERT LOGIC
 # =============================================
 
-def check_alerts(h_df, hours_ahead=24):
-    """Check for weather alerts"""
+def alert_masks(h_df, d_df):
+    """
+    Evaluate the alert rules (config/alert_rules.json) once per report
+    
+    Returns:
+        dict: {"hourly": {rule: bool array over h_df rows}, "daily": {rule: bool array over d_df rows}},
+              with None for a scope that is not given or whose variables are missing
+    """
+    rules = alert_rules.get_rules()
+    masks = {}
+    for scope, df in (("hourly", h_df), ("daily", d_df)):
+        if df is None:
+            masks[scope] = None
+            continue
+        try:
+            masks[scope] = rules.masks(df, scope)
+        except (KeyError, ValueError, TypeError) as e:
+            log.error(f"[ERROR] {scope.capitalize()} alert rules could not run: {e}")
+            masks[scope] = None
+    return masks
+
+def check_alerts(h_df, hours_ahead=None, masks=None):
+    """
+    Check for weather alerts
+    
+    Args:
+        hours_ahead: Look-ahead for every rule (default: each rule's window_hours)
+        masks: Hourly masks from alert_masks() (evaluated here if not given)
+    
+    Returns:
+        tuple: (status, colour) of the highest-priority rule firing, NORMAL if none,
+               UNAVAILABLE if the data cannot be checked
+    """
+    rules = alert_rules.get_rules()
     try:
-        now = datetime.now()
-        cutoff = now + timedelta(hours=hours_ahead)
-        
-        h_df["time"] = pd.to_datetime(h_df["time"]).dt.tz_localize(None)
-        next_period = h_df[(h_df["time"] >= now) & (h_df["time"] <= cutoff)]
-        
-        has_storm = any(next_period['weather_code'].isin([95, 96, 99]))
-        has_fire = any((next_period['temperature_2m'] >= 25) & 
-                      ((next_period['wind_direction_10m'] >= 315) | (next_period['wind_direction_10m'] <= 45)))
-        has_high_wind = any(next_period['wind_gusts_10m'] >= 35)
-        
-        if has_storm:
-            return "THUNDERSTORM", colors.mediumpurple
-        elif has_fire:
-            return "FIRE RISK", colors.orange
-        elif has_high_wind:
-            return "HIGH WIND", colors.lightsalmon
-        else:
-            return "NORMAL", colors.honeydew
-    except:
-        return "NORMAL", colors.honeydew
+        if masks is None:
+            masks = rules.masks(h_df, "hourly")
+        times = pd.to_datetime(h_df["time"]).dt.tz_localize(None).to_numpy()
+        status, colour = rules.status(masks, rules.windows(times, hours_ahead=hours_ahead))
+    except (KeyError, ValueError, TypeError) as e:
+        log.error(f"[ERROR] Alert check failed: {e}")
+        status, colour = rules.unavailable["name"], rules.unavailable["colour"]
+    
+    return status, colors.toColor(colour)
 
 # =============================================
 # CHART 1: DAILY WEATHER
 # =============================================
 
-def generate_daily_chart(h_df):
-    """Generate daily weather chart"""
+def _daily_scaffold():
+    """Static axes for the daily chart: temperature, wind and rain on twin axes"""
+    fig = chart_render.new_figure((11, 5.5))
+    ax1 = fig.add_subplot()
+    ax2, ax4 = ax1.twinx(), ax1.twinx()
+    ax4.spines["right"].set_position(("axes", 1.15))
+    
+    ax1.set_ylabel("Temp (C)", color="red", fontweight="bold")
+    ax2.set_ylabel("Wind (km/h)", color="darkgreen", fontweight="bold")
+    ax4.set_ylabel("Rain (mm)", color="blue", fontweight="bold")
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    return fig, (ax1, ax2, ax4)
+
+def _chart_rules(masks, setting, rows=None):
+    """(rule, colour, mask) for the rules with a chart setting, masks cut to rows"""
+    marked = []
+    for rule in alert_rules.get_rules().rules:
+        colour = rule.chart.get(setting)
+        if colour and masks and rule.name in masks:
+            mask = np.asarray(masks[rule.name])
+            marked.append((rule, colour, mask[rows] if rows is not None else mask))
+    return marked
+
+def generate_daily_chart(h_df, masks=None):
+    """Generate daily weather chart (masks: hourly alert masks from alert_masks)"""
     try:
         h_df = h_df.copy()
         h_df["time"] = pd.to_datetime(h_df["time"]).dt.tz_localize(None)
+        if masks is None:
+            masks = alert_masks(h_df, None)["hourly"]
         
         now_dt = datetime.now()
         today_start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_df = h_df[(h_df["time"] >= today_start) & (h_df["time"] <= today_start + timedelta(hours=23, minutes=59))].copy()
+        in_day = ((h_df["time"] >= today_start) & (h_df["time"] <= today_start + timedelta(hours=23, minutes=59))).to_numpy()
+        day_df = h_df[in_day].copy()
         
         if len(day_df) == 0:
             return None
         
-        fig, ax1 = plt.subplots(figsize=(11, 5.5))
-        ax2, ax4 = ax1.twinx(), ax1.twinx()
-        ax4.spines["right"].set_position(("axes", 1.15))
+        # Alert shading comes from the same masks as the status table
+        shading = _chart_rules(masks, "shade_colour", in_day)
         
-        ax1.set_ylabel("Temp (C)", color="red", fontweight="bold")
-        ax2.set_ylabel("Wind (km/h)", color="darkgreen", fontweight="bold")
-        ax4.set_ylabel("Rain (mm)", color="blue", fontweight="bold")
+        # Annotations switch from C (current) to F (forecast) at the current time
+        past_rows = int((day_df["time"] < now_dt).sum())
         
-        ax1.plot(day_df["time"], day_df["temperature_2m"], 'r-', lw=2.5)
-        ax2.plot(day_df["time"], day_df["wind_speed_10m"], 'g-', lw=1.5, alpha=0.8)
-        ax2.fill_between(day_df["time"], day_df["wind_speed_10m"], day_df["wind_gusts_10m"], color='green', alpha=0.1)
-        ax4.bar(day_df["time"], day_df["precipitation"], color="blue", alpha=0.2, width=0.02)
-        
-        # Current time marker
-        ax1.axvline(now_dt, color="black", linestyle="--", lw=2)
-        ylim = ax1.get_ylim()
-        ax1.text(now_dt, ylim[1], f" {now_dt.strftime('%H:%M')}", color='black', 
-                 fontweight='bold', va='bottom', ha='left', fontsize=9, bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
-        
-        # Fire risk shading
-        fire_risk = day_df[(day_df["temperature_2m"] >= 25) & 
-                          ((day_df["wind_direction_10m"] >= 315) | (day_df["wind_direction_10m"] <= 45))]
-        if not fire_risk.empty:
-            ax1.axvspan(fire_risk["time"].min(), fire_risk["time"].max(), color='orange', alpha=0.15)
-        
-        # Annotations every 3 hours
-        for _, row in day_df.iterrows():
-            if row["time"].hour % 3 == 0:
-                label_suffix = "C" if row["time"] < now_dt else "F"
-                ax1.annotate(f"{row['temperature_2m']:.1f}°{label_suffix}", 
-                            (row["time"], row["temperature_2m"]), 
-                            xytext=(0,7), textcoords="offset points", ha='center', size=8, fontweight='bold')
-                
-                is_n = (row["wind_direction_10m"] >= 315 or row["wind_direction_10m"] <= 45)
-                ax2.annotate(deg_to_nsew(row["wind_direction_10m"]), 
-                            (row["time"], row["wind_speed_10m"]), 
-                            xytext=(0,-15), textcoords="offset points", ha='center', size=8, 
-                            fontweight='bold', color='red' if is_n else 'darkgreen')
+        def render():
+            fig, (ax1, ax2, ax4) = chart_render.get_template("weather_daily", _daily_scaffold)
+            
+            ax1.plot(day_df["time"], day_df["temperature_2m"], 'r-', lw=2.5)
+            ax2.plot(day_df["time"], day_df["wind_speed_10m"], 'g-', lw=1.5, alpha=0.8)
+            ax2.fill_between(day_df["time"], day_df["wind_speed_10m"], day_df["wind_gusts_10m"], color='green', alpha=0.1)
+            ax4.bar(day_df["time"], day_df["precipitation"], color="blue", alpha=0.2, width=0.02)
+            
+            # Alert shading (fire risk by default)
+            for _, colour, mask in shading:
+                if mask.any():
+                    flagged = day_df["time"][mask]
+                    ax1.axvspan(flagged.min(), flagged.max(), color=colour, alpha=0.15)
+            
+            # Annotations every 3 hours, labels precomputed for the whole slice
+            marks = day_df[day_df["time"].dt.hour % 3 == 0]
+            times = marks["time"].to_numpy()
+            temps = marks["temperature_2m"].to_numpy(dtype=float)
+            speeds = marks["wind_speed_10m"].to_numpy(dtype=float)
+            suffixes = np.where(times < np.datetime64(now_dt), "C", "F")
+            temp_labels = [f"{t:.1f}°{sfx}" for t, sfx in zip(temps, suffixes)]
+            dir_labels = deg_to_nsew_array(marks["wind_direction_10m"])
+            dir_colors = np.where(is_northerly(marks["wind_direction_10m"]), "red", "darkgreen")
+            
+            for t, temp, speed, temp_label, dir_label, dir_color in zip(times, temps, speeds, temp_labels, dir_labels, dir_colors):
+                ax1.annotate(temp_label, (t, temp), xytext=(0,7), textcoords="offset points", ha='center', size=8, fontweight='bold')
+                ax2.annotate(dir_label, (t, speed), xytext=(0,-15), textcoords="offset points", ha='center', size=8, 
+                            fontweight='bold', color=dir_color)
+            
+            ax1.set_xlim(today_start, today_start + timedelta(hours=23, minutes=59))
+            ax1.set_title(f"Daily Weather {today_start.strftime('%d %b')}", fontweight='bold', fontsize=12, pad=15)
+            
+            # The current time marker is drawn over the cached base
+            return chart_cache.figure_png(fig, ax1, dpi=130, tight=True)
         
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        ax1.set_xlim(today_start, today_start + timedelta(hours=23, minutes=59))
-        ax1.set_title(f"Daily Weather {today_start.strftime('%d %b')}", fontweight='bold', fontsize=12, pad=15)
+        columns = ["time", "temperature_2m", "wind_speed_10m", "wind_gusts_10m", "precipitation", "wind_direction_10m"]
+        key = chart_cache.chart_key("weather_daily", day_df[columns], past_rows=past_rows,
+                                    shading=[(rule.name, colour, np.flatnonzero(mask).tolist())
+                                             for rule, colour, mask in shading])
+        png, meta = chart_cache.cached_render(key, render)
         
-        buf = BytesIO()
-        plt.savefig(buf, format='png', bbox_inches="tight", dpi=130)
+        buf = BytesIO(chart_cache.overlay_time_marker(png, meta, now_dt, label=f" {now_dt.strftime('%H:%M')}",
+                                                      color="black", linestyle="--", lw=2))
         buf.seek(0)
-        plt.close(fig)
         
-        print(f"[OK] Daily chart generated")
+        log.debug(f"[OK] Daily chart generated")
         return buf
     except Exception as e:
-        print(f"[ERROR] Daily chart: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"[ERROR] Daily chart: {e}")
         return None
 
 # =============================================
 # CHART 2: WEEKLY FORECAST
 # =============================================
 
-def generate_weekly_chart(d_df):
-    """Generate weekly forecast chart"""
+def _weekly_scaffold():
+    """Static axes for the weekly chart"""
+    fig = chart_render.new_figure((11, 4.5))
+    ax1 = fig.add_subplot()
+    ax2, ax4 = ax1.twinx(), ax1.twinx()
+    ax4.spines["right"].set_position(("axes", 1.15))
+    
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter("%a %d"))
+    ax1.set_title(f"Weekly Forecast", fontweight='bold', fontsize=12, pad=10)
+    return fig, (ax1, ax2, ax4)
+
+def generate_weekly_chart(d_df, masks=None):
+    """Generate weekly forecast chart (masks: daily alert masks from alert_masks)"""
     try:
         d_df = d_df.copy()
         d_df["time"] = pd.to_datetime(d_df["time"]).dt.tz_localize(None)
+        if masks is None:
+            masks = alert_masks(None, d_df)["daily"]
+        labels = _chart_rules(masks, "label")
         
-        fig, ax1 = plt.subplots(figsize=(11, 4.5))
-        ax2, ax4 = ax1.twinx(), ax1.twinx()
-        ax4.spines["right"].set_position(("axes", 1.15))
-        
-        ax1.plot(d_df["time"], d_df["temperature_2m_max"], 'r-o', lw=2)
-        ax2.plot(d_df["time"], d_df["wind_speed_10m_max"], 'g-s', lw=1.2)
-        ax4.bar(d_df["time"], d_df["precipitation_sum"], color="blue", alpha=0.15, width=0.4)
-        
-        for _, row in d_df.iterrows():
-            ax1.annotate(f"{row['temperature_2m_max']:.0f}°", 
-                        (row["time"], row["temperature_2m_max"]), 
-                        xytext=(0,8), textcoords="offset points", ha='center', size=8, fontweight='bold')
+        def render():
+            fig, (ax1, ax2, ax4) = chart_render.get_template("weather_weekly", _weekly_scaffold)
+            
+            ax1.plot(d_df["time"], d_df["temperature_2m_max"], 'r-o', lw=2)
+            ax2.plot(d_df["time"], d_df["wind_speed_10m_max"], 'g-s', lw=1.2)
+            ax4.bar(d_df["time"], d_df["precipitation_sum"], color="blue", alpha=0.15, width=0.4)
+            
+            times = d_df["time"].to_numpy()
+            temps = d_df["temperature_2m_max"].to_numpy(dtype=float)
+            speeds = d_df["wind_speed_10m_max"].to_numpy(dtype=float)
+            dir_labels = deg_to_nsew_array(d_df["wind_direction_10m_dominant"])
+            dir_colors = np.where(is_northerly(d_df["wind_direction_10m_dominant"]), "red", "darkgreen")
             
-            is_n = (row["wind_direction_10m_dominant"] >= 315 or row["wind_direction_10m_dominant"] <= 45)
-            ax2.annotate(deg_to_nsew(row["wind_direction_10m_dominant"]), 
-                        (row["time"], row["wind_speed_10m_max"]), 
-                        xytext=(0,10), textcoords="offset points", ha='center', size=8, 
-                        color='red' if is_n else 'darkgreen', fontweight='bold')
+            for t, temp, speed, dir_label, dir_color in zip(times, temps, speeds, dir_labels, dir_colors):
+                ax1.annotate(f"{temp:.0f}°", (t, temp), xytext=(0,8), textcoords="offset points", ha='center', size=8, fontweight='bold')
+                ax2.annotate(dir_label, (t, speed), xytext=(0,10), textcoords="offset points", ha='center', size=8, 
+                            color=dir_color, fontweight='bold')
             
-            if (row["temperature_2m_max"] >= 25 and is_n):
-                ax1.annotate("FIRE", (row["time"], row["temperature_2m_max"]), 
-                            xytext=(0,-20), textcoords="offset points", ha='center', 
-                            color='darkorange', fontweight='bold')
+            # Warning labels only for the flagged days
+            for rule, label, mask in labels:
+                for t, temp in zip(times[mask], temps[mask]):
+                    ax1.annotate(label, (t, temp), xytext=(0, rule.chart.get("label_offset", 20)),
+                                textcoords="offset points", ha='center',
+                                color=rule.chart.get("label_colour", "black"), fontweight='bold')
             
-            if int(row["weather_code"]) in [95, 96, 99]:
-                ax1.annotate("STORM", (row["time"], row["temperature_2m_max"]), 
-                            xytext=(0,20), textcoords="offset points", ha='center', 
-                            color='purple', fontweight='bold')
+            return chart_cache.figure_png(fig, dpi=130, tight=True)
         
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter("%a %d"))
-        ax1.set_title(f"Weekly Forecast", fontweight='bold', fontsize=12, pad=10)
+        key = chart_cache.chart_key("weather_weekly", d_df,
+                                    labels=[(rule.name, label, np.flatnonzero(mask).tolist(), rule.chart)
+                                            for rule, label, mask in labels])
+        png, _ = chart_cache.cached_render(key, render)
         
-        buf = BytesIO()
-        plt.savefig(buf, format='png', bbox_inches="tight", dpi=130)
+        buf = BytesIO(png)
         buf.seek(0)
-        plt.close(fig)
         
-        print(f"[OK] Weekly chart generated")
+        log.debug(f"[OK] Weekly chart generated")
         return buf
     except Exception as e:
-        print(f"[ERROR] Weekly chart: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"[ERROR] Weekly chart: {e}")
         return None
 
+# =============================================
+# REPORT STAGES
+# =============================================
+
+def fetch_data(coords):
+    """Stage 1: fetch the (hourly_df, daily_df) pair for (lat, lon)"""
+    lat, lon = coords
+    h_df, d_df = fetch_weather_data(lat, lon)
+    
+    if h_df is None or d_df is None:
+        raise Exception("Failed to fetch weather data")
+    
+    return h_df, d_df
+
+def analyze_data(data):
+    """Stage 2: alert masks and the status for the look-ahead window"""
+    h_df, d_df = data
+    with metrics.span("analysis", report="weather"):
+        masks = alert_masks(h_df, d_df)
+        alert_status, alert_color = check_alerts(h_df, masks=masks["hourly"])
+    
+    return {
+        'alert_status': alert_status,
+        'alert_color': alert_color,
+        'alert_masks': masks
+    }
+
+def render_charts(data, summary=None):
+    """Stage 3: render the daily and weekly charts, returns PNG bytes (None for a failed chart)"""
+    h_df, d_df = data
+    masks = summary['alert_masks'] if summary else alert_masks(h_df, d_df)
+    with metrics.span("chart", report="weather", chart="daily"):
+        buf_daily = generate_daily_chart(h_df, masks["hourly"] or {})
+    with metrics.span("chart", report="weather", chart="weekly"):
+        buf_weekly = generate_weekly_chart(d_df, masks["daily"] or {})
+    
+    return [buf.getvalue() if buf else None for buf in (buf_daily, buf_weekly)]
+
+# Bump when the charts or PDF layout change so unchanged forecasts still get the new layout
+REPORT_VERSION = 1
+
+def report_fingerprint(location, coords, data, summary, now=None):
+    """
+    Hash of everything a report is built from, compared with the last report to skip unchanged runs
+
+    Includes the alert status (its look-ahead window starts now) and the
+    hour the report is built in (see report_catalog.report_period).
+    """
+    return report_catalog.input_hash("Weather", *data, location=location, coords=tuple(coords), version=REPORT_VERSION,
+                                     rules=alert_rules.get_rules().digest, summary=summary['alert_status'],
+                                     period=report_catalog.report_period(now))
+
+def report_path(location, output_dir=BASE_OUTPUT):
+    """Create the location folder and return a timestamped PDF path"""
+    loc_dir = output_profiles.report_dir(output_dir, location)
+    os.makedirs(loc_dir, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
+    filename = f"Weather_Report_{location}_{timestamp}.pdf"
+    return os.path.join(loc_dir, filename)
+
+# Page margins, also used for the weather section of a combined report
+PAGE_MARGINS = {"topMargin": 0.5*cm, "bottomMargin": 0.5*cm, "leftMargin": 1*cm, "rightMargin": 2.5*cm}
+
+def build_story(location, report_type, coords, summary, charts):
+    """The report's flowables, shared by build_pdf and the combined report"""
+    chart_daily, chart_weekly = charts
+    
+    styles = pdf_render.get_styles()
+    story = []
+    
+    # Title
+    story.append(Paragraph(f"<b>SENTINEL WEATHER & WARNINGS REPORT</b>", styles["Title"]))
+    
+    # Alert status table
+    t = Table([['STATUS', f"{summary['alert_status']} - {location.upper()}"]], colWidths=[3*cm, 14.5*cm])
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, 0), colors.black),
+        ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (1, 0), (1, 0), summary['alert_color'])
+    ]))
+    story.append(t)
+    shared = spatial_index.shared_forecast_note(*coords)
+    if shared:
+        story.append(Paragraph(f"Forecast: {shared}", styles["Normal"]))
+    story.append(Spacer(1, 12))
+    
+    # Daily chart
+    if chart_daily:
+        story.append(pdf_render.chart_flowable(chart_daily, 18.5*cm, 9.2*cm))
+    story.append(Spacer(1, 15))
+    
+    # Weekly chart
+    if chart_weekly:
+        story.append(pdf_render.chart_flowable(chart_weekly, 18.5*cm, 7.8*cm))
+    
+    story.append(Spacer(1, 10))
+    story.append(Paragraph(
+        f"<font size=7>Report Type: {report_type} | C = Current, F = Forecast | Updated: {datetime.now().strftime('%H:%M')}</font>",
+        styles["Normal"]
+    ))
+    
+    return story
+
+def build_pdf(location, report_type, coords, summary, charts, save_path):
+    """Stage 4: assemble the PDF from the summary and rendered charts (save_path may be a file-like object)"""
+    doc = SimpleDocTemplate(save_path, pagesize=A4, **PAGE_MARGINS)
+    story = build_story(location, report_type, coords, summary, charts)
+    
+    with metrics.span("pdf", report="weather"):
+        doc.build(story)
+    metrics.inc("bytes_written", pdf_render.pdf_size(save_path), report="weather", profile=output_profiles.active_name())
+    return save_path
+
 # =============================================
 # PDF BUILDER
 # =============================================
 
-def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT):
-    """Generate complete weather report PDF"""
+def generate_report(location, report_type, coords, output_dir=BASE_OUTPUT, data=None, force=False, output="file"):
+    """
+    Generate complete weather report PDF
+    
+    Args:
+        data: Optional prefetched (hourly_df, daily_df) pair (e.g. from a bulk fetch)
+        force: Rebuild even if the forecast is unchanged since the last report
+        output: "file" (save under output_dir, return the path), "bytes" (return the PDF
+                without saving) or a writable file-like object to stream it to
+    """
     try:
-        print(f"\n{'='*50}")
-        print(f"GENERATING WEATHER REPORT: {location}")
-        print(f"{'='*50}")
+        log.info(f"\n{'='*50}")
+        log.info(f"GENERATING WEATHER REPORT: {location}")
+        log.info(f"{'='*50}")
         
-        lat, lon = coords
-        h_df, d_df = fetch_weather_data(lat, lon)
+        h_df, d_df = data if data is not None else fetch_data(coords)
         
         if h_df is None or d_df is None:
             raise Exception("Failed to fetch weather data")
         
-        # Create output directory
-        loc_dir = os.path.join(output_dir, location)
-        os.makedirs(loc_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
-        filename = f"Weather_Report_{location}_{timestamp}.pdf"
-        save_path = os.path.join(loc_dir, filename)
-        
-        # Check alerts
-        alert_status, alert_color = check_alerts(h_df)
-        
-        print(f"Alert status: {alert_status}")
-        
-        # Generate charts
-        print("[INFO] Generating charts...")
-        buf_daily = generate_daily_chart(h_df)
-        buf_weekly = generate_weekly_chart(d_df)
-        
-        # Build PDF
-        doc = SimpleDocTemplate(save_path, pagesize=A4, topMargin=0.5*cm, bottomMargin=0.5*cm, leftMargin=1*cm, rightMargin=2.5*cm)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Title
-        story.append(Paragraph(f"<b>SENTINEL WEATHER & WARNINGS REPORT</b>", styles["Title"]))
-        
-        # Alert status table
-        t = Table([['STATUS', f"{alert_status} - {location.upper()}"]], colWidths=[3*cm, 14.5*cm])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, 0), colors.black),
-            ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (1, 0), (1, 0), alert_color)
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 12))
-        
-        # Daily chart
-        if buf_daily:
-            story.append(Image(buf_daily, 18.5*cm, 9.2*cm))
-        story.append(Spacer(1, 15))
-        
-        # Weekly chart
-        if buf_weekly:
-            story.append(Image(buf_weekly, 18.5*cm, 7.8*cm))
-        
-        story.append(Spacer(1, 10))
-        story.append(Paragraph(
-            f"<font size=7>Report Type: {report_type} | C = Current, F = Forecast | Updated: {datetime.now().strftime('%H:%M')}</font>",
-            styles["Normal"]
-        ))
-        
-        doc.build(story)
-        
-        print(f"[OK] Report saved: {save_path}")
-        print(f"{'='*50}\n")
+        summary = analyze_data((h_df, d_df))
+        fingerprint = report_fingerprint(location, coords, (h_df, d_df), summary)
+        # Only the default profile's reports are catalogued
+        catalogued = output_profiles.is_default()
+        existing = None
+        if catalogued and not force:
+            existing = report_catalog.unchanged_report(location, "Weather", fingerprint, output_dir)
+        if existing:
+            log.info(f"[OK] Forecast unchanged, keeping: {existing}")
+            log.info(f"{'='*50}\n")
+            return pdf_render.existing_pdf(existing, output)
+        
+        save_path = pdf_render.pdf_target(output, lambda: report_path(location, output_dir))
+        
+        log.info(f"Alert status: {summary['alert_status']}")
+        
+        log.info("[INFO] Generating charts...")
+        charts = render_charts((h_df, d_df), summary)
+        
+        build_pdf(location, report_type, coords, summary, charts, save_path)
+        if output != "file":
+            log.info(f"[OK] Report built, not saved: {pdf_render.pdf_size(save_path)} bytes")
+            log.info(f"{'='*50}\n")
+            return pdf_render.pdf_result(save_path, output)
+        if catalogued:
+            report_catalog.record_report(save_path, location, "Weather", input_hash=fingerprint, output_dir=output_dir)
+        
+        log.info(f"[OK] Report saved: {save_path}")
+        log.info(f"{'='*50}\n")
         return save_path
         
     except Exception as e:
-        print(f"[ERROR] {e}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*50}\n")
-        raise
\ No newline at end of file
+        log.exception(f"[ERROR] {e}")
+        log.info(f"{'='*50}\n")
+        raise
@@ -0,0 +1,18 @@
+"""
+Test setup - keep every output, cache and metrics file in a temporary folder
+Settings are read at import, so the environment is set before any core module loads.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_storage = tempfile.mkdtemp(prefix="sentinel-tests-")
+os.environ.setdefault("BASE_OUTPUT_PATH", _storage)
+os.environ.setdefault("METRICS_ENABLED", "False")
+os.environ.setdefault("LOCATIONS_FILE", os.path.join(ROOT, "config", "locations.json"))
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
@@ -0,0 +1,42 @@
+"""Retryable statuses are only retried by get_json, through the rate limiter"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from core import api_client
+
+class _TooManyRequests(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        self.send_response(429)
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    _TooManyRequests.hits = 0
+    httpd = HTTPServer(("127.0.0.1", 0), _TooManyRequests)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/v1/forecast"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_adapter_does_not_retry_statuses():
+    retry = api_client.get_session().get_adapter("https://api.open-meteo.com").max_retries
+    for status in api_client.RETRY_STATUSES:
+        assert not retry.is_retry("GET", status, has_retry_after=True)
+
+def test_429_with_retry_after_not_retried_in_adapter(server):
+    response = api_client.get_session().get(server, timeout=5)
+    assert response.status_code == 429
+    assert _TooManyRequests.hits == 1
@@ -0,0 +1,53 @@
+"""Reports are only reused while both the forecast and the hour they were built in are the same"""
+
+import os
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import FIXTURE_DIR
+from core import report_catalog, combined_worker, surf_worker, sky_worker, weather_worker
+
+NOW = datetime(2025, 1, 3, 21, 10)
+
+@pytest.fixture(scope="module")
+def frames():
+    with open(os.path.join(FIXTURE_DIR, "BondiBeach.json")) as f:
+        return combined_worker.parse_combined_data(json.load(f))
+
+WORKERS = {"surf": surf_worker, "sky": sky_worker, "weather": weather_worker, "combined": combined_worker}
+
+def _fingerprint(name, frames, now, summary=None):
+    worker = WORKERS[name]
+    data = frames if name == "combined" else frames[name]
+    summary = summary or worker.analyze_data(data)
+    return worker.report_fingerprint("BondiBeach", (-33.89, 151.274), data, summary, now=now)
+
+@pytest.mark.parametrize("name", list(WORKERS))
+def test_same_hour_same_fingerprint(name, frames):
+    assert _fingerprint(name, frames, NOW) == _fingerprint(name, frames, NOW + timedelta(minutes=30))
+
+@pytest.mark.parametrize("name", list(WORKERS))
+def test_later_hour_new_fingerprint(name, frames):
+    assert _fingerprint(name, frames, NOW) != _fingerprint(name, frames, NOW + timedelta(hours=3))
+
+def test_alert_status_in_fingerprint(frames):
+    summary = weather_worker.analyze_data(frames["weather"])
+    changed = dict(summary, alert_status="SEVERE WIND" if summary["alert_status"] == "NORMAL" else "NORMAL")
+    assert (_fingerprint("weather", frames, NOW, summary) != _fingerprint("weather", frames, NOW, changed))
+
+def test_later_now_is_not_skipped(frames, tmp_path):
+    output_dir = str(tmp_path)
+    loc_dir = tmp_path / "BondiBeach"
+    loc_dir.mkdir()
+    pdf = loc_dir / "Weather_Report_BondiBeach_2025-01-03_2110.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+
+    report_catalog.record_report(str(pdf), "BondiBeach", "Weather",
+                                 input_hash=_fingerprint("weather", frames, NOW), output_dir=output_dir)
+
+    same_hour = _fingerprint("weather", frames, NOW + timedelta(minutes=40))
+    later = _fingerprint("weather", frames, NOW + timedelta(hours=5))
+    assert report_catalog.unchanged_report("BondiBeach", "Weather", same_hour, output_dir) == str(pdf)
+    assert report_catalog.unchanged_report("BondiBeach", "Weather", later, output_dir) is None